@@ -13,9 +13,16 @@ from routes.chat import chat_bp
 # ## MODIFICATION START ##
 from routes.constraints import constraints_bp
 # ## MODIFICATION END ##
+from routes.system import system_bp
+from utils.neo4j_handler import init_driver
+from utils.graph_snapshot import start_snapshot_refresh
+from utils.kpi_snapshot import start_kpi_refresh
+from utils.broken_bom import start_broken_bom_analysis
+from utils.order_lookup import start_order_lookup
 
 app = Flask(__name__)
-CORS(app)
+# Validator and timing headers must be readable by the UI's cross-origin fetches.
+CORS(app, expose_headers=['ETag', 'Last-Modified', 'Server-Timing'])
 
 # Register each blueprint with the main app
 app.register_blueprint(news_bp)
@@ -25,6 +32,20 @@ app.register_blueprint(chat_bp)
 # ## MODIFICATION START ##
 app.register_blueprint(constraints_bp)
 # ## MODIFICATION END ##
+app.register_blueprint(system_bp)
+
+# Create the shared Neo4j driver and warm its connection pool before serving requests.
+# The driver is closed by an atexit hook in utils/neo4j_handler.py.
+init_driver()
+
+# Keep the in-memory graph snapshot current in a background thread (SNAPSHOT_REFRESH_SECONDS).
+start_snapshot_refresh()
+# Recompute the dashboard KPIs when the data changes (KPI_CHECK_SECONDS, KPI_REFRESH_SECONDS).
+start_kpi_refresh()
+# Recompute broken_bom flags after each snapshot change when BROKEN_BOM_AUTO is set.
+start_broken_bom_analysis()
+# Make sure order search can seek Demand by orderId and seqnum, and demand pages by date (ORDER_LOOKUP_ENSURE_INDEXES).
+start_order_lookup()
 
 # --- Static File Serving ---
 @app.route('/')
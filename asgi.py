@@ -0,0 +1,53 @@
+# asgi.py
+# Async serving mode: `hypercorn asgi:app`.
+# The bom_viewer, dashboard and constraints endpoints are answered by the async handlers in
+# routes/async_routes.py on the Neo4j async driver. Every other request (news, chat, system,
+# static files) is passed to the Flask app from app.py, which runs in a worker thread.
+from quart import Quart
+from werkzeug.exceptions import HTTPException
+from hypercorn.middleware import AsyncioWSGIMiddleware
+
+from app import app as flask_app
+from routes.async_routes import async_bom_viewer_bp, async_dashboard_bp, async_constraints_bp
+from utils.neo4j_handler import get_async_driver, close_async_driver
+
+# Static files stay with the Flask app.
+quart_app = Quart(__name__, static_folder=None)
+quart_app.register_blueprint(async_bom_viewer_bp)
+quart_app.register_blueprint(async_dashboard_bp)
+quart_app.register_blueprint(async_constraints_bp)
+
+@quart_app.before_serving
+async def open_async_driver():
+    # The async driver must be created inside the server's event loop.
+    get_async_driver()
+
+@quart_app.after_serving
+async def shutdown_async_driver():
+    await close_async_driver()
+
+@quart_app.after_request
+async def allow_cross_origin(response):
+    # Same default policy as CORS(app) in app.py; preflight requests are answered by Flask.
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    response.headers.setdefault('Access-Control-Expose-Headers', 'ETag, Last-Modified, Server-Timing')
+    return response
+
+wsgi_app = AsyncioWSGIMiddleware(flask_app)
+_async_routes = quart_app.url_map.bind('')
+
+def handled_by_async(scope):
+    if scope['method'] == 'OPTIONS':
+        return False
+    try:
+        _async_routes.match(scope['path'], method=scope['method'])
+        return True
+    except HTTPException:
+        return False
+
+async def app(scope, receive, send):
+    """ASGI entry point: routes requests to the async handlers or the Flask app."""
+    if scope['type'] == 'http' and not handled_by_async(scope):
+        await wsgi_app(scope, receive, send)
+    else:
+        await quart_app(scope, receive, send)
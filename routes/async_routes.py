@@ -0,0 +1,485 @@
+# routes/async_routes.py
+# Async versions of the bom_viewer, dashboard and constraints endpoints, served by asgi.py.
+# Queries and response shaping are shared with the Flask blueprints; handlers await the Neo4j
+# async driver, so a long network query holds no thread while it runs. Independent queries of
+# one request run concurrently, each in its own session.
+from quart import Blueprint, Response, jsonify, request, make_response
+import functools
+import asyncio
+import json
+from utils.neo4j_handler import get_async_session, single_async as run_single, records_async as run_records
+from utils.order_store import get_order_store, ORDER_FILES
+from utils.kpi_snapshot import get_kpis_async
+from utils.pagination import page_request, cached_count_async
+from utils.data_version import data_validators, is_not_modified, set_validators
+from utils.resweek import get_resweek_matrix
+from utils.pegging_index import get_pegging_index, demand_properties_async
+from utils.order_lookup import ORDER_LOOKUP_QUERY, build_order_search, suggest_request
+from utils.fg_health import FG_HEALTH_QUERY, build_health_report, health_request, stream_health_ndjson_async
+from utils.capacity_whatif import scenario_request, run_scenario, listed_demands, attach_demand_properties
+from utils.impact_propagation import impact_request, propagate_impact
+from utils.network_queries import (fetch_sku_network_async, fetch_resource_network_async, fetch_shortest_path_async,
+                                   stream_graph_ndjson_async, graph_to_ndjson, SKU_NETWORK_GRAPH_QUERY,
+                                   RESOURCE_NETWORK_GRAPH_QUERY, GRAPH_FORMAT, PATHS_FORMAT)
+from utils.supply_graph import get_supply_graph, use_memory_engine
+from utils.lead_time_path import find_lead_time_path, lead_time_path_graph, shortest_lead_time_path
+from routes.bom_viewer import SKU_DETAILS_QUERY
+from routes import dashboard as dq
+from routes import constraints as cq
+
+async_bom_viewer_bp = Blueprint('async_bom_viewer_bp', __name__)
+async_dashboard_bp = Blueprint('async_dashboard_bp', __name__)
+async_constraints_bp = Blueprint('async_constraints_bp', __name__)
+
+
+async def run_list(query, transform=dict, **params):
+    return [transform(record) for record in await run_records(query, **params)]
+
+
+async def with_session(fetch, *args):
+    """Runs fetch(session, *args) in a session of its own, so several can be awaited together."""
+    async with get_async_session() as session:
+        return await fetch(session, *args)
+
+
+def ndjson_network_response(query, **params):
+    async def generate():
+        try:
+            async with get_async_session() as session:
+                async for chunk in stream_graph_ndjson_async(session, query, **params):
+                    yield chunk
+        except Exception as e:
+            print(f"An error occurred while streaming a network: {e}")
+            yield json.dumps({'type': 'error', 'data': 'Internal server error'}) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+async def run_page(query, count_query, page_params, limit, after):
+    """Page rows (limit + 1 of them) and the cached total, fetched together."""
+    return await asyncio.gather(
+        run_records(query, limit=limit + 1, **page_params(after)),
+        cached_count_async(count_query),
+    )
+
+
+async def demand_page_records(phases, limit, after, **params):
+    """Async counterpart of routes.constraints.demand_page_records."""
+    phase, after_id = cq.demand_page_position(after)
+    query, after_id = cq.demand_phase_query(phases, phase, after_id)
+    records = await run_records(query, limit=limit + 1, after_id=after_id, **params)
+    if phase == 0 and len(records) <= limit:
+        records += await run_records(phases[2], limit=limit + 1 - len(records), after_id='', **params)
+    return records
+
+
+def conditional_get(validators=data_validators):
+    """Async counterpart of utils.data_version.conditional_get."""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            tags = validators(request.args)
+            if tags is None:
+                return await view(*args, **kwargs)
+            if is_not_modified(request.headers, tags):
+                return set_validators(await make_response('', 304), tags)
+            response = await make_response(await view(*args, **kwargs))
+            if response.status_code == 200:
+                set_validators(response, tags)
+            return response
+        return wrapper
+    return decorator
+
+
+async def resource_week_demands(res_id, week, offset=0, limit=None):
+    # The pegging index is in memory (its rebuild runs in a worker thread); the demand properties are awaited.
+    index = await asyncio.to_thread(get_pegging_index)
+    pegs = index.demands_for(res_id, week, offset, limit)
+    return cq.resource_week_rows(pegs, await demand_properties_async([demand_id for demand_id, _ in pegs])), index
+
+
+async def load_constrained_resources():
+    return [cq.serialize_constrained_resource(record) for record in await run_records(cq.CONSTRAINED_RESOURCES_QUERY)]
+
+
+async def memory_graph():
+    # The first call loads the snapshot; keep that (and the CPU-bound queries) off the event loop.
+    return await asyncio.to_thread(get_supply_graph)
+
+
+# --- BOM viewer ---------------------------------------------------------------------------
+
+@async_bom_viewer_bp.route('/api/sku-details', methods=['POST'])
+async def get_sku_details():
+    try:
+        data = await request.get_json()
+        result = await run_single(SKU_DETAILS_QUERY, sku_id=data.get('sku_id'))
+        return jsonify({'found': True, 'properties': dict(result['s'])}) if result else jsonify({'found': False})
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_bom_viewer_bp.route('/api/network-graph', methods=['POST'])
+async def get_network_graph():
+    try:
+        data = await request.get_json()
+        sku_id = data.get('sku_id')
+        fmt = data.get('format', PATHS_FORMAT)
+        if use_memory_engine(data) and (fmt == GRAPH_FORMAT or data.get('stream')):
+            graph = await asyncio.to_thread((await memory_graph()).network_for_sku, sku_id)
+            if data.get('stream'):
+                return Response(graph_to_ndjson(graph), mimetype='application/x-ndjson')
+            return jsonify(graph)
+        if data.get('stream'):
+            return ndjson_network_response(SKU_NETWORK_GRAPH_QUERY, sku_id=sku_id)
+        return jsonify(await with_session(fetch_sku_network_async, sku_id, fmt))
+    except Exception as e:
+        return jsonify({'error': 'Internal server error.'}), 500
+
+@async_bom_viewer_bp.route('/api/network-with-shortest-path', methods=['POST'])
+async def get_network_with_shortest_path():
+    try:
+        data = await request.get_json()
+        sku_id = data.get('sku_id')
+        fmt = data.get('format', PATHS_FORMAT)
+        if use_memory_engine(data) and fmt == GRAPH_FORMAT:
+            graph = await memory_graph()
+            full_network, path = await asyncio.gather(
+                asyncio.to_thread(graph.network_for_sku, sku_id),
+                asyncio.to_thread(find_lead_time_path, graph, sku_id),
+            )
+            return jsonify({'full_network': full_network, 'shortest_path': lead_time_path_graph(graph, path)})
+        full_network, shortest_path = await asyncio.gather(
+            with_session(fetch_sku_network_async, sku_id, fmt),
+            with_session(fetch_shortest_path_async, sku_id, fmt),
+        )
+        return jsonify({'full_network': full_network, 'shortest_path': shortest_path})
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_bom_viewer_bp.route('/api/shortest-lead-time-path', methods=['POST'])
+async def get_shortest_lead_time_path():
+    try:
+        data = await request.get_json()
+        sku_id = data.get('sku_id')
+        if not sku_id:
+            return jsonify({'error': 'sku_id is required'}), 400
+        return jsonify(await asyncio.to_thread(shortest_lead_time_path, await memory_graph(), sku_id))
+    except Exception as e:
+        print(f"An error occurred in get_shortest_lead_time_path: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_bom_viewer_bp.route('/api/in-network', methods=['POST'])
+async def get_in_network():
+    try:
+        data = await request.get_json()
+        sku_id = data.get('sku_id')
+        other_sku_id = data.get('other_sku_id')
+        if not sku_id or not other_sku_id:
+            return jsonify({'error': 'sku_id and other_sku_id are required'}), 400
+        in_network = (await memory_graph()).in_network(sku_id, other_sku_id)
+        return jsonify({'sku_id': sku_id, 'other_sku_id': other_sku_id, 'found': in_network is not None, 'inNetwork': bool(in_network)})
+    except Exception as e:
+        print(f"An error occurred in get_in_network: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_bom_viewer_bp.route('/api/resource-network', methods=['POST'])
+async def get_resource_network():
+    try:
+        data = await request.get_json()
+        res_id = data.get('res_id')
+        fmt = data.get('format', PATHS_FORMAT)
+        if use_memory_engine(data) and (fmt == GRAPH_FORMAT or data.get('stream')):
+            graph = await asyncio.to_thread((await memory_graph()).network_for_resource, res_id)
+            if data.get('stream'):
+                return Response(graph_to_ndjson(graph), mimetype='application/x-ndjson')
+            return jsonify(graph)
+        if data.get('stream'):
+            return ndjson_network_response(RESOURCE_NETWORK_GRAPH_QUERY, res_id=res_id)
+        return jsonify(await with_session(fetch_resource_network_async, res_id, fmt))
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+# --- Dashboard ----------------------------------------------------------------------------
+
+@async_dashboard_bp.route('/api/dashboard', methods=['GET'])
+@conditional_get(dq.dashboard_validators)
+async def get_dashboard_data():
+    try:
+        return jsonify(await get_kpis_async(request.args.get('refresh') == '1'))
+    except Exception as e:
+        print(f"An error occurred in get_dashboard_data: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+async def paged_sku_list(query, count_query):
+    limit, after = page_request(request.args)
+    records, total = await run_page(query, count_query, dq.sku_page_params, limit, after)
+    return dq.sku_page(records, limit, total)
+
+@async_dashboard_bp.route('/api/broken-networks', methods=['GET'])
+async def get_broken_networks():
+    try:
+        return jsonify(await paged_sku_list(dq.BROKEN_NETWORKS_QUERY, dq.BROKEN_SKU_COUNT_QUERY))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_dashboard_bp.route('/api/broken-demand-networks', methods=['GET'])
+async def get_broken_demand_networks():
+    try:
+        return jsonify(await paged_sku_list(dq.BROKEN_DEMAND_NETWORKS_QUERY, dq.BROKEN_FG_COUNT_QUERY))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_dashboard_bp.route('/api/affected-cust-orders', methods=['GET'])
+async def get_affected_cust_orders():
+    try:
+        return jsonify(await get_order_store().affected_orders_async('cust', dq.affected_orders_limit(request.args)))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_dashboard_bp.route('/api/affected-fcst-orders', methods=['GET'])
+async def get_affected_fcst_orders():
+    try:
+        return jsonify(await get_order_store().affected_orders_async('fcst', dq.affected_orders_limit(request.args)))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_dashboard_bp.route('/api/affected-cust-orders-by-sku', methods=['POST'])
+async def get_affected_cust_orders_by_sku():
+    try:
+        data = await request.get_json()
+        return jsonify(await get_order_store().orders_for_sku_async('cust', data.get('sku_id')))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_dashboard_bp.route('/api/affected-fcst-orders-by-sku', methods=['POST'])
+async def get_affected_fcst_orders_by_sku():
+    try:
+        data = await request.get_json()
+        return jsonify(await get_order_store().orders_for_sku_async('fcst', data.get('sku_id')))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# --- Constraints --------------------------------------------------------------------------
+
+@async_constraints_bp.route('/api/constraints/fg-search', methods=['POST'])
+async def fg_search():
+    try:
+        req_data = await request.get_json()
+        item = req_data.get('item')
+        loc = req_data.get('loc')
+        sku_id = f"{item}@{loc}"
+        if not item or not loc:
+            return jsonify({'error': 'Item and Location are required'}), 400
+        result = await run_single(FG_HEALTH_QUERY, sku_id=sku_id)
+        if not result:
+            return jsonify({'found': False, 'sku': sku_id})
+        return jsonify(build_health_report(result))
+    except Exception as e:
+        print(f"An error occurred in fg_search: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/fg-health-batch', methods=['POST'])
+async def fg_health_batch():
+    try:
+        sku_ids = health_request(await request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    async def generate():
+        try:
+            async with get_async_session() as session:
+                async for chunk in stream_health_ndjson_async(session, sku_ids):
+                    yield chunk
+        except Exception as e:
+            print(f"An error occurred in fg_health_batch: {e}")
+            yield json.dumps({'type': 'error', 'data': 'Internal server error'}) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@async_constraints_bp.route('/api/constraints/resource-time-phase', methods=['GET'])
+async def get_resource_time_phase_data():
+    try:
+        res_id_filter = request.args.get('resId')
+        if not res_id_filter:
+            return jsonify({'error': 'resId query parameter is required'}), 400
+        return jsonify(await run_list(cq.RESOURCE_TIME_PHASE_QUERY, resId=res_id_filter))
+    except Exception as e:
+        print(f"An error occurred in get_resource_time_phase_data: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/time-phase-matrix', methods=['GET'])
+@conditional_get()
+async def get_time_phase_matrix():
+    try:
+        res_ids, first_week, last_week = cq.time_phase_request(request.args)
+        matrix = await asyncio.to_thread(get_resweek_matrix)
+        return jsonify(matrix.time_phase(res_ids, first_week, last_week))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in get_time_phase_matrix: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/demands-for-resource-week', methods=['POST'])
+async def get_demands_for_resource_week():
+    try:
+        req_data = await request.get_json()
+        res_id = req_data.get('resourceId')
+        week = req_data.get('week')
+        limit = req_data.get('limit')
+        if not res_id or week is None:
+            return jsonify({'error': 'resourceId and week are required'}), 400
+        if limit is not None and (not isinstance(limit, int) or limit < 1):
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        rows, _ = await resource_week_demands(res_id, week, limit=limit)
+        return jsonify(rows)
+    except Exception as e:
+        print(f"An error occurred in get_demands_for_resource_week: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/what-if', methods=['POST'])
+async def capacity_what_if():
+    try:
+        changes, threshold = scenario_request(await request.get_json(silent=True))
+        result = await asyncio.to_thread(run_scenario, changes, threshold, False)
+        props = await demand_properties_async([row['demandId'] for row in listed_demands(result)])
+        return jsonify(attach_demand_properties(result, props))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in capacity_what_if: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/impact-propagation', methods=['POST'])
+async def shortage_impact():
+    try:
+        sources, limit = impact_request(await request.get_json(silent=True))
+        store = get_order_store()
+        totals = dict(zip(ORDER_FILES, await asyncio.gather(*(store.order_totals_async(kind) for kind in ORDER_FILES))))
+        return jsonify(await asyncio.to_thread(propagate_impact, sources, limit, None, totals))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in shortage_impact: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/resource-week-demands', methods=['GET'])
+async def get_resource_week_demands():
+    try:
+        res_id = request.args.get('resId')
+        week = request.args.get('week', type=int)
+        if not res_id or week is None:
+            return jsonify({'error': 'resId and week query parameters are required'}), 400
+        limit, after = page_request(request.args)
+        offset = cq.resource_week_offset(after)
+        rows, index = await resource_week_demands(res_id, week, offset, limit + 1)
+        return jsonify(cq.resource_week_page(rows, offset, limit, index.count(res_id, week)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in get_resource_week_demands: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/demand-resource-weeks', methods=['GET'])
+async def get_demand_resource_weeks():
+    try:
+        demand_id = request.args.get('demandId')
+        if not demand_id:
+            return jsonify({'error': 'demandId query parameter is required'}), 400
+        index = await asyncio.to_thread(get_pegging_index)
+        return jsonify({'demandId': demand_id, 'resourceWeeks': index.resource_weeks(demand_id)})
+    except Exception as e:
+        print(f"An error occurred in get_demand_resource_weeks: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/summary', methods=['GET'])
+@conditional_get()
+async def get_constraints_summary():
+    try:
+        results = await asyncio.gather(
+            run_single(cq.CONSTRAINED_RESOURCE_COUNT_QUERY),
+            run_single(cq.BOTTLENECK_SKU_COUNT_QUERY),
+            run_single(cq.IMPACTED_DEMANDS_SUMMARY_QUERY),
+        )
+        return jsonify(cq.build_constraints_summary(*results))
+    except Exception as e:
+        print(f"An error occurred in get_constraints_summary: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/impacted-demands', methods=['GET'])
+async def get_impacted_demands():
+    try:
+        limit, after = page_request(request.args)
+        records, total = await asyncio.gather(
+            demand_page_records(cq.IMPACTED_DEMAND_PHASES, limit, after),
+            cached_count_async(cq.IMPACTED_DEMAND_COUNT_QUERY),
+        )
+        return jsonify(cq.impacted_demand_page(records, limit, total))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in get_impacted_demands: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/order-search', methods=['POST'])
+async def search_order_constraints():
+    try:
+        data = await request.get_json()
+        order_id = data.get('orderId')
+        if not order_id:
+            return jsonify({'error': 'orderId is required'}), 400
+        return jsonify(build_order_search(await run_single(ORDER_LOOKUP_QUERY, order_id=order_id)))
+    except Exception as e:
+        print(f"An error occurred in search_order_constraints: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/order-suggest', methods=['GET'])
+async def suggest_orders():
+    try:
+        query, params = suggest_request(request.args)
+        return jsonify([record['orderId'] for record in await run_records(query, **params)])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in suggest_orders: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/constrained-resources', methods=['GET'])
+@conditional_get()
+async def get_constrained_resources():
+    try:
+        return jsonify(await cq.constrained_resources_cache.get_async(load_constrained_resources))
+    except Exception as e:
+        print(f"An error occurred in get_constrained_resources: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/constraint-demands', methods=['GET'])
+async def get_constraint_demands():
+    try:
+        constraint_id = request.args.get('constraintId')
+        if not constraint_id:
+            return jsonify({'error': 'constraintId query parameter is required'}), 400
+        limit, after = page_request(request.args)
+        records, total = await asyncio.gather(
+            demand_page_records(cq.CONSTRAINT_DEMAND_PHASES, limit, after, constraint_id=constraint_id),
+            cached_count_async(cq.CONSTRAINT_DEMAND_COUNT_QUERY, constraint_id=constraint_id),
+        )
+        return jsonify(cq.constraint_demand_page(records, limit, total))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in get_constraint_demands: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_constraints_bp.route('/api/constraints/bottleneck-skus', methods=['GET'])
+async def get_bottleneck_skus():
+    try:
+        return jsonify(await paged_sku_list(cq.BOTTLENECK_SKUS_QUERY, cq.BOTTLENECK_SKU_COUNT_QUERY))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
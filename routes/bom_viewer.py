@@ -1,18 +1,35 @@
 # routes/bom_viewer.py
-from flask import Blueprint, jsonify, request
-import os
-from utils.neo4j_handler import get_db, serialize_path
+from flask import Blueprint, Response, jsonify, request
+import json
+from utils.neo4j_handler import get_session, run_parallel, server_timing
+from utils.network_queries import (fetch_sku_network, fetch_resource_network, fetch_shortest_path, stream_graph_ndjson,
+                                   graph_to_ndjson, SKU_NETWORK_GRAPH_QUERY, RESOURCE_NETWORK_GRAPH_QUERY,
+                                   GRAPH_FORMAT, PATHS_FORMAT)
+from utils.supply_graph import get_supply_graph, use_memory_engine
+from utils.lead_time_path import find_lead_time_path, lead_time_path_graph, shortest_lead_time_path
 
 bom_viewer_bp = Blueprint('bom_viewer_bp', __name__)
 
+SKU_DETAILS_QUERY = "MATCH (s:SKU {sku_id: $sku_id}) RETURN s"
+
+def ndjson_network_response(query, **params):
+    """Streams a network as NDJSON; the session stays open only while the cursor is being written out."""
+    def generate():
+        try:
+            with get_session() as session:
+                yield from stream_graph_ndjson(session, query, **params)
+        except Exception as e:
+            print(f"An error occurred while streaming a network: {e}")
+            yield json.dumps({'type': 'error', 'data': 'Internal server error'}) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson')
+
 @bom_viewer_bp.route('/api/sku-details', methods=['POST'])
 def get_sku_details():
     try:
         data = request.json
         sku_id = data.get('sku_id')
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            result = session.run("MATCH (s:SKU {sku_id: $sku_id}) RETURN s", sku_id=sku_id).single()
+        with get_session() as session:
+            result = session.run(SKU_DETAILS_QUERY, sku_id=sku_id).single()
             return jsonify({'found': True, 'properties': dict(result['s'])}) if result else jsonify({'found': False})
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
@@ -22,11 +39,19 @@ def get_network_graph():
     try:
         data = request.json
         sku_id = data.get('sku_id')
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            cypher_query = "MATCH (s:SKU {sku_id: $sku_id}) CALL(s) { WITH s OPTIONAL MATCH up = (u)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(s) RETURN collect(DISTINCT up) AS ups } CALL(s) { WITH s OPTIONAL MATCH down = (s)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(d) RETURN collect(DISTINCT down) AS downs } WITH s, [p IN ups WHERE p IS NOT NULL] + [p IN downs WHERE p IS NOT NULL] AS netPaths UNWIND netPaths AS p UNWIND nodes(p) AS n WITH s, collect(DISTINCT p) AS allPaths, collect(DISTINCT n) AS nodesInNet WITH allPaths, [n IN nodesInNet WHERE n:BOM] AS bomNodes UNWIND bomNodes AS bn OPTIONAL MATCH rp = (res:Res)-[:USES_RESOURCE]->(bn) WITH allPaths, collect(DISTINCT rp) AS resPaths WITH [p IN resPaths WHERE p IS NOT NULL] AS resPathsClean, allPaths WITH allPaths + resPathsClean AS combinedPaths UNWIND combinedPaths AS path RETURN path;"
-            result = session.run(cypher_query, sku_id=sku_id)
-            return jsonify([serialize_path(row['path']) for row in result])
+        # 'graph' returns one copy of each node/relationship keyed by element id; 'paths' is the older path list.
+        # 'stream' writes the graph as NDJSON while the query result is still being read.
+        # engine='memory' (or GRAPH_ENGINE=memory) answers graph/stream requests from the in-memory snapshot.
+        fmt = data.get('format', PATHS_FORMAT)
+        if use_memory_engine(data) and (fmt == GRAPH_FORMAT or data.get('stream')):
+            graph = get_supply_graph().network_for_sku(sku_id)
+            if data.get('stream'):
+                return Response(graph_to_ndjson(graph), mimetype='application/x-ndjson')
+            return jsonify(graph)
+        if data.get('stream'):
+            return ndjson_network_response(SKU_NETWORK_GRAPH_QUERY, sku_id=sku_id)
+        with get_session() as session:
+            return jsonify(fetch_sku_network(session, sku_id, fmt))
     except Exception as e:
         return jsonify({'error': 'Internal server error.'}), 500
 
@@ -35,16 +60,47 @@ def get_network_with_shortest_path():
     try:
         data = request.json
         sku_id = data.get('sku_id')
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            full_network_query = "MATCH (s:SKU {sku_id: $sku_id}) CALL(s) { WITH s OPTIONAL MATCH up = (u)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(s) RETURN collect(DISTINCT up) AS ups } CALL(s) { WITH s OPTIONAL MATCH down = (s)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(d) RETURN collect(DISTINCT down) AS downs } WITH s, [p IN ups WHERE p IS NOT NULL] + [p IN downs WHERE p IS NOT NULL] AS netPaths UNWIND netPaths AS p UNWIND nodes(p) AS n WITH s, collect(DISTINCT p) AS allPaths, collect(DISTINCT n) AS nodesInNet WITH allPaths, [n IN nodesInNet WHERE n:BOM] AS bomNodes UNWIND bomNodes AS bn OPTIONAL MATCH rp = (res:Res)-[:USES_RESOURCE]->(bn) WITH allPaths, collect(DISTINCT rp) AS resPaths WITH [p IN resPaths WHERE p IS NOT NULL] AS resPathsClean, allPaths WITH allPaths + resPathsClean AS combinedPaths UNWIND combinedPaths AS path RETURN path;"
-            full_network_result = session.run(full_network_query, sku_id=sku_id)
-            full_network_paths = [serialize_path(row['path']) for row in full_network_result]
-            shortest_path_query = "MATCH (d:SKU {sku_id: $sku_id}) WHERE d.demand_sku = true AND coalesce(d.broken_bom,false) = false MATCH path = (srcNode)-[:CONSUMED_BY|PRODUCES|SOURCING|PURCH_FROM*1..50]->(d) WHERE (srcNode:PurchGroup OR (srcNode:SKU AND coalesce(srcNode.infinite_supply,false) = true)) AND NONE(n IN nodes(path) WHERE coalesce(n.broken_bom,false) = true) WITH d, path, head(nodes(path)) AS sourceNode, reduce(totalLT = 0, r IN relationships(path) | totalLT + coalesce(r.lead_time,0)) AS pathLeadTime WITH d, collect({p:path, src:sourceNode, leadTime:pathLeadTime}) AS allPaths WITH d, [x IN allPaths WHERE x.src:PurchGroup] AS purchPaths, [x IN allPaths WHERE NOT x.src:PurchGroup] AS skuPaths WITH d, CASE WHEN size(purchPaths) > 0 THEN purchPaths ELSE skuPaths END AS candidatePaths UNWIND candidatePaths AS cp WITH d, cp ORDER BY cp.leadTime ASC WITH d, collect(cp)[0] AS chosenPath WITH chosenPath, [n IN nodes(chosenPath.p) WHERE n:BOM] AS bomNodes UNWIND bomNodes AS bn OPTIONAL MATCH rp = (res:Res)-[:USES_RESOURCE]->(bn) WITH chosenPath, [p IN collect(DISTINCT rp) WHERE p IS NOT NULL] AS resPaths WITH resPaths + [chosenPath.p] AS allPaths UNWIND allPaths AS path RETURN path;"
-            shortest_path_result = session.run(shortest_path_query, sku_id=sku_id)
-            shortest_path_paths = [serialize_path(row['path']) for row in shortest_path_result]
-        return jsonify({'full_network': full_network_paths, 'shortest_path': shortest_path_paths})
+        fmt = data.get('format', PATHS_FORMAT)
+        if use_memory_engine(data) and fmt == GRAPH_FORMAT:
+            graph = get_supply_graph()
+            full_network = graph.network_for_sku(sku_id)
+            shortest_path = lead_time_path_graph(graph, find_lead_time_path(graph, sku_id))
+            return jsonify({'full_network': full_network, 'shortest_path': shortest_path})
+        results, timings = run_parallel({
+            'fullNetwork': lambda session: fetch_sku_network(session, sku_id, fmt),
+            'shortestPath': lambda session: fetch_shortest_path(session, sku_id, fmt),
+        })
+        data = {'full_network': results['fullNetwork'], 'shortest_path': results['shortestPath']}
+        return jsonify(data), 200, {'Server-Timing': server_timing(timings)}
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bom_viewer_bp.route('/api/shortest-lead-time-path', methods=['POST'])
+def get_shortest_lead_time_path():
+    """Shortest lead-time supply path for one demand SKU, computed on the in-memory snapshot."""
+    try:
+        data = request.json
+        sku_id = data.get('sku_id')
+        if not sku_id:
+            return jsonify({'error': 'sku_id is required'}), 400
+        return jsonify(shortest_lead_time_path(get_supply_graph(), sku_id))
     except Exception as e:
+        print(f"An error occurred in get_shortest_lead_time_path: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bom_viewer_bp.route('/api/in-network', methods=['POST'])
+def get_in_network():
+    """Whether other_sku_id is upstream or downstream of sku_id, answered from the reachability index."""
+    try:
+        data = request.json
+        sku_id = data.get('sku_id')
+        other_sku_id = data.get('other_sku_id')
+        if not sku_id or not other_sku_id:
+            return jsonify({'error': 'sku_id and other_sku_id are required'}), 400
+        in_network = get_supply_graph().in_network(sku_id, other_sku_id)
+        return jsonify({'sku_id': sku_id, 'other_sku_id': other_sku_id, 'found': in_network is not None, 'inNetwork': bool(in_network)})
+    except Exception as e:
+        print(f"An error occurred in get_in_network: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @bom_viewer_bp.route('/api/resource-network', methods=['POST'])
@@ -52,10 +108,15 @@ def get_resource_network():
     try:
         data = request.json
         res_id = data.get('res_id')
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            cypher_query = "MATCH (r:Res {res_id: $res_id}) OPTIONAL MATCH rb = (r)-[:USES_RESOURCE]->(b:BOM) WITH r, collect(DISTINCT rb) AS resBomPaths, collect(DISTINCT b) AS startBomNodes UNWIND startBomNodes AS sb OPTIONAL MATCH p_prod = (sb)-[:PRODUCES]->(s:SKU) WITH r, resBomPaths, collect(DISTINCT p_prod) AS bomSkuPaths, collect(DISTINCT s) AS seedSkus UNWIND seedSkus AS seed CALL(seed) { WITH seed OPTIONAL MATCH up = (u)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(seed) RETURN collect(DISTINCT up) AS ups } CALL(seed) { WITH seed OPTIONAL MATCH down = (seed)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(d) RETURN collect(DISTINCT down) AS downs } WITH r, resBomPaths, bomSkuPaths, ([p IN ups WHERE p IS NOT NULL] + [p IN downs WHERE p IS NOT NULL]) AS sPaths WITH r, resBomPaths, bomSkuPaths, collect(sPaths) AS skuPathSets WITH r, resBomPaths, bomSkuPaths, reduce(acc = [], ps IN skuPathSets | acc + ps) AS skuPaths UNWIND skuPaths AS sp UNWIND nodes(sp) AS n WITH r, resBomPaths, bomSkuPaths, skuPaths, collect(DISTINCT n) AS nodesInNet WITH r, resBomPaths, bomSkuPaths, skuPaths, [x IN nodesInNet WHERE x:BOM] AS bomInNet UNWIND bomInNet AS bn OPTIONAL MATCH r2b = (r2:Res)-[:USES_RESOURCE]->(bn) WITH resBomPaths, bomSkuPaths, skuPaths, collect(DISTINCT r2b) AS extraResPaths WITH resBomPaths + bomSkuPaths + skuPaths + extraResPaths AS allPaths UNWIND allPaths AS path WITH path WHERE path IS NOT NULL RETURN DISTINCT path;"
-            result = session.run(cypher_query, res_id=res_id)
-            return jsonify([serialize_path(row['path']) for row in result])
+        fmt = data.get('format', PATHS_FORMAT)
+        if use_memory_engine(data) and (fmt == GRAPH_FORMAT or data.get('stream')):
+            graph = get_supply_graph().network_for_resource(res_id)
+            if data.get('stream'):
+                return Response(graph_to_ndjson(graph), mimetype='application/x-ndjson')
+            return jsonify(graph)
+        if data.get('stream'):
+            return ndjson_network_response(RESOURCE_NETWORK_GRAPH_QUERY, res_id=res_id)
+        with get_session() as session:
+            return jsonify(fetch_resource_network(session, res_id, fmt))
     except Exception as e:
-        return jsonify({'error': 'Internal server error'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Internal server error'}), 500
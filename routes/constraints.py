@@ -1,10 +1,242 @@
 # routes/constraints.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
+import json
 import os
-from utils.neo4j_handler import get_db
+from utils.neo4j_handler import get_session, run_parallel, single, server_timing
+from utils.graph_snapshot import SnapshotCache
+from utils.pagination import page_request, build_page, cached_count
+from utils.data_version import conditional_get
+from utils.resweek import get_resweek_matrix
+from utils.pegging_index import get_pegging_index, demand_properties
+from utils.order_lookup import ORDER_LOOKUP_QUERY, build_order_search, suggest_request
+from utils.fg_health import FG_HEALTH_QUERY, build_health_report, health_request, stream_health_ndjson
+from utils.capacity_whatif import scenario_request, run_scenario
+from utils.impact_propagation import impact_request, propagate_impact
+from routes.dashboard import sku_page_params, sku_page
 
 constraints_bp = Blueprint('constraints_bp', __name__)
 
+# Maximum age of the constrained-resources summary even when the snapshot version does not move.
+CONSTRAINT_SUMMARY_CACHE_SECONDS = float(os.getenv("CONSTRAINT_SUMMARY_CACHE_SECONDS", "300"))
+
+# Queries are shared with the async handlers in routes/async_routes.py.
+RESOURCE_TIME_PHASE_QUERY = """
+MATCH (r:Res {res_id: $resId})
+MATCH (rw:ResWeek {res_id: $resId})
+RETURN r.res_id AS resId, r.res_descr AS resDescr, collect(properties(rw)) AS weeklyData
+"""
+
+CONSTRAINED_RESOURCE_COUNT_QUERY = """
+MATCH (r:Res)-[:HAS_CONSTRAINT]->(c:Constraint)
+RETURN count(DISTINCT r) AS constrainedResourceCount
+"""
+
+BOTTLENECK_SKU_COUNT_QUERY = "MATCH (s:SKU {bottleneck: true}) RETURN count(s) AS count"
+
+IMPACTED_DEMANDS_SUMMARY_QUERY = """
+MATCH (c:Constraint)-[:IMPACTS_DEMAND]->(d:Demand)
+RETURN count(DISTINCT d) AS orderCount, sum(d.qty) AS totalQty
+"""
+
+# Impacted demands are paged in two phases: demands with a date by keyset on (date, elementId), then
+# demands without one by elementId. In the date phase the demand_date range index (utils/order_lookup.py)
+# returns demands in date order, so a page reads about $limit demands and only demands sharing a date
+# are sorted by id; the next page seeks from the date of the previous page's last demand, read from
+# that node so dates of any type compare as stored. Demands without a date are not in the index and
+# are found by a label scan, once the dated ones run out. Constraints are collected per page.
+_IMPACTED_DEMAND_ROWS = """
+WITH d
+ORDER BY d.date, elementId(d)
+LIMIT $limit
+CALL(d) {
+    MATCH (c:Constraint)-[:IMPACTS_DEMAND]->(d)
+    RETURN collect(properties(c)) AS constraints
+}
+RETURN properties(d) AS demand, constraints, d.date IS NULL AS undated, elementId(d) AS id
+"""
+
+IMPACTED_DEMANDS_QUERY = """
+MATCH (d:Demand)
+WHERE d.date IS NOT NULL AND EXISTS { (d)<-[:IMPACTS_DEMAND]-(:Constraint) }
+""" + _IMPACTED_DEMAND_ROWS
+
+IMPACTED_DEMANDS_AFTER_QUERY = """
+MATCH (last:Demand) WHERE elementId(last) = $after_id
+WITH last.date AS after_date
+MATCH (d:Demand)
+WHERE d.date >= after_date AND (d.date > after_date OR elementId(d) > $after_id)
+  AND EXISTS { (d)<-[:IMPACTS_DEMAND]-(:Constraint) }
+""" + _IMPACTED_DEMAND_ROWS
+
+IMPACTED_UNDATED_DEMANDS_QUERY = """
+MATCH (d:Demand)
+WHERE d.date IS NULL AND elementId(d) > $after_id AND EXISTS { (d)<-[:IMPACTS_DEMAND]-(:Constraint) }
+""" + _IMPACTED_DEMAND_ROWS
+
+# (first dated page, next dated page, undated page) for demand_page_records.
+IMPACTED_DEMAND_PHASES = (IMPACTED_DEMANDS_QUERY, IMPACTED_DEMANDS_AFTER_QUERY, IMPACTED_UNDATED_DEMANDS_QUERY)
+
+IMPACTED_DEMAND_COUNT_QUERY = """
+MATCH (d:Demand)
+WHERE EXISTS { (d)<-[:IMPACTS_DEMAND]-(:Constraint) }
+RETURN count(d) AS count
+"""
+
+# Summary only: per constraint its demand count and quantity, not the demands themselves.
+CONSTRAINED_RESOURCES_QUERY = """
+MATCH (r:Res)-[:HAS_CONSTRAINT]->(c:Constraint)
+CALL(c) {
+    OPTIONAL MATCH (c)-[:IMPACTS_DEMAND]->(d:Demand)
+    RETURN count(d) AS demandCount, coalesce(sum(d.qty), 0) AS totalDemandQty
+}
+WITH r, c, demandCount, totalDemandQty
+ORDER BY c.week
+WITH r, collect({constraintId: elementId(c), constraint: properties(c), demandCount: demandCount,
+                 totalDemandQty: totalDemandQty}) AS constraintDetails,
+     sum(demandCount) AS demandCount, sum(totalDemandQty) AS totalDemandQty
+RETURN r, constraintDetails, demandCount, totalDemandQty
+ORDER BY size(constraintDetails) DESC
+"""
+
+# Same two phases as the impacted demands, but expanded from the one constraint: no index orders the
+# demands of a constraint, so each page reads and sorts that constraint's demands of the phase.
+_CONSTRAINT_DEMAND_ROWS = """
+WITH d
+ORDER BY d.date, elementId(d)
+LIMIT $limit
+RETURN properties(d) AS demand, d.date IS NULL AS undated, elementId(d) AS id
+"""
+
+CONSTRAINT_DEMANDS_QUERY = """
+MATCH (c:Constraint)-[:IMPACTS_DEMAND]->(d:Demand)
+WHERE elementId(c) = $constraint_id AND d.date IS NOT NULL
+""" + _CONSTRAINT_DEMAND_ROWS
+
+CONSTRAINT_DEMANDS_AFTER_QUERY = """
+MATCH (last:Demand) WHERE elementId(last) = $after_id
+WITH last.date AS after_date
+MATCH (c:Constraint)-[:IMPACTS_DEMAND]->(d:Demand)
+WHERE elementId(c) = $constraint_id
+  AND d.date >= after_date AND (d.date > after_date OR elementId(d) > $after_id)
+""" + _CONSTRAINT_DEMAND_ROWS
+
+CONSTRAINT_UNDATED_DEMANDS_QUERY = """
+MATCH (c:Constraint)-[:IMPACTS_DEMAND]->(d:Demand)
+WHERE elementId(c) = $constraint_id AND d.date IS NULL AND elementId(d) > $after_id
+""" + _CONSTRAINT_DEMAND_ROWS
+
+CONSTRAINT_DEMAND_PHASES = (CONSTRAINT_DEMANDS_QUERY, CONSTRAINT_DEMANDS_AFTER_QUERY, CONSTRAINT_UNDATED_DEMANDS_QUERY)
+
+CONSTRAINT_DEMAND_COUNT_QUERY = """
+MATCH (c:Constraint)-[:IMPACTS_DEMAND]->(d:Demand)
+WHERE elementId(c) = $constraint_id
+RETURN count(d) AS count
+"""
+
+BOTTLENECK_SKUS_QUERY = """
+MATCH (s:SKU)
+WHERE s.sku_id > $after AND s.bottleneck = true
+RETURN s
+ORDER BY s.sku_id
+LIMIT $limit
+"""
+
+def build_constraints_summary(res_result, sku_result, demands_result):
+    return {
+        'constrainedResourceCount': res_result['constrainedResourceCount'] if res_result else 0,
+        'bottleneckSkusCount': sku_result['count'] if sku_result else 0,
+        'impactedDemandsCount': demands_result.get('orderCount') or 0,
+        'impactedDemandsQty': demands_result.get('totalQty') or 0
+    }
+
+def demand_page_position(after):
+    """(phase, id of the last demand) of a demand page cursor: phase 0 pages dated demands, 1 undated ones."""
+    if not after:
+        return 0, None
+    if len(after) != 2 or after[0] not in (0, 1) or isinstance(after[0], bool) or not isinstance(after[1], str):
+        raise ValueError('Invalid cursor')
+    return after[0], after[1]
+
+def demand_page_key(record):
+    return [int(record['undated']), record['id']]
+
+def demand_phase_query(phases, phase, after_id):
+    """(query, after_id) of the next rows: `phases` is (first dated page, next dated page, undated page)."""
+    if phase == 1:
+        return phases[2], after_id
+    return (phases[0], '') if after_id is None else (phases[1], after_id)
+
+def demand_page_records(run, phases, limit, after, **params):
+    """
+    limit + 1 rows of a date-then-id demand page; run(query, **params) returns a query's records.
+    The undated phase is only queried when the dated rows do not fill the page.
+    """
+    phase, after_id = demand_page_position(after)
+    query, after_id = demand_phase_query(phases, phase, after_id)
+    records = list(run(query, limit=limit + 1, after_id=after_id, **params))
+    if phase == 0 and len(records) <= limit:
+        records += list(run(phases[2], limit=limit + 1 - len(records), after_id='', **params))
+    return records
+
+def impacted_demand_page(records, limit, total):
+    return build_page(records, limit, lambda record: {'demand': record['demand'], 'constraints': record['constraints']},
+                      demand_page_key, total)
+
+def time_phase_request(args):
+    """(resource ids, first week, last week) from ?resId= (repeated or comma-separated), ?fromWeek=, ?toWeek=."""
+    res_ids = [res_id for value in args.getlist('resId') for res_id in value.split(',') if res_id]
+    if not res_ids:
+        raise ValueError('resId query parameter is required')
+    return res_ids, args.get('fromWeek', type=int), args.get('toWeek', type=int)
+
+def resource_week_rows(pegs, props):
+    return [{'demandId': demand_id, 'demand': props.get(demand_id), 'loadQty': load} for demand_id, load in pegs]
+
+def resource_week_demands(res_id, week, offset=0, limit=None):
+    """[{demandId, demand, loadQty}] pegged to a resource-week, largest load first, from the pegging index."""
+    pegs = get_pegging_index().demands_for(res_id, week, offset, limit)
+    return resource_week_rows(pegs, demand_properties([demand_id for demand_id, _ in pegs]))
+
+def resource_week_offset(after):
+    """Position the page starts at; the cursor is the position of the last row returned."""
+    try:
+        return int(after[0]) + 1 if after else 0
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+def resource_week_page(rows, offset, limit, total):
+    return build_page(enumerate(rows, start=offset), limit, lambda row: row[1], lambda row: [row[0]], total)
+
+def resource_week_demand_page(res_id, week, limit, after):
+    """One page of resource_week_demands."""
+    offset = resource_week_offset(after)
+    rows = resource_week_demands(res_id, week, offset, limit + 1)
+    return resource_week_page(rows, offset, limit, get_pegging_index().count(res_id, week))
+
+def serialize_constrained_resource(record):
+    return {
+        "properties": dict(record['r']),
+        "constraintCount": len(record['constraintDetails']),
+        "demandCount": record['demandCount'],
+        "totalDemandQty": record['totalDemandQty'],
+        "constraintDetails": record['constraintDetails']
+    }
+
+def load_constrained_resources():
+    with get_session() as session:
+        return [serialize_constrained_resource(record) for record in session.run(CONSTRAINED_RESOURCES_QUERY)]
+
+# Constraint and IMPACTS_DEMAND changes move the snapshot version, which reloads the summary.
+# Shared with the async handler, which reloads it through the async driver.
+constrained_resources_cache = SnapshotCache(load_constrained_resources, CONSTRAINT_SUMMARY_CACHE_SECONDS)
+
+def constrained_resources():
+    """The constrained-resources summary, computed once per snapshot version."""
+    return constrained_resources_cache.get()
+
+def constraint_demand_page(records, limit, total):
+    return build_page(records, limit, lambda record: record['demand'], demand_page_key, total)
+
 @constraints_bp.route('/api/constraints/fg-search', methods=['POST'])
 def fg_search():
     """
@@ -20,56 +252,38 @@ def fg_search():
         if not item or not loc:
             return jsonify({'error': 'Item and Location are required'}), 400
 
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = """
-            MATCH (s:SKU {sku_id: $sku_id})
-            CALL(s) {
-                WITH s
-                MATCH (s)<-[:IS_FOR_SKU]-(d:Demand)
-                RETURN collect(d {.*, broken_bom: s.broken_bom}) AS all_demands, 
-                       count(d) AS total_demand_count, 
-                       coalesce(sum(d.qty), 0) AS total_demand_qty
-            }
-            CALL(s) {
-                WITH s
-                MATCH (s)<-[:IS_FOR_SKU]-(d:Demand)<-[:IMPACTS_DEMAND]-(c:Constraint)
-                WITH s, d, collect(properties(c)) as demand_constraints
-                WITH s, collect(d {.*, broken_bom: s.broken_bom, constraints: demand_constraints}) AS constrained_demands, 
-                     count(d) as constrained_demand_count,
-                     coalesce(sum(d.qty), 0) as constrained_demand_qty
-                MATCH (s)<-[:IS_FOR_SKU]-(d:Demand)<-[:IMPACTS_DEMAND]-(c:Constraint)
-                RETURN constrained_demands, constrained_demand_count, constrained_demand_qty, 
-                       collect(DISTINCT properties(c)) as constraints
-            }
-            RETURN s.sku_id as sku, all_demands, total_demand_count, total_demand_qty, 
-                   constrained_demands, constrained_demand_count, constrained_demand_qty, constraints
-            """
-            result = session.run(query, sku_id=sku_id).single()
+        with get_session() as session:
+            result = session.run(FG_HEALTH_QUERY, sku_id=sku_id).single()
 
             if not result:
                 return jsonify({'found': False, 'sku': sku_id})
 
-            total_qty = result['total_demand_qty']
-            constrained_qty = result['constrained_demand_qty']
-            status = "Healthy"
-            if constrained_qty > 0:
-                percentage_constrained = constrained_qty / total_qty if total_qty > 0 else 0
-                if percentage_constrained >= 0.5:
-                    status = "Constrained"
-                else:
-                    status = "At Risk"
-            
-            response_data = dict(result)
-            response_data['status'] = status
-            response_data['found'] = True
-
-            return jsonify(response_data)
+            return jsonify(build_health_report(result))
 
     except Exception as e:
         print(f"An error occurred in fg_search: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@constraints_bp.route('/api/constraints/fg-health-batch', methods=['POST'])
+def fg_health_batch():
+    """
+    Health status of many SKUs, {"skus": [{"item", "loc"}, ...]}, streamed as NDJSON: one
+    {"type": "status", "data": {...}} line per SKU in request order (utils/fg_health.py).
+    """
+    try:
+        sku_ids = health_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        try:
+            with get_session() as session:
+                yield from stream_health_ndjson(session, sku_ids)
+        except Exception as e:
+            print(f"An error occurred in fg_health_batch: {e}")
+            yield json.dumps({'type': 'error', 'data': 'Internal server error'}) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson')
+
 
 # ## MODIFICATION START ## - This function has been simplified and corrected
 @constraints_bp.route('/api/constraints/resource-time-phase', methods=['GET'])
@@ -81,16 +295,10 @@ def get_resource_time_phase_data():
         res_id_filter = request.args.get('resId')
         if not res_id_filter:
             return jsonify({'error': 'resId query parameter is required'}), 400
-            
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = """
-            MATCH (r:Res {res_id: $resId})
-            MATCH (rw:ResWeek {res_id: $resId})
-            RETURN r.res_id AS resId, r.res_descr AS resDescr, collect(properties(rw)) AS weeklyData
-            """
-            result = session.run(query, resId=res_id_filter)
-            
+
+        with get_session() as session:
+            result = session.run(RESOURCE_TIME_PHASE_QUERY, resId=res_id_filter)
+
             data = [dict(record) for record in result]
             return jsonify(data)
     except Exception as e:
@@ -98,65 +306,119 @@ def get_resource_time_phase_data():
         return jsonify({'error': 'Internal server error'}), 500
 # ## MODIFICATION END ##
 
+@constraints_bp.route('/api/constraints/time-phase-matrix', methods=['GET'])
+@conditional_get()
+def get_time_phase_matrix():
+    """
+    Capacity, load and utilization per week for one or many resources, already pivoted, from the
+    in-memory ResWeek matrix (utils/resweek.py).
+    """
+    try:
+        res_ids, first_week, last_week = time_phase_request(request.args)
+        return jsonify(get_resweek_matrix().time_phase(res_ids, first_week, last_week))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in get_time_phase_matrix: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @constraints_bp.route('/api/constraints/demands-for-resource-week', methods=['POST'])
 def get_demands_for_resource_week():
     """
-    For a given resource and week, finds all demands pegged to it.
+    For a given resource and week, finds all demands pegged to it, largest load first.
+    Served from the pegging index (utils/pegging_index.py); an optional `limit` keeps the top N.
     """
     try:
         req_data = request.json
         res_id = req_data.get('resourceId')
         week = req_data.get('week')
+        limit = req_data.get('limit')
 
         if not res_id or week is None:
             return jsonify({'error': 'resourceId and week are required'}), 400
+        if limit is not None and (not isinstance(limit, int) or limit < 1):
+            return jsonify({'error': 'limit must be a positive integer'}), 400
 
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = """
-            MATCH (d:Demand)-[p:PEGGED_TO_RESOURCE]->(r:Res {res_id: $res_id})
-            WHERE p.week = $week
-            RETURN properties(d) as demand, p.loadQty as loadQty
-            ORDER BY loadQty DESC
-            """
-            result = session.run(query, res_id=res_id, week=week)
-            data = [dict(record) for record in result]
-            return jsonify(data)
+        return jsonify(resource_week_demands(res_id, week, limit=limit))
     except Exception as e:
         print(f"An error occurred in get_demands_for_resource_week: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@constraints_bp.route('/api/constraints/resource-week-demands', methods=['GET'])
+def get_resource_week_demands():
+    """One page of the demands pegged to ?resId= in ?week=, largest load first: ?limit= and ?cursor=."""
+    try:
+        res_id = request.args.get('resId')
+        week = request.args.get('week', type=int)
+        if not res_id or week is None:
+            return jsonify({'error': 'resId and week query parameters are required'}), 400
+        limit, after = page_request(request.args)
+        return jsonify(resource_week_demand_page(res_id, week, limit, after))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in get_resource_week_demands: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@constraints_bp.route('/api/constraints/demand-resource-weeks', methods=['GET'])
+def get_demand_resource_weeks():
+    """The resource-weeks a demand (?demandId=, its element id) loads, by resource and week."""
+    try:
+        demand_id = request.args.get('demandId')
+        if not demand_id:
+            return jsonify({'error': 'demandId query parameter is required'}), 400
+        return jsonify({'demandId': demand_id, 'resourceWeeks': get_pegging_index().resource_weeks(demand_id)})
+    except Exception as e:
+        print(f"An error occurred in get_demand_resource_weeks: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@constraints_bp.route('/api/constraints/what-if', methods=['POST'])
+def capacity_what_if():
+    """
+    Capacity scenario, {"changes": [{"resId" | "resIds", "fromWeek", "toWeek", "capacityPct",
+    "capacityDelta"}], "threshold"}: which resource-weeks and demands stop (or start) being
+    constrained. Computed in memory (utils/capacity_whatif.py); nothing is written.
+    """
+    try:
+        changes, threshold = scenario_request(request.get_json(silent=True))
+        return jsonify(run_scenario(changes, threshold))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in capacity_what_if: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@constraints_bp.route('/api/constraints/impact-propagation', methods=['POST'])
+def shortage_impact():
+    """
+    Finished goods hit by a shortage on any of {"sources": [{"resId" | "skuId" | "nodeId"}]},
+    with their order quantities, propagated on the in-memory supply snapshot
+    (utils/impact_propagation.py). "limit" caps the listed finished goods.
+    """
+    try:
+        sources, limit = impact_request(request.get_json(silent=True))
+        return jsonify(propagate_impact(sources, limit))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in shortage_impact: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 
 @constraints_bp.route('/api/constraints/summary', methods=['GET'])
+@conditional_get()
 def get_constraints_summary():
     """Provides all summary numbers for the constraints page cards in one call."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            res_query = """
-            MATCH (r:Res)-[:HAS_CONSTRAINT]->(c:Constraint)
-            RETURN count(DISTINCT r) AS constrainedResourceCount
-            """
-            res_result = session.run(res_query).single()
-            constrained_res_count = res_result['constrainedResourceCount'] if res_result else 0
-
-            sku_query = "MATCH (s:SKU {bottleneck: true}) RETURN count(s) AS count"
-            sku_result = session.run(sku_query).single()
-            bottleneck_sku_count = sku_result['count'] if sku_result else 0
-
-            demands_query = """
-            MATCH (c:Constraint)-[:IMPACTS_DEMAND]->(d:Demand)
-            RETURN count(DISTINCT d) AS orderCount, sum(d.qty) AS totalQty
-            """
-            demands_result = session.run(demands_query).single()
-            
-            data = {
-                'constrainedResourceCount': constrained_res_count,
-                'bottleneckSkusCount': bottleneck_sku_count,
-                'impactedDemandsCount': demands_result.get('orderCount') or 0,
-                'impactedDemandsQty': demands_result.get('totalQty') or 0
-            }
-            return jsonify(data)
+        results, timings = run_parallel({
+            'constrainedResources': single(CONSTRAINED_RESOURCE_COUNT_QUERY),
+            'bottleneckSkus': single(BOTTLENECK_SKU_COUNT_QUERY),
+            'impactedDemands': single(IMPACTED_DEMANDS_SUMMARY_QUERY),
+        })
+        data = build_constraints_summary(results['constrainedResources'], results['bottleneckSkus'], results['impactedDemands'])
+        return jsonify(data), 200, {'Server-Timing': server_timing(timings)}
     except Exception as e:
         print(f"An error occurred in get_constraints_summary: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -164,20 +426,14 @@ def get_constraints_summary():
 
 @constraints_bp.route('/api/constraints/impacted-demands', methods=['GET'])
 def get_impacted_demands():
+    """One page of impacted demands by date: ?limit= and ?cursor= (the nextCursor of the previous page)."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = """
-            MATCH (c:Constraint)-[:IMPACTS_DEMAND]->(d:Demand)
-            WITH d, collect(properties(c)) AS constraints
-            RETURN properties(d) AS demand, constraints
-            ORDER BY d.date
-            """
-            result = session.run(query)
-            
-            data = [dict(record) for record in result]
-            return jsonify(data)
-
+        limit, after = page_request(request.args)
+        with get_session() as session:
+            records = demand_page_records(session.run, IMPACTED_DEMAND_PHASES, limit, after)
+        return jsonify(impacted_demand_page(records, limit, cached_count(IMPACTED_DEMAND_COUNT_QUERY)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"An error occurred in get_impacted_demands: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -191,64 +447,69 @@ def search_order_constraints():
         if not order_id:
             return jsonify({'error': 'orderId is required'}), 400
 
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = """
-            MATCH (d:Demand)
-            WHERE d.orderId = $order_id OR d.seqnum = $order_id
-            OPTIONAL MATCH (d)<-[:IMPACTS_DEMAND]-(c:Constraint)
-            RETURN d, collect(c) AS constraints
-            LIMIT 1
-            """
-            result = session.run(query, order_id=order_id).single()
-
-            if not result:
-                return jsonify({'orderDetails': None, 'constraints': []})
-
-            order_details = dict(result['d'])
-            constraints = [dict(node) for node in result['constraints'] if node is not None]
-
-            return jsonify({'orderDetails': order_details, 'constraints': constraints})
+        with get_session() as session:
+            result = session.run(ORDER_LOOKUP_QUERY, order_id=order_id).single()
+            return jsonify(build_order_search(result))
 
     except Exception as e:
         print(f"An error occurred in search_order_constraints: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@constraints_bp.route('/api/constraints/order-suggest', methods=['GET'])
+def suggest_orders():
+    """Order ids for the search box: ?q= with ?match=prefix (default) or contains, and ?limit=."""
+    try:
+        query, params = suggest_request(request.args)
+        with get_session() as session:
+            return jsonify([record['orderId'] for record in session.run(query, **params)])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in suggest_orders: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @constraints_bp.route('/api/constraints/constrained-resources', methods=['GET'])
+@conditional_get()
 def get_constrained_resources():
-    """Gets resources, their constraints, and the demands impacted by each constraint."""
-    try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = """
-            MATCH (r:Res)-[:HAS_CONSTRAINT]->(c:Constraint)
-            OPTIONAL MATCH (c)-[:IMPACTS_DEMAND]->(d:Demand)
-            WITH r, c, collect(properties(d)) AS demands, sum(d.qty) as totalDemandQty
-            WITH r, collect({constraint: properties(c), demands: demands, totalDemandQty: totalDemandQty}) AS constraintDetails
-            RETURN r, constraintDetails
-            ORDER BY size(constraintDetails) DESC
-            """
-            result = session.run(query)
-            
-            data = []
-            for record in result:
-                res_properties = dict(record['r'])
-                data.append({
-                    "properties": res_properties,
-                    "constraintDetails": record['constraintDetails']
-                })
-            return jsonify(data)
+    """
+    Gets resources and their constraints with the count and quantity of impacted demands.
+    The demands themselves are paged from /api/constraints/constraint-demands.
+    """
+    try:
+        return jsonify(constrained_resources())
     except Exception as e:
         print(f"An error occurred in get_constrained_resources: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@constraints_bp.route('/api/constraints/constraint-demands', methods=['GET'])
+def get_constraint_demands():
+    """One page of the demands one constraint (?constraintId=) impacts, by date: ?limit= and ?cursor=."""
+    try:
+        constraint_id = request.args.get('constraintId')
+        if not constraint_id:
+            return jsonify({'error': 'constraintId query parameter is required'}), 400
+        limit, after = page_request(request.args)
+        with get_session() as session:
+            records = demand_page_records(session.run, CONSTRAINT_DEMAND_PHASES, limit, after,
+                                          constraint_id=constraint_id)
+        total = cached_count(CONSTRAINT_DEMAND_COUNT_QUERY, constraint_id=constraint_id)
+        return jsonify(constraint_demand_page(records, limit, total))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"An error occurred in get_constraint_demands: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 
 @constraints_bp.route('/api/constraints/bottleneck-skus', methods=['GET'])
 def get_bottleneck_skus():
+    """One page of bottleneck SKUs by sku_id: ?limit= and ?cursor=."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            result = session.run("MATCH (s:SKU) WHERE s.bottleneck = true RETURN s LIMIT 10")
-            return jsonify([{'id': record['s'].element_id, 'properties': dict(record['s'])} for record in result])
+        limit, after = page_request(request.args)
+        with get_session() as session:
+            records = list(session.run(BOTTLENECK_SKUS_QUERY, limit=limit + 1, **sku_page_params(after)))
+        return jsonify(sku_page(records, limit, cached_count(BOTTLENECK_SKU_COUNT_QUERY)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': 'Internal server error'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Internal server error'}), 500
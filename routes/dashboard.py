@@ -1,87 +1,105 @@
 # routes/dashboard.py
 from flask import Blueprint, jsonify, request
-import random
 import os
-from utils.neo4j_handler import get_db, serialize_record
+from utils.neo4j_handler import get_session
+from utils.order_store import get_order_store
+from utils.topk import ORDER_TOPK_MAX
+from utils.kpi_snapshot import get_kpis, kpi_validators, BROKEN_SKU_COUNT_QUERY, BROKEN_FG_COUNT_QUERY
+from utils.pagination import page_request, build_page, cached_count
+from utils.data_version import conditional_get
 
 dashboard_bp = Blueprint('dashboard_bp', __name__)
 
+# Queries are shared with the async handlers in routes/async_routes.py.
+# Order figures come from the in-memory order store (utils/order_store.py), not LOAD CSV.
+# SKU lists are paged by keyset on the indexed sku_id (utils/pagination.py).
+BROKEN_NETWORKS_QUERY = """
+MATCH (s:SKU)
+WHERE s.sku_id > $after AND s.broken_bom = true
+RETURN s
+ORDER BY s.sku_id
+LIMIT $limit
+"""
+
+BROKEN_DEMAND_NETWORKS_QUERY = """
+MATCH (s:SKU)
+WHERE s.sku_id > $after AND s.broken_bom = true AND s.demand_sku = true
+RETURN s
+ORDER BY s.sku_id
+LIMIT $limit
+"""
+
+# Default number of rows for the affected order lists; ?limit= overrides it up to ORDER_TOPK_MAX.
+AFFECTED_ORDERS_LIMIT = int(os.getenv("AFFECTED_ORDERS_LIMIT", "100"))
+
+def affected_orders_limit(args):
+    try:
+        limit = int(args.get('limit', AFFECTED_ORDERS_LIMIT))
+    except ValueError:
+        limit = AFFECTED_ORDERS_LIMIT
+    return max(1, min(limit, ORDER_TOPK_MAX))
+
+def serialize_sku(record):
+    return {'id': record['s'].element_id, 'properties': dict(record['s'])}
+
+def sku_page_params(after):
+    """Query parameters for a SKU page query; the first page starts after ''."""
+    return {'after': after[0] if after else ''}
+
+def sku_page(records, limit, total):
+    return build_page(records, limit, serialize_sku, lambda record: [record['s']['sku_id']], total)
+
+def paged_sku_list(query, count_query):
+    limit, after = page_request(request.args)
+    with get_session() as session:
+        records = list(session.run(query, limit=limit + 1, **sku_page_params(after)))
+    return sku_page(records, limit, cached_count(count_query))
+
+def dashboard_validators(args):
+    # ?refresh=1 always recomputes; otherwise the tag follows the KPI snapshot being served.
+    return None if args.get('refresh') == '1' else kpi_validators()
+
 @dashboard_bp.route('/api/dashboard', methods=['GET'])
+@conditional_get(dashboard_validators)
 def get_dashboard_data():
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            cust_order_query = "LOAD CSV WITH HEADERS FROM 'file:///custorder.csv' AS row WITH row, toFloat(row.Qty) AS qty WHERE trim(row.Item) <> '' AND trim(row.Loc) <> '' MATCH (s:SKU {sku_id: trim(row.Item) + '@' + trim(row.Loc)}) WHERE s.demand_sku = true AND s.broken_bom = true RETURN count(row) AS orderCount, sum(qty) AS totalQty"
-            cust_result = session.run(cust_order_query).single()
-            cust_orders_count = cust_result.get('orderCount', 0) or 0; cust_orders_qty = cust_result.get('totalQty', 0) or 0
-            
-            fcst_order_query = "LOAD CSV WITH HEADERS FROM 'file:///fcstorder.csv' AS row WITH row, toFloat(row.Qty) AS qty WHERE trim(row.Item) <> '' AND trim(row.Loc) <> '' MATCH (s:SKU {sku_id: trim(row.Item) + '@' + trim(row.Loc)}) WHERE s.demand_sku = true AND s.broken_bom = true RETURN count(row) AS orderCount, sum(qty) AS totalQty"
-            fcst_result = session.run(fcst_order_query).single()
-            fcst_orders_count = fcst_result.get('orderCount', 0) or 0; fcst_orders_qty = fcst_result.get('totalQty', 0) or 0
-            
-            total_affected_orders_count = cust_orders_count + fcst_orders_count
-            total_affected_orders_qty = cust_orders_qty + fcst_orders_qty
-            
-            broken_total_result = session.run("MATCH (s:SKU {broken_bom: true}) RETURN count(s) AS count").single()
-            broken_fg_result = session.run("MATCH (s:SKU {broken_bom: true, demand_sku: true}) RETURN count(s) AS count").single()
-            broken_skus_count = broken_total_result['count'] if broken_total_result else 0
-            broken_fg_count = broken_fg_result['count'] if broken_fg_result else 0
-    
-        data = { 
-            'totalDemandAtRisk': random.randint(100000, 999999), 
-            'affectedOrdersCount': total_affected_orders_count, 
-            'affectedOrdersQty': total_affected_orders_qty, 
-            'affectedCustOrdersCount': cust_orders_count, 
-            'affectedCustOrdersQty': cust_orders_qty, 
-            'affectedFcstOrdersCount': fcst_orders_count, 
-            'affectedFcstOrdersQty': fcst_orders_qty, 
-            'brokenSkusCount': broken_skus_count, 
-            'brokenFgNetworksCount': broken_fg_count
-        }
-        return jsonify(data)
+        # KPIs are materialized in memory (utils/kpi_snapshot.py); ?refresh=1 recomputes them now.
+        return jsonify(get_kpis(force=request.args.get('refresh') == '1'))
     except Exception as e:
         print(f"An error occurred in get_dashboard_data: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @dashboard_bp.route('/api/broken-networks', methods=['GET'])
 def get_broken_networks():
+    """One page of broken SKUs: ?limit= and ?cursor= (the nextCursor of the previous page)."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            result = session.run("MATCH (s:SKU) WHERE s.broken_bom = true RETURN s LIMIT 10")
-            return jsonify([{'id': record['s'].element_id, 'properties': dict(record['s'])} for record in result])
+        return jsonify(paged_sku_list(BROKEN_NETWORKS_QUERY, BROKEN_SKU_COUNT_QUERY))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
 @dashboard_bp.route('/api/broken-demand-networks', methods=['GET'])
 def get_broken_demand_networks():
+    """One page of broken demand (FG) SKUs, paged like /api/broken-networks."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            result = session.run("MATCH (s:SKU) WHERE s.broken_bom = true AND s.demand_sku = true RETURN s LIMIT 10")
-            return jsonify([{'id': record['s'].element_id, 'properties': dict(record['s'])} for record in result])
+        return jsonify(paged_sku_list(BROKEN_DEMAND_NETWORKS_QUERY, BROKEN_FG_COUNT_QUERY))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
 @dashboard_bp.route('/api/affected-cust-orders', methods=['GET'])
 def get_affected_cust_orders():
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = "LOAD CSV WITH HEADERS FROM 'file:///custorder.csv' AS row WITH row, trim(row.Item) AS item, trim(row.Loc) AS loc, toFloat(row.Qty) AS qty, trim(row.Item) + '@' + trim(row.Loc) AS sku_id WHERE item <> '' AND loc <> '' MATCH (s:SKU {sku_id: sku_id}) WHERE s.demand_sku = true AND s.broken_bom = true RETURN s.sku_id AS sku_id, row AS full_record ORDER BY s.sku_id, qty DESC LIMIT 100;"
-            result = session.run(query)
-            return jsonify([serialize_record(record) for record in result])
+        return jsonify(get_order_store().affected_orders('cust', affected_orders_limit(request.args)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @dashboard_bp.route('/api/affected-fcst-orders', methods=['GET'])
 def get_affected_fcst_orders():
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = "LOAD CSV WITH HEADERS FROM 'file:///fcstorder.csv' AS row WITH row, trim(row.Item) AS item, trim(row.Loc) AS loc, toFloat(row.Qty) AS qty, trim(row.Item) + '@' + trim(row.Loc) AS sku_id WHERE item <> '' AND loc <> '' MATCH (s:SKU {sku_id: sku_id}) WHERE s.demand_sku = true AND s.broken_bom = true RETURN s.sku_id AS sku_id, row AS full_record ORDER BY s.sku_id, qty DESC LIMIT 100;"
-            result = session.run(query)
-            return jsonify([serialize_record(record) for record in result])
+        return jsonify(get_order_store().affected_orders('fcst', affected_orders_limit(request.args)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -90,11 +108,7 @@ def get_affected_cust_orders_by_sku():
     try:
         data = request.json
         sku_id = data.get('sku_id')
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = "LOAD CSV WITH HEADERS FROM 'file:///custorder.csv' AS row WITH row WHERE (trim(row.Item) + '@' + trim(row.Loc)) = $sku_id RETURN $sku_id AS sku_id, row AS full_record ORDER BY toFloat(row.Qty) DESC"
-            result = session.run(query, sku_id=sku_id)
-            return jsonify([serialize_record(record) for record in result])
+        return jsonify(get_order_store().orders_for_sku('cust', sku_id))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -103,10 +117,6 @@ def get_affected_fcst_orders_by_sku():
     try:
         data = request.json
         sku_id = data.get('sku_id')
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = "LOAD CSV WITH HEADERS FROM 'file:///fcstorder.csv' AS row WITH row WHERE (trim(row.Item) + '@' + trim(row.Loc)) = $sku_id RETURN $sku_id AS sku_id, row AS full_record ORDER BY toFloat(row.Qty) DESC"
-            result = session.run(query, sku_id=sku_id)
-            return jsonify([serialize_record(record) for record in result])
+        return jsonify(get_order_store().orders_for_sku('fcst', sku_id))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,116 @@
+# routes/system.py
+from flask import Blueprint, jsonify, request
+from utils.neo4j_handler import get_pool_stats
+from utils.supply_graph import supply_graph_stats
+from utils.graph_snapshot import snapshot_status, request_refresh
+from utils.broken_bom import run_analysis, broken_bom_status
+from utils.resweek import resweek_cache_status
+from utils.pegging_index import pegging_cache_status
+from utils.impact_propagation import impact_plan_status
+from utils import bottleneck
+
+system_bp = Blueprint('system_bp', __name__)
+
+@system_bp.route('/api/system/pool-stats', methods=['GET'])
+def get_db_pool_stats():
+    """Connection pool configuration and utilization, used to size NEO4J_MAX_POOL_SIZE."""
+    try:
+        return jsonify(get_pool_stats())
+    except Exception as e:
+        print(f"An error occurred in get_db_pool_stats: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/graph-stats', methods=['GET'])
+def get_graph_stats():
+    """Size, load/build times and memory footprint of the in-memory supply graph and its reachability index."""
+    try:
+        return jsonify({'loaded': supply_graph_stats() is not None, 'stats': supply_graph_stats()})
+    except Exception as e:
+        print(f"An error occurred in get_graph_stats: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/snapshot', methods=['GET'])
+def get_snapshot_status():
+    """Version counter and last refresh/delta of the graph snapshot."""
+    try:
+        return jsonify(snapshot_status())
+    except Exception as e:
+        print(f"An error occurred in get_snapshot_status: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/snapshot/refresh', methods=['POST'])
+def trigger_snapshot_refresh():
+    """Asks the background thread to refresh now, e.g. after a planning run. Returns immediately."""
+    try:
+        request_refresh()
+        return jsonify({'requested': True, **snapshot_status()}), 202
+    except Exception as e:
+        print(f"An error occurred in trigger_snapshot_refresh: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/broken-bom', methods=['GET'])
+def get_broken_bom_status():
+    """Result of the last broken_bom analysis."""
+    try:
+        return jsonify(broken_bom_status())
+    except Exception as e:
+        print(f"An error occurred in get_broken_bom_status: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/broken-bom/analyze', methods=['POST'])
+def analyze_broken_bom():
+    """Recomputes broken_bom on the snapshot and writes changed flags; ?full=1 ignores the previous run, ?dryRun=1 skips the write."""
+    try:
+        return jsonify(run_analysis(full=request.args.get('full') == '1', dry_run=request.args.get('dryRun') == '1'))
+    except Exception as e:
+        print(f"An error occurred in analyze_broken_bom: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/resweek-cache', methods=['GET'])
+def get_resweek_cache_status():
+    """Size, build time and data version of the cached ResWeek matrix."""
+    try:
+        return jsonify(resweek_cache_status())
+    except Exception as e:
+        print(f"An error occurred in get_resweek_cache_status: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/pegging-index', methods=['GET'])
+def get_pegging_index_status():
+    """Size, build time and data version of the resource-week pegging index."""
+    try:
+        return jsonify(pegging_cache_status())
+    except Exception as e:
+        print(f"An error occurred in get_pegging_index_status: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/impact-plan', methods=['GET'])
+def get_impact_plan_status():
+    """Size and build time of the component DAG used for shortage impact propagation."""
+    try:
+        return jsonify(impact_plan_status())
+    except Exception as e:
+        print(f"An error occurred in get_impact_plan_status: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/bottleneck', methods=['GET'])
+def get_bottleneck_status():
+    """Thresholds and result of the last bottleneck analysis."""
+    try:
+        return jsonify(bottleneck.bottleneck_status())
+    except Exception as e:
+        print(f"An error occurred in get_bottleneck_status: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@system_bp.route('/api/system/bottleneck/analyze', methods=['POST'])
+def analyze_bottlenecks():
+    """Re-derives Res/SKU bottleneck flags from ResWeek; ?threshold=, ?minWeeks=, ?window= override the defaults, ?dryRun=1 skips the write."""
+    try:
+        threshold = request.args.get('threshold', bottleneck.BOTTLENECK_UTILIZATION, type=float)
+        min_weeks = request.args.get('minWeeks', bottleneck.BOTTLENECK_MIN_WEEKS, type=int)
+        window = request.args.get('window', bottleneck.BOTTLENECK_WINDOW_WEEKS, type=int)
+        return jsonify(bottleneck.run_analysis(dry_run=request.args.get('dryRun') == '1', threshold=threshold,
+                                               min_weeks=min_weeks, window=window))
+    except Exception as e:
+        print(f"An error occurred in analyze_bottlenecks: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
@@ -132,8 +132,59 @@ function handleGraphClick(params, nodes, edges) {
     }
 }
 
+// Accepts the graph payload ({nodes, relationships} keyed by element id) or the older list of paths.
+function toGraphPayload(networkData) {
+    if (!networkData || networkData.error) return { nodes: {}, relationships: {} };
+    if (!Array.isArray(networkData)) return networkData;
+    const graph = { nodes: {}, relationships: {} };
+    networkData.forEach(path => {
+        path.nodes.forEach(node => { graph.nodes[node.id] = node; });
+        path.relationships.forEach(rel => { graph.relationships[rel.id] = rel; });
+    });
+    return graph;
+}
+
+function toVisNode(node) {
+    const icon = createNodeIcon(node);
+    return {
+        id: node.id,
+        label: node.properties.sku_id || node.properties.item || node.properties.res_id || node.properties.bom_num,
+        nodeName: node.properties.sku_id || node.properties.item || node.properties.res_id || node.properties.bom_num,
+        title: JSON.stringify(node.properties, null, 2),
+        shape: 'image',
+        image: icon.image,
+        size: icon.size,
+        font: {
+            size: 12,
+            color: '#4b5563',
+            vadjust: icon.vadjust
+        }
+    };
+}
+
+function toVisEdge(rel, shortestPathEdgeIds) {
+    let edgeOptions = { id: rel.id, from: rel.startNode, to: rel.endNode, title: JSON.stringify(rel.properties, null, 2), arrows: 'to', color: { color: '#6b7280' } };
+    if (shortestPathEdgeIds.has(rel.id)) { edgeOptions.color = 'gold'; edgeOptions.width = 3; }
+    if (rel.type === 'SOURCING') { edgeOptions.arrows = { to: { enabled: true }, middle: { enabled: true, type: 'image', imageWidth: 20, imageHeight: 20, src: 'images/sourcing_relation.png' } }; }
+    else if (rel.type !== 'CONSUMED_BY' && rel.type !== 'PRODUCES') { edgeOptions.label = rel.type; edgeOptions.font = { size: 10, color: '#6b7280', align: 'middle', strokeWidth: 5, strokeColor: '#ffffff' }; }
+    return edgeOptions;
+}
+
+const NETWORK_OPTIONS = {
+    nodes: { 
+        font: { size: 12, color: '#4b5563' },
+        borderWidth: 0, 
+        shapeProperties: { useImageSize: true } 
+    },
+    edges: { color: { highlight: '#3b82f6' }, smooth: { enabled: true, type: 'straightCross' } },
+    physics: { enabled: false },
+    layout: { hierarchical: { direction: 'LR', sortMethod: 'directed', levelSeparation: 300, nodeSpacing: 150 } },
+    interaction: { navigationButtons: true, keyboard: true }
+};
+
 export function renderNetworkGraph(id, networkData, graphType, targetContainer, shortestPathData = null) {
-    if (!networkData || networkData.length === 0) {
+    const graph = toGraphPayload(networkData);
+    if (Object.keys(graph.nodes).length === 0) {
         targetContainer.innerHTML += '<p class="text-gray-500">No network data found.</p>';
         return;
     }
@@ -141,69 +192,75 @@ export function renderNetworkGraph(id, networkData, graphType, targetContainer,
     container.id = 'network-container';
     targetContainer.appendChild(container);
     
+    const shortestPathEdgeIds = new Set(shortestPathData ? Object.keys(toGraphPayload(shortestPathData).relationships) : []);
+    const nodes = new vis.DataSet(Object.values(graph.nodes).map(toVisNode));
+    const edges = new vis.DataSet(Object.values(graph.relationships).map(rel => toVisEdge(rel, shortestPathEdgeIds)));
+    
+    const network = new vis.Network(container, { nodes, edges }, NETWORK_OPTIONS);
+    network.on('click', (params) => handleGraphClick(params, nodes, edges));
+}
+
+// Requests the network as NDJSON and adds nodes and edges to the graph as each chunk arrives,
+// so large networks start drawing before the whole response has been sent.
+export async function streamNetworkGraph(url, body, graphType, targetContainer) {
+    const container = document.createElement('div');
+    container.id = 'network-container';
+    targetContainer.appendChild(container);
+
     const nodes = new vis.DataSet();
     const edges = new vis.DataSet();
-    const uniqueNodeIds = new Set();
-    const shortestPathEdgeIds = new Set(shortestPathData ? shortestPathData.flatMap(p => p.relationships).map(r => r.id) : []);
+    const network = new vis.Network(container, { nodes, edges }, NETWORK_OPTIONS);
+    network.on('click', (params) => handleGraphClick(params, nodes, edges));
 
-    networkData.forEach(path => {
-        path.nodes.forEach(node => {
-            if (!uniqueNodeIds.has(node.id)) {
-                uniqueNodeIds.add(node.id);
-                const icon = createNodeIcon(node);
-                nodes.add({
-                    id: node.id,
-                    label: node.properties.sku_id || node.properties.item || node.properties.res_id || node.properties.bom_num,
-                    nodeName: node.properties.sku_id || node.properties.item || node.properties.res_id || node.properties.bom_num,
-                    title: JSON.stringify(node.properties, null, 2),
-                    shape: 'image',
-                    image: icon.image,
-                    size: icon.size,
-                    font: {
-                        size: 12,
-                        color: '#4b5563',
-                        vadjust: icon.vadjust
-                    }
-                });
-            }
-        });
-        path.relationships.forEach(rel => {
-            let edgeOptions = { from: rel.startNode, to: rel.endNode, title: JSON.stringify(rel.properties, null, 2), arrows: 'to', color: { color: '#6b7280' } };
-            if (shortestPathEdgeIds.has(rel.id)) { edgeOptions.color = 'gold'; edgeOptions.width = 3; }
-            if (rel.type === 'SOURCING') { edgeOptions.arrows = { to: { enabled: true }, middle: { enabled: true, type: 'image', imageWidth: 20, imageHeight: 20, src: 'images/sourcing_relation.png' } }; }
-            else if (rel.type !== 'CONSUMED_BY' && rel.type !== 'PRODUCES') { edgeOptions.label = rel.type; edgeOptions.font = { size: 10, color: '#6b7280', align: 'middle', strokeWidth: 5, strokeColor: '#ffffff' }; }
-            edges.add(edgeOptions);
+    const noShortestPath = new Set();
+    const applyLines = (lines) => {
+        const newNodes = [];
+        const newEdges = [];
+        lines.forEach(line => {
+            if (!line.trim()) return;
+            const item = JSON.parse(line);
+            if (item.type === 'node') newNodes.push(toVisNode(item.data));
+            else if (item.type === 'relationship') newEdges.push(toVisEdge(item.data, noShortestPath));
+            else if (item.type === 'error') console.error('Error streaming network:', item.data);
         });
-    });
-    
-    const network = new vis.Network(container, { nodes, edges }, {
-        nodes: { 
-            font: { size: 12, color: '#4b5563' },
-            borderWidth: 0, 
-            shapeProperties: { useImageSize: true } 
-        },
-        edges: { color: { highlight: '#3b82f6' }, smooth: { enabled: true, type: 'straightCross' } },
-        physics: { enabled: false },
-        layout: { hierarchical: { direction: 'LR', sortMethod: 'directed', levelSeparation: 300, nodeSpacing: 150 } },
-        interaction: { navigationButtons: true, keyboard: true }
-    });
-    network.on('click', (params) => handleGraphClick(params, nodes, edges));
+        if (newNodes.length) nodes.update(newNodes);
+        if (newEdges.length) edges.update(newEdges);
+    };
+
+    try {
+        const response = await fetch(url, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ ...body, stream: true }) });
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            applyLines(lines);
+        }
+        applyLines([buffered + decoder.decode()]);
+    } catch (error) {
+        console.error('Error streaming network graph:', error);
+    }
+
+    if (nodes.length === 0) {
+        container.remove();
+        targetContainer.innerHTML += '<p class="text-gray-500">No network data found.</p>';
+    }
 }
 
 function fetchNetworkGraph(skuId, graphType, container) { 
-    fetch('http://127.0.0.1:5000/api/network-graph', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ sku_id: skuId }) })
-    .then(r => r.json())
-    .then(d => renderNetworkGraph(skuId, d, graphType, container, null)); 
+    streamNetworkGraph('http://127.0.0.1:5000/api/network-graph', { sku_id: skuId }, graphType, container);
 }
 function fetchNetworkWithShortestPath(skuId, graphType, container) { 
-    fetch('http://127.0.0.1:5000/api/network-with-shortest-path', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ sku_id: skuId }) })
+    fetch('http://127.0.0.1:5000/api/network-with-shortest-path', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ sku_id: skuId, format: 'graph' }) })
     .then(r => r.json())
     .then(d => renderNetworkGraph(skuId, d.full_network, graphType, container, d.shortest_path)); 
 }
 export function fetchResourceNetworkGraph(resId, graphType, container) { 
-    fetch('http://127.0.0.1:5000/api/resource-network', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ res_id: resId }) })
-    .then(r => r.json())
-    .then(d => renderNetworkGraph(resId, d, graphType, container)); 
+    streamNetworkGraph('http://127.0.0.1:5000/api/resource-network', { res_id: resId }, graphType, container);
 }
 
 // ## MODIFICATION START ##
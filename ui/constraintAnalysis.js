@@ -1,6 +1,7 @@
 // ui/constraintAnalysis.js
 
 import { fetchResourceNetworkGraph } from './bomViewer.js';
+import { pagedTableOptions, fetchWithEtag } from './dashboard.js';
 
 const cardsContainer = document.getElementById('ca-cards-container');
 const resultsContainer = document.getElementById('ca-results-container');
@@ -48,6 +49,16 @@ function renderDemandSearchUI() {
                     <span class="ml-2">Search</span>
                 </button>
             </div>
+            <details class="mt-3">
+                <summary class="text-sm text-gray-600 cursor-pointer">Check many SKUs</summary>
+                <div class="mt-2 flex items-start space-x-2">
+                    <textarea id="fg-batch-input" rows="4" placeholder="One Item,Location per line" class="w-full px-3 py-2 text-sm border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-indigo-500"></textarea>
+                    <button id="fg-batch-btn" class="px-4 py-2 bg-indigo-600 text-white rounded-lg hover:bg-indigo-700 transition-colors flex-shrink-0">
+                        <i class="fas fa-list-check"></i>
+                        <span class="ml-2">Check</span>
+                    </button>
+                </div>
+            </details>
         </div>
         <div id="fg-health-report-container" class="mt-6"></div>
     `;
@@ -68,6 +79,17 @@ function renderDemandSearchUI() {
     };
 
     searchBtn.addEventListener('click', performSearch);
+    document.getElementById('fg-batch-btn').addEventListener('click', () => {
+        const skus = document.getElementById('fg-batch-input').value.split('\n')
+            .map(line => line.split(/[,@\t]/).map(part => part.trim()))
+            .filter(([item, loc]) => item && loc)
+            .map(([item, loc]) => ({ item, loc }));
+        if (skus.length) {
+            handleFgBatch(skus);
+        } else {
+            alert('Please enter at least one Item,Location line.');
+        }
+    });
     itemInput.addEventListener('keydown', (e) => { if (e.key === 'Enter') performSearch(); });
     locInput.addEventListener('keydown', (e) => { if (e.key === 'Enter') performSearch(); });
 }
@@ -94,6 +116,74 @@ async function handleFgSearch(item, loc) {
     }
 }
 
+// Streams /api/constraints/fg-health-batch (one NDJSON status line per SKU) into a table.
+async function handleFgBatch(skus) {
+    const reportContainer = document.getElementById('fg-health-report-container');
+    const batchBtn = document.getElementById('fg-batch-btn');
+    reportContainer.innerHTML = '';
+    batchBtn.disabled = true;
+
+    const tableContainer = document.createElement('div');
+    tableContainer.className = 'tabulator-creative px-2';
+    reportContainer.appendChild(tableContainer);
+    const table = new Tabulator(tableContainer, {
+        layout: "fitDataStretch",
+        height: "60vh",
+        columns: [
+            { title: "SKU", field: "sku", headerFilter: "input" },
+            { title: "Status", field: "status", headerFilter: "select", headerFilterParams: { values: true },
+              formatter: cell => cell.getRow().getData().found ? getStatusBadge(cell.getValue()) : '<span class="text-red-500">Not found</span>' },
+            { title: "Demands", field: "totalDemandCount", hozAlign: "right" },
+            { title: "Demand Qty", field: "totalDemandQty", hozAlign: "right", formatter: cell => Math.round(cell.getValue() || 0).toLocaleString() },
+            { title: "Constrained", field: "constrainedDemandCount", hozAlign: "right" },
+            { title: "Constrained Qty", field: "constrainedDemandQty", hozAlign: "right", formatter: cell => Math.round(cell.getValue() || 0).toLocaleString() },
+            { title: "Constraints", field: "constraintCount", hozAlign: "right" },
+        ],
+    });
+    const tableBuilt = new Promise(resolve => table.on("tableBuilt", resolve));
+    const applyLines = (lines) => {
+        const rows = [];
+        lines.forEach(line => {
+            if (!line.trim()) return;
+            const item = JSON.parse(line);
+            if (item.type === 'status') rows.push(item.data);
+            else if (item.type === 'error') console.error('Error streaming FG health:', item.data);
+        });
+        if (rows.length) table.addData(rows);
+    };
+
+    try {
+        const response = await fetch('/api/constraints/fg-health-batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ skus })
+        });
+        if (!response.ok) {
+            const data = await response.json();
+            reportContainer.innerHTML = `<p class="text-red-500 p-4">${data.error || 'An error occurred while checking the SKUs.'}</p>`;
+            return;
+        }
+        await tableBuilt;
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            applyLines(lines);
+        }
+        applyLines([buffered + decoder.decode()]);
+    } catch (error) {
+        console.error("Error fetching FG health batch:", error);
+        reportContainer.innerHTML = `<p class="text-red-500">An error occurred while checking the SKUs.</p>`;
+    } finally {
+        batchBtn.disabled = false;
+    }
+}
+
 function getStatusBadge(status) {
     const styles = {
         'Healthy': 'bg-green-100 text-green-800',
@@ -273,7 +363,8 @@ function renderOrderSearchUI() {
     searchContainer.innerHTML = `
         <div class="bg-white rounded-xl shadow-lg p-4">
             <div class="flex items-center space-x-2">
-                <input type="text" id="ca-order-search-input-internal" placeholder="Enter Order ID or Seqnum..." class="w-full px-3 py-2 text-sm border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-indigo-500">
+                <input type="text" id="ca-order-search-input-internal" list="ca-order-suggestions" autocomplete="off" placeholder="Enter Order ID or Seqnum..." class="w-full px-3 py-2 text-sm border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-indigo-500">
+                <datalist id="ca-order-suggestions"></datalist>
                 <button id="ca-order-search-btn-internal" class="px-4 py-2 bg-indigo-600 text-white rounded-lg hover:bg-indigo-700 transition-colors flex-shrink-0">
                     <i class="fas fa-search"></i>
                     <span class="ml-2">Analyze</span>
@@ -299,6 +390,32 @@ function renderOrderSearchUI() {
     searchInput.addEventListener('keydown', (e) => {
         if (e.key === 'Enter') handleOrderSearchInternal();
     });
+
+    // Order ids starting with what has been typed, served by the orderId index.
+    const suggestions = document.getElementById('ca-order-suggestions');
+    let suggestTimer = null;
+    searchInput.addEventListener('input', () => {
+        clearTimeout(suggestTimer);
+        const text = searchInput.value.trim();
+        if (text.length < 2) {
+            suggestions.innerHTML = '';
+            return;
+        }
+        suggestTimer = setTimeout(() => {
+            fetch(`/api/constraints/order-suggest?q=${encodeURIComponent(text)}`)
+                .then(res => res.json())
+                .then(orderIds => {
+                    if (!Array.isArray(orderIds) || searchInput.value.trim() !== text) return;
+                    suggestions.innerHTML = '';
+                    orderIds.forEach(orderId => {
+                        const option = document.createElement('option');
+                        option.value = orderId;
+                        suggestions.appendChild(option);
+                    });
+                })
+                .catch(error => console.error("Error fetching order suggestions:", error));
+        }, 200);
+    });
 }
 
 async function handleOrderSearchInternal() {
@@ -345,11 +462,12 @@ async function renderImpactedDemandsTable() {
     contentContainer.innerHTML = `<div class="flex justify-center items-center p-8"><i class="fas fa-spinner fa-spin fa-2x text-gray-400"></i></div>`;
 
     try {
-        const response = await fetch('/api/constraints/impacted-demands');
-        const data = await response.json();
+        const url = '/api/constraints/impacted-demands';
+        const response = await fetch(url);
+        const page = await response.json();
         contentContainer.innerHTML = '';
         
-        if (!data || data.length === 0) {
+        if (!page.items || page.items.length === 0) {
             contentContainer.innerHTML = `<p class="text-gray-500">No impacted demands found.</p>`;
             return;
         }
@@ -359,7 +477,7 @@ async function renderImpactedDemandsTable() {
         contentContainer.appendChild(tableContainer);
 
         new Tabulator(tableContainer, {
-            data: data,
+            ...pagedTableOptions(url, page),
             layout: "fitDataStretch",
             rowFormatter: function(row) {
                 const data = row.getData();
@@ -461,34 +579,32 @@ async function renderResourceTimePhase(resourceId = null) {
     contentContainer.innerHTML = `<div class="flex justify-center items-center p-8"><i class="fas fa-spinner fa-spin fa-2x text-gray-400"></i></div>`;
 
     try {
-        const apiUrl = resourceId 
-            ? `/api/constraints/resource-time-phase?resId=${resourceId}`
-            : '/api/constraints/resource-time-phase';
-        const response = await fetch(apiUrl);
-
-        const data = await response.json();
+        // Served pivoted from the server's in-memory ResWeek matrix: one value per week and measure.
+        const data = resourceId
+            ? await fetchWithEtag(`/api/constraints/time-phase-matrix?resId=${encodeURIComponent(resourceId)}`)
+            : null;
         contentContainer.innerHTML = '';
 
-        if (!data || data.length === 0 || !data[0].weeklyData) {
+        if (!data || !data.resources || data.resources.length === 0) {
             const errorMessage = resourceId ? `No time-phased data found for ${resourceId}.` : "No time-phased data found for constrained resources.";
             contentContainer.innerHTML = `<p class="text-gray-500">${errorMessage}</p>`;
             return;
         }
 
-        const weeklyData = data[0].weeklyData;
-        const weeks = [...new Set(weeklyData.map(w => w.week))].sort((a, b) => a - b);
+        const resource = data.resources[0];
+        // The matrix spans every week of the plan; show the weeks this resource has data for.
+        const columns = data.weeks.map((_, i) => i).filter(i => resource.capacity[i] !== null || resource.load[i] !== null);
+        const weeks = columns.map(i => data.weeks[i]);
         
         const capacityRow = { measure: 'Total Capacity' };
         const loadRow = { measure: 'Total Load' };
         const utilRow = { measure: 'Utilization %' };
 
-        weeks.forEach(week => {
-            const weekData = weeklyData.find(w => w.week === week);
-            if (weekData) {
-                capacityRow[`WW${week}`] = weekData.total_capacity;
-                loadRow[`WW${week}`] = weekData.total_load;
-                utilRow[`WW${week}`] = weekData.utilization;
-            }
+        columns.forEach(i => {
+            const week = data.weeks[i];
+            capacityRow[`WW${week}`] = resource.capacity[i];
+            loadRow[`WW${week}`] = resource.load[i];
+            utilRow[`WW${week}`] = resource.utilization[i];
         });
 
         const tableData = [capacityRow, loadRow, utilRow];
@@ -535,16 +651,14 @@ async function renderResourceTimePhase(resourceId = null) {
                 const weekStr = cell.getField();
                 if (weekStr && weekStr.startsWith('WW')) {
                     const week = parseInt(weekStr.replace('WW', ''));
+                    const url = `/api/constraints/resource-week-demands?resId=${encodeURIComponent(resourceId)}&week=${week}`;
                     
-                    fetch('/api/constraints/demands-for-resource-week', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ resourceId: resourceId, week: week })
-                    })
+                    fetch(url)
                     .then(res => res.json())
-                    .then(demands => {
-                        showDemandsModal(demands, resourceId, week);
-                    });
+                    .then(page => {
+                        showDemandsModal(url, page, resourceId, week);
+                    })
+                    .catch(error => console.error("Error fetching resource-week demands:", error));
                 }
             }
         });
@@ -555,6 +669,89 @@ async function renderResourceTimePhase(resourceId = null) {
     }
 }
 
+// Demands pegged to one resource-week, largest load first, paged from the server's pegging index.
+function showDemandsModal(url, page, resourceId, week) {
+    const modal = document.getElementById('demands-modal');
+    const content = document.getElementById('demands-modal-content');
+    document.getElementById('demands-modal-title').textContent = `Demands loading ${resourceId} in WW${week} (${(page.total || 0).toLocaleString()})`;
+    content.innerHTML = '';
+
+    const close = () => modal.classList.add('hidden');
+    modal.querySelector('.close-demands-modal').onclick = close;
+    modal.onclick = (event) => { if (event.target === modal) close(); };
+    modal.classList.remove('hidden');
+
+    if (!page.items || page.items.length === 0) {
+        content.innerHTML = `<p class="text-gray-500">No demands are pegged to this resource-week.</p>`;
+        return;
+    }
+
+    const tableContainer = document.createElement('div');
+    tableContainer.className = 'tabulator-creative';
+    content.appendChild(tableContainer);
+
+    new Tabulator(tableContainer, {
+        ...pagedTableOptions(url, page),
+        height: "20rem",
+        layout: "fitDataStretch",
+        columns: [
+            { title: "Order ID", field: "demand.orderId" },
+            { title: "Seq Num", field: "demand.seqnum" },
+            { title: "SKU", field: "demand.sku_id" },
+            { title: "Qty", field: "demand.qty", hozAlign: "right" },
+            { title: "Date", field: "demand.date" },
+            { title: "Load Qty", field: "loadQty", hozAlign: "right", formatter: cell => cell.getValue() === null ? "-" : Math.round(cell.getValue()).toLocaleString() },
+        ],
+    });
+}
+
+// One collapsible section per constraint of a resource. A section's demands are fetched, page by
+// page, only when it is opened.
+function renderConstraintDemandSections(constraintDetails, container) {
+    constraintDetails.filter(cd => cd.demandCount > 0).forEach(cd => {
+        const section = document.createElement('div');
+        section.className = 'border-b last:border-b-0';
+        section.innerHTML = `
+            <div class="expand-constraint-demands cursor-pointer px-4 py-2 text-sm text-gray-700 hover:bg-gray-100">
+                <i class="fas fa-caret-right fa-fw"></i> Week ${cd.constraint.week}: ${cd.demandCount.toLocaleString()} demands - ${Math.round(cd.totalDemandQty || 0).toLocaleString()}
+            </div>
+        `;
+        const tableContainer = document.createElement('div');
+        tableContainer.className = 'hidden';
+        section.appendChild(tableContainer);
+        container.appendChild(section);
+
+        const handle = section.querySelector('.expand-constraint-demands');
+        handle.addEventListener('click', async (e) => {
+            e.stopPropagation();
+            tableContainer.classList.toggle('hidden');
+            handle.querySelector('i').classList.toggle('fa-caret-right');
+            handle.querySelector('i').classList.toggle('fa-caret-down');
+            if (tableContainer.classList.contains('hidden') || tableContainer.dataset.loaded) return;
+            tableContainer.dataset.loaded = 'true';
+            try {
+                const url = `/api/constraints/constraint-demands?constraintId=${encodeURIComponent(cd.constraintId)}`;
+                const page = await (await fetch(url)).json();
+                new Tabulator(tableContainer, {
+                    ...pagedTableOptions(url, page),
+                    height: "20rem",
+                    layout: "fitData",
+                    columns: [
+                        { title: "Order ID", field: "orderId" },
+                        { title: "Seq Num", field: "seqnum" },
+                        { title: "SKU", field: "sku_id", widthGrow: 2 },
+                        { title: "Qty", field: "qty", hozAlign: "right" },
+                        { title: "Type", field: "type" }
+                    ]
+                });
+            } catch (error) {
+                console.error("Error fetching constraint demands:", error);
+                tableContainer.innerHTML = `<p class="text-red-500 px-4 py-2">An error occurred while fetching data.</p>`;
+            }
+        });
+    });
+}
+
 async function renderConstrainedResourcesList(summaryData) {
     resultsContainer.innerHTML = '';
     const header = createCaHeader("Constrained Resources", () => renderBottleneckView(summaryData));
@@ -566,8 +763,7 @@ async function renderConstrainedResourcesList(summaryData) {
     contentContainer.innerHTML = `<div class="flex justify-center items-center p-8"><i class="fas fa-spinner fa-spin fa-2x text-gray-400"></i></div>`;
     
     try {
-        const response = await fetch('/api/constraints/constrained-resources');
-        const data = await response.json();
+        const data = await fetchWithEtag('/api/constraints/constrained-resources');
         contentContainer.innerHTML = '';
 
         if (!data || data.length === 0) {
@@ -602,8 +798,7 @@ async function renderConstrainedResourcesList(summaryData) {
                     rowElement.appendChild(detailElement);
                 }
 
-                const totalDemands = data.constraintDetails.reduce((acc, cv) => acc + cv.demands.length, 0);
-                if (totalDemands > 0) {
+                if (data.demandCount > 0) {
                     const demandsDetailElement = document.createElement("div");
                     demandsDetailElement.id = `demands-detail-${data.properties.res_id}`;
                     demandsDetailElement.classList.add("hidden", "p-0", "bg-gray-50", "border-t");
@@ -635,25 +830,7 @@ async function renderConstrainedResourcesList(summaryData) {
                             handle.querySelector("i").classList.toggle("fa-caret-down");
 
                             if (!demandsContainer.classList.contains("hidden") && !demandsContainer.hasChildNodes()) {
-                                let allDemands = [];
-                                data.constraintDetails.forEach(cd => {
-                                    cd.demands.forEach(demand => {
-                                        allDemands.push({ ...demand, constraintDate: `Week ${cd.constraint.week}` });
-                                    });
-                                });
-                                
-                                new Tabulator(demandsContainer, {
-                                    data: allDemands,
-                                    layout: "fitData",
-                                    columns: [
-                                        { title: "Constraint Week", field: "constraintDate" },
-                                        { title: "Order ID", field: "orderId" },
-                                        { title: "Seq Num", field: "seqnum" },
-                                        { title: "SKU", field: "sku_id", widthGrow: 2 },
-                                        { title: "Qty", field: "qty", hozAlign: "right" },
-                                        { title: "Type", field: "type" }
-                                    ]
-                                });
+                                renderConstraintDemandSections(data.constraintDetails, demandsContainer);
                             }
                         });
                     }
@@ -680,9 +857,7 @@ async function renderConstrainedResourcesList(summaryData) {
                     width: 200,
                     headerSort: false,
                     formatter: (cell) => {
-                        const details = cell.getRow().getData().constraintDetails || [];
-                        const count = details.reduce((acc, cv) => acc + cv.demands.length, 0);
-                        const qty = details.reduce((acc, cv) => acc + (cv.totalDemandQty || 0), 0);
+                        const { demandCount: count = 0, totalDemandQty: qty = 0 } = cell.getRow().getData();
                         if (count === 0) return "0 - 0";
                         return `<span class="expand-demands cursor-pointer text-orange-600 hover:text-orange-800"><i class="fas fa-caret-right fa-fw"></i> ${count} - ${Math.round(qty).toLocaleString()}</span>`;
                     },
@@ -740,11 +915,12 @@ async function renderBottleneckSkusTable() {
     contentContainer.innerHTML = `<div class="flex justify-center items-center p-8"><i class="fas fa-spinner fa-spin fa-2x text-gray-400"></i></div>`;
     
     try {
-        const response = await fetch('/api/constraints/bottleneck-skus');
-        const data = await response.json();
+        const url = '/api/constraints/bottleneck-skus';
+        const response = await fetch(url);
+        const page = await response.json();
         contentContainer.innerHTML = '';
 
-        if (!data || data.length === 0) {
+        if (!page.items || page.items.length === 0) {
             contentContainer.innerHTML = `<p class="text-gray-500">No bottleneck SKUs found.</p>`;
             return;
         }
@@ -754,7 +930,7 @@ async function renderBottleneckSkusTable() {
         contentContainer.appendChild(tableContainer);
         
         new Tabulator(tableContainer, {
-            data: data.map(n => n.properties),
+            ...pagedTableOptions(url, page, n => n.properties),
             layout: "fitDataStretch",
             columns: [
                 { title: "SKU ID", field: "sku_id" },
@@ -806,8 +982,7 @@ export async function initConstraintAnalysis() {
     resultsContainer.innerHTML = ''; 
 
     try {
-        const response = await fetch('/api/constraints/summary');
-        const summaryData = await response.json();
+        const summaryData = await fetchWithEtag('/api/constraints/summary');
         
         renderConstraintCards(summaryData);
         renderImpactedDemandsTable(); 
@@ -147,8 +147,53 @@ function createHeaderWithBackButton(title, backFunction, tableInstance = null) {
     return header;
 }
 
-function createSkuTable(title, data, messageIfEmpty, backFunction, showDashboardContent) {
+// GETs a JSON endpoint that sends ETags, revalidating with If-None-Match. On 304 the body kept from
+// the previous response is returned, so unchanged data is neither re-sent nor re-queried.
+const etagCache = new Map();
+
+export function fetchWithEtag(url) {
+    const cached = etagCache.get(url);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+    return fetch(url, { headers }).then(response => {
+        if (response.status === 304 && cached) return cached.body;
+        return response.json().then(body => {
+            const etag = response.headers.get('ETag');
+            if (response.ok && etag) etagCache.set(url, { etag, body });
+            return body;
+        });
+    });
+}
+
+// Tabulator options that load a cursor-paged endpoint ({items, nextCursor, total, limit}) page by
+// page as the table is scrolled. The first page has already been fetched by the caller.
+export function pagedTableOptions(url, firstPage, mapItem = item => item) {
+    const cursors = [null, firstPage.nextCursor];
+    const pageSize = firstPage.limit;
+    const lastPage = Math.max(1, Math.ceil(firstPage.total / pageSize));
+    const toResponse = page => ({ last_page: lastPage, data: page.items.map(mapItem) });
+    return {
+        ajaxURL: url,
+        progressiveLoad: "scroll",
+        paginationSize: pageSize,
+        height: "70vh",
+        ajaxRequestFunc: (_url, _config, params) => {
+            if (params.page === 1) return Promise.resolve(toResponse(firstPage));
+            const cursor = cursors[params.page - 1];
+            if (!cursor) return Promise.resolve({ last_page: params.page - 1, data: [] });
+            const separator = url.includes('?') ? '&' : '?';
+            return fetch(`${url}${separator}limit=${pageSize}&cursor=${encodeURIComponent(cursor)}`)
+                .then(r => r.json())
+                .then(page => {
+                    cursors[params.page] = page.nextCursor;
+                    return toResponse(page);
+                });
+        },
+    };
+}
+
+function createSkuTable(title, url, page, messageIfEmpty, backFunction, showDashboardContent) {
     const resultsContainer = document.getElementById('results-container');
+    const data = page.items;
     const renderFunc = () => {
         lastTableRenderFunction = renderFunc;
         resultsContainer.innerHTML = '';
@@ -162,7 +207,6 @@ function createSkuTable(title, data, messageIfEmpty, backFunction, showDashboard
         const tableContainer = document.createElement('div');
         tableContainer.className = 'tabulator-creative';
 
-        const tableData = data.map(node => node.properties);
         const allKeys = new Set(data.flatMap(node => Object.keys(node.properties)));
         const keysToDisplay = Array.from(allKeys).filter(key => key !== 'shortest_lead_time');
         const sortedKeys = keysToDisplay.sort((a, b) => {
@@ -219,7 +263,7 @@ function createSkuTable(title, data, messageIfEmpty, backFunction, showDashboard
                     button.textContent = "Show Network";
                     button.onclick = (e) => {
                         e.stopPropagation();
-                        fetch('http://127.0.0.1:5000/api/network-graph', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ sku_id: skuId }) })
+                        fetch('http://127.0.0.1:5000/api/network-graph', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ sku_id: skuId, format: 'graph' }) })
                             .then(r => r.json())
                             .then(d => {
                                 const networkTitle = `Network for ${skuId}`;
@@ -243,7 +287,7 @@ function createSkuTable(title, data, messageIfEmpty, backFunction, showDashboard
 
         resultsContainer.appendChild(tableContainer);
         const table = new Tabulator(tableContainer, {
-            data: tableData,
+            ...pagedTableOptions(url, page, node => node.properties),
             columns: columns,
             layout: "fitDataStretch",
             movableColumns: true,
@@ -255,7 +299,7 @@ function createSkuTable(title, data, messageIfEmpty, backFunction, showDashboard
             persistenceID: `dashboard-table-${title.replace(/\s+/g, '-')}`,
         });
         
-        resultsContainer.prepend(createHeaderWithBackButton(title, backFunction, table));
+        resultsContainer.prepend(createHeaderWithBackButton(`${title} (${page.total.toLocaleString()})`, backFunction, table));
     };
     renderFunc();
 }
@@ -373,15 +417,18 @@ export function fetchDashboardData(startDate = null, endDate = null) {
         console.log("Fetching all dashboard data (no quarter filter).");
     }
 
-    fetch('http://127.0.0.1:5000/api/dashboard')
-        .then(response => response.json())
+    fetchWithEtag('http://127.0.0.1:5000/api/dashboard')
         .then(data => {
             if (data.error) {
                 console.error("Error from dashboard API:", data.error);
                 return; 
             }
 
-            document.getElementById('total-demand-at-risk').textContent = `$${(data.totalDemandAtRisk || 0).toLocaleString()}`;
+            const demandAtRisk = document.getElementById('total-demand-at-risk');
+            demandAtRisk.textContent = (data.affectedOrdersQty || 0).toLocaleString();
+            if (data.snapshot) {
+                demandAtRisk.title = `As of ${data.snapshot.computedAt} (${Math.round(data.snapshot.ageSeconds)}s ago)`;
+            }
             const formattedQty = (data.affectedOrdersQty || 0).toLocaleString();
             document.getElementById('affected-orders').textContent = `${(data.affectedOrdersCount || 0).toLocaleString()} - ${formattedQty}`;
             const formattedCustQty = (data.affectedCustOrdersQty || 0).toLocaleString();
@@ -548,8 +595,10 @@ export function initDashboard(showDashboardContent) {
     brokenNetworksCard.addEventListener('click', () => showDashboardContent(brokenNetworksSection));
     affectedOrdersCard.addEventListener('click', () => showDashboardContent(affectedOrdersSection));
     
-    const renderBrokenSkus = () => fetch('http://127.0.0.1:5000/api/broken-networks').then(r => r.json()).then(d => { createSkuTable('Broken SKUs', d, 'No broken SKUs found.', () => showDashboardContent(brokenNetworksSection), showDashboardContent); showDashboardContent(resultsContainer); });
-    const renderBrokenDemand = () => fetch('http://127.0.0.1:5000/api/broken-demand-networks').then(r => r.json()).then(d => { createSkuTable('Broken Finished Goods', d, 'No broken FG networks found.', () => showDashboardContent(brokenNetworksSection), showDashboardContent); showDashboardContent(resultsContainer); });
+    const brokenSkusUrl = 'http://127.0.0.1:5000/api/broken-networks';
+    const brokenDemandUrl = 'http://127.0.0.1:5000/api/broken-demand-networks';
+    const renderBrokenSkus = () => fetch(brokenSkusUrl).then(r => r.json()).then(page => { createSkuTable('Broken SKUs', brokenSkusUrl, page, 'No broken SKUs found.', () => showDashboardContent(brokenNetworksSection), showDashboardContent); showDashboardContent(resultsContainer); });
+    const renderBrokenDemand = () => fetch(brokenDemandUrl).then(r => r.json()).then(page => { createSkuTable('Broken Finished Goods', brokenDemandUrl, page, 'No broken FG networks found.', () => showDashboardContent(brokenNetworksSection), showDashboardContent); showDashboardContent(resultsContainer); });
     const renderAffectedCustOrders = () => fetch('http://127.0.0.1:5000/api/affected-cust-orders').then(r => r.json()).then(d => { createOrderTable('Affected Customer Orders', d, 'No affected customer orders found.', () => showDashboardContent(affectedOrdersSection)); showDashboardContent(resultsContainer); });
     const renderAffectedFcstOrders = () => fetch('http://127.0.0.1:5000/api/affected-fcst-orders').then(r => r.json()).then(d => { createOrderTable('Affected Forecast Orders', d, 'No affected forecast orders found.', () => showDashboardContent(affectedOrdersSection)); showDashboardContent(resultsContainer); });
     
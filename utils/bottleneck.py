@@ -0,0 +1,135 @@
+# utils/bottleneck.py
+# Derives the bottleneck flag of Res and SKU nodes from ResWeek utilization.
+#
+# A resource is a bottleneck when, within some window of BOTTLENECK_WINDOW_WEEKS consecutive
+# weeks (0: the whole horizon), at least BOTTLENECK_MIN_WEEKS weeks have utilization above
+# BOTTLENECK_UTILIZATION. The test is a rolling count over the resources x weeks matrix
+# (utils/resweek.py), so the cost is linear in the number of ResWeek rows. A SKU is a bottleneck
+# when a BOM producing it uses a bottleneck resource ((Res)-[:USES_RESOURCE]->(BOM)-[:PRODUCES]->(SKU)),
+# read from the in-memory supply graph. Only flags that differ from the graph are written.
+#
+# Run once with: python -m utils.bottleneck [--dry-run]
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import threading
+import time
+import os
+import numpy as np
+from .neo4j_handler import get_session, write_batches, chunks
+from .supply_graph import SNAPSHOT_CHANGE_PROPERTY, REL_TYPE_CODES, get_supply_graph
+from .graph_snapshot import request_refresh
+from .resweek import ResWeekMatrix
+
+BOTTLENECK_UTILIZATION = float(os.getenv("BOTTLENECK_UTILIZATION", "1.0"))
+BOTTLENECK_MIN_WEEKS = int(os.getenv("BOTTLENECK_MIN_WEEKS", "1"))
+BOTTLENECK_WINDOW_WEEKS = int(os.getenv("BOTTLENECK_WINDOW_WEEKS", "0"))
+BOTTLENECK_BATCH_SIZE = int(os.getenv("BOTTLENECK_BATCH_SIZE", "10000"))
+BOTTLENECK_WORKERS = int(os.getenv("BOTTLENECK_WORKERS", "4"))
+
+WRITE_FLAGS_QUERY = f"""
+UNWIND $rows AS row
+MATCH (n) WHERE elementId(n) = row.id
+SET n.bottleneck = row.bottleneck, n.{SNAPSHOT_CHANGE_PROPERTY} = timestamp()
+"""
+
+_PRODUCES = REL_TYPE_CODES['PRODUCES']
+
+_status = {'lastRun': None, 'lastError': None}
+_lock = threading.Lock()
+
+
+def overloaded_resources(matrix, threshold=BOTTLENECK_UTILIZATION, min_weeks=BOTTLENECK_MIN_WEEKS,
+                         window=BOTTLENECK_WINDOW_WEEKS):
+    """Boolean per matrix row: min_weeks overloaded weeks within some window of `window` weeks."""
+    over = matrix.utilization > threshold   # NaN (no ResWeek row) compares False
+    num_weeks = over.shape[1]
+    if window <= 0 or window >= num_weeks:
+        return over.sum(axis=1) >= min_weeks
+    counts = np.zeros((over.shape[0], num_weeks + 1), dtype=np.int32)
+    np.cumsum(over, axis=1, out=counts[:, 1:])
+    return ((counts[:, window:] - counts[:, :-window]) >= min_weeks).any(axis=1)
+
+
+def bottleneck_masks(graph, bottleneck_res_ids):
+    """(Res mask, SKU mask) over the graph's nodes for the given bottleneck resource ids."""
+    res = np.zeros(graph.num_nodes, dtype=bool)
+    for res_id in bottleneck_res_ids:
+        i = graph.res_index.get(res_id)
+        if i is not None:
+            res[i] = True
+    boms = np.zeros(graph.num_nodes, dtype=bool)
+    boms[graph.res_fwd.nbr[graph.res_fwd.slots(np.flatnonzero(res).astype(np.int32))]] = True
+    boms &= graph.is_label['BOM']
+    slots = graph.supply_fwd.slots(np.flatnonzero(boms).astype(np.int32))
+    produced = graph.supply_fwd.nbr[slots][graph.rel_type[graph.supply_fwd.edge[slots]] == _PRODUCES]
+    skus = np.zeros(graph.num_nodes, dtype=bool)
+    skus[produced] = True
+    return res, skus & graph.is_label['SKU']
+
+
+def flag_changes(graph, res_mask, sku_mask):
+    """[{'id', 'bottleneck'}] for every Res and SKU whose flag differs from its bottleneck property."""
+    flagged = res_mask | sku_mask
+    candidates = graph.is_label['Res'] | graph.is_label['SKU']
+    changed = np.flatnonzero(candidates & (flagged != graph.flag('bottleneck')))
+    return [{'id': graph.node_ids[i], 'bottleneck': bool(flagged[i])} for i in changed]
+
+
+def run_analysis(graph=None, dry_run=False, threshold=BOTTLENECK_UTILIZATION, min_weeks=BOTTLENECK_MIN_WEEKS,
+                 window=BOTTLENECK_WINDOW_WEEKS):
+    """Loads ResWeek, derives the flags and writes the ones that changed."""
+    with _lock:
+        try:
+            started = time.perf_counter()
+            with get_session() as session:
+                matrix = ResWeekMatrix.load_from(session)
+            loaded = time.perf_counter()
+            graph = graph or get_supply_graph()
+            overloaded = overloaded_resources(matrix, threshold, min_weeks, window)
+            res_ids = [matrix.res_ids[i] for i in np.flatnonzero(overloaded)]
+            res_mask, sku_mask = bottleneck_masks(graph, res_ids)
+            changes = flag_changes(graph, res_mask, sku_mask)
+            computed = time.perf_counter()
+            if changes and not dry_run:
+                write_batches(WRITE_FLAGS_QUERY, chunks(changes, BOTTLENECK_BATCH_SIZE), BOTTLENECK_WORKERS)
+                request_refresh()
+            stats = {
+                'threshold': threshold,
+                'minWeeks': min_weeks,
+                'windowWeeks': window,
+                'resWeekRows': matrix.num_rows,
+                'bottleneckResources': int(res_mask.sum()),
+                'bottleneckSkus': int(sku_mask.sum()),
+                'flagsChanged': len(changes),
+                'written': not dry_run,
+                'loadSeconds': round(loaded - started, 3),
+                'computeSeconds': round(computed - loaded, 3),
+                'writeSeconds': round(time.perf_counter() - computed, 3),
+                'finishedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            }
+            _status.update(lastRun=stats, lastError=None)
+            return stats
+        except Exception as e:
+            _status['lastError'] = str(e)
+            raise
+
+
+def bottleneck_status():
+    return dict(_status, threshold=BOTTLENECK_UTILIZATION, minWeeks=BOTTLENECK_MIN_WEEKS, windowWeeks=BOTTLENECK_WINDOW_WEEKS)
+
+
+if __name__ == '__main__':
+    import argparse
+    from .neo4j_handler import close_driver
+    parser = argparse.ArgumentParser(description="Derive Res/SKU bottleneck flags from ResWeek utilization.")
+    parser.add_argument('--threshold', type=float, default=BOTTLENECK_UTILIZATION)
+    parser.add_argument('--min-weeks', type=int, default=BOTTLENECK_MIN_WEEKS)
+    parser.add_argument('--window', type=int, default=BOTTLENECK_WINDOW_WEEKS)
+    parser.add_argument('--dry-run', action='store_true', help="report the changes without writing them")
+    args = parser.parse_args()
+    try:
+        print(run_analysis(dry_run=args.dry_run, threshold=args.threshold, min_weeks=args.min_weeks, window=args.window))
+    finally:
+        close_driver()
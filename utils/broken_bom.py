@@ -0,0 +1,220 @@
+# utils/broken_bom.py
+# Computes the SKU broken_bom flag on the in-memory supply graph and writes changed flags back.
+#
+# A node is supplied when supply reaches it from a source: PurchGroup nodes and SKUs with
+# infinite_supply are supplied by definition, and supply flows along SOURCING / PRODUCES /
+# CONSUMED_BY / PURCH_FROM. Under BROKEN_BOM_RULE=path (the default, the rule the shortest-path
+# query applies) one supplied predecessor is enough; under all_components a BOM additionally
+# needs every consumed component supplied. A SKU that is not supplied has a broken BOM.
+#
+# Propagation is level-synchronous over the CSR adjacency. After a snapshot change only the part
+# of the graph downstream of what changed (sources, relationships, nodes) is recomputed; the rest
+# keeps its previous result. Only flags that differ from the graph are written, in batched UNWIND
+# transactions, after which the snapshot refresh picks them up like any other change.
+#
+# Run once with: python -m utils.broken_bom [--full] [--dry-run]
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import threading
+import time
+import os
+import numpy as np
+from .neo4j_handler import write_batches, chunks
+from .supply_graph import SNAPSHOT_CHANGE_PROPERTY, get_supply_graph
+from .graph_snapshot import add_change_listener, request_refresh
+
+BROKEN_BOM_RULE = os.getenv("BROKEN_BOM_RULE", "path")
+# Recompute and write flags after every snapshot change (see start_broken_bom_analysis).
+BROKEN_BOM_AUTO = os.getenv("BROKEN_BOM_AUTO", "false").lower() == "true"
+BROKEN_BOM_BATCH_SIZE = int(os.getenv("BROKEN_BOM_BATCH_SIZE", "10000"))
+BROKEN_BOM_WORKERS = int(os.getenv("BROKEN_BOM_WORKERS", "4"))
+
+# The change stamp makes the snapshot refresh fetch the new flags.
+WRITE_FLAGS_QUERY = f"""
+UNWIND $rows AS row
+MATCH (s:SKU) WHERE elementId(s) = row.id
+SET s.broken_bom = row.broken, s.{SNAPSHOT_CHANGE_PROPERTY} = timestamp()
+"""
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+_last = {'graph': None, 'supplied': None, 'rule': None}
+_status = {'lastRun': None, 'lastError': None}
+_lock = threading.Lock()
+
+
+def source_mask(graph):
+    return graph.is_label['PurchGroup'] | (graph.is_label['SKU'] & graph.flag('infinite_supply'))
+
+
+def _required_inputs(graph, rule):
+    """How many supplied predecessors each node needs."""
+    need = np.ones(graph.num_nodes, dtype=np.int64)
+    if rule == 'all_components':
+        in_degree = np.diff(graph.supply_rev.indptr)
+        bom = graph.is_label['BOM']
+        need[bom] = np.maximum(in_degree[bom], 1)
+    return need
+
+
+def propagate(graph, rule=BROKEN_BOM_RULE, region=None, supplied=None):
+    """
+    Supplied mask of every node. With `region` (a downstream-closed node mask) only those nodes
+    are recomputed; the others keep their value from `supplied`, the previous result.
+    """
+    n = graph.num_nodes
+    csr = graph.supply_fwd
+    need = _required_inputs(graph, rule)
+    sources = source_mask(graph)
+    if region is None:
+        region = np.ones(n, dtype=bool)
+        supplied = np.zeros(n, dtype=bool)
+    else:
+        supplied = supplied.copy()
+        supplied[region] = False
+    count = np.zeros(n, dtype=np.int64)
+    # Supply already arriving from outside the region.
+    boundary = np.flatnonzero(supplied).astype(np.int32)
+    targets = csr.nbr[csr.slots(boundary)] if boundary.size else _EMPTY
+    targets = targets[region[targets]]
+    count += np.bincount(targets, minlength=n)
+
+    newly = region & (sources | (count >= need))
+    while newly.any():
+        supplied |= newly
+        frontier = np.flatnonzero(newly).astype(np.int32)
+        targets = csr.nbr[csr.slots(frontier)]
+        targets = targets[region[targets] & ~supplied[targets]]
+        if not targets.size:
+            break
+        count += np.bincount(targets, minlength=n)
+        candidates = np.unique(targets)
+        newly = np.zeros(n, dtype=bool)
+        newly[candidates[count[candidates] >= need[candidates]]] = True
+    return supplied
+
+
+def _changed_seeds(old, new):
+    """
+    Nodes of `new` whose supply status may differ from `old`: new nodes, nodes whose source status
+    changed, and the targets of added or removed supply relationships. None if nothing is comparable.
+    """
+    if old is None or old.num_nodes == 0:
+        return None
+    seeds = np.zeros(new.num_nodes, dtype=bool)
+    same_nodes = new.node_ids is old.node_ids
+    if same_nodes:
+        old_to_new = np.arange(new.num_nodes)
+    else:
+        old_to_new = np.array([new.node_index.get(node_id, -1) for node_id in old.node_ids], dtype=np.int64)
+        present = np.zeros(new.num_nodes, dtype=bool)
+        present[old_to_new[old_to_new >= 0]] = True
+        seeds |= ~present
+    old_sources = np.zeros(new.num_nodes, dtype=bool)
+    kept = old_to_new >= 0
+    old_sources[old_to_new[kept]] = source_mask(old)[kept]
+    seeds |= old_sources != source_mask(new)
+    if new.rel_ids is not old.rel_ids:
+        old_rels = set(old.rel_ids)
+        new_rels = set(new.rel_ids)
+        for e in (new.rel_index[rel_id] for rel_id in new_rels - old_rels):
+            seeds[new.rel_dst[e]] = True
+        for e in (old.rel_index[rel_id] for rel_id in old_rels - new_rels):
+            target = old_to_new[old.rel_dst[e]]
+            if target >= 0:
+                seeds[target] = True
+    return seeds, old_to_new
+
+
+def analyze(graph, full=False, rule=BROKEN_BOM_RULE):
+    """
+    Supplied mask for `graph`, recomputing only what changed since the previous analysis unless
+    `full` is set. Returns (supplied, stats).
+    """
+    started = time.perf_counter()
+    previous = None if full else _last['graph']
+    changed = _changed_seeds(previous, graph) if previous is not None and _last['rule'] == rule else None
+    if changed is None:
+        supplied = propagate(graph, rule)
+        recomputed = graph.num_nodes
+    else:
+        seeds, old_to_new = changed
+        region = graph.downstream(np.flatnonzero(seeds)) if seeds.any() else np.zeros(graph.num_nodes, dtype=bool)
+        carried = np.zeros(graph.num_nodes, dtype=bool)
+        kept = old_to_new >= 0
+        carried[old_to_new[kept]] = _last['supplied'][kept]
+        supplied = propagate(graph, rule, region, carried) if region.any() else carried
+        recomputed = int(region.sum())
+    _last.update(graph=graph, supplied=supplied, rule=rule)
+    return supplied, {
+        'mode': 'full' if changed is None else 'incremental',
+        'nodes': graph.num_nodes,
+        'recomputedNodes': recomputed,
+        'computeSeconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def flag_changes(graph, supplied):
+    """[{'id', 'broken'}] for every SKU whose computed flag differs from its broken_bom property."""
+    sku = graph.is_label['SKU']
+    broken = sku & ~supplied
+    changed = np.flatnonzero(sku & (broken != graph.flag('broken_bom')))
+    return [{'id': graph.node_ids[i], 'broken': bool(broken[i])} for i in changed]
+
+
+def run_analysis(graph=None, full=False, dry_run=False):
+    """Computes the flags for the current snapshot and writes the ones that changed."""
+    with _lock:
+        try:
+            graph = graph or get_supply_graph()
+            supplied, stats = analyze(graph, full)
+            changes = flag_changes(graph, supplied)
+            started = time.perf_counter()
+            if changes and not dry_run:
+                write_batches(WRITE_FLAGS_QUERY, chunks(changes, BROKEN_BOM_BATCH_SIZE), BROKEN_BOM_WORKERS)
+                request_refresh()
+            stats.update({
+                'rule': BROKEN_BOM_RULE,
+                'brokenSkus': int((graph.is_label['SKU'] & ~supplied).sum()),
+                'flagsChanged': len(changes),
+                'newlyBroken': sum(1 for row in changes if row['broken']),
+                'repaired': sum(1 for row in changes if not row['broken']),
+                'written': not dry_run,
+                'writeSeconds': round(time.perf_counter() - started, 3),
+                'finishedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            })
+            _status.update(lastRun=stats, lastError=None)
+            return stats
+        except Exception as e:
+            _status['lastError'] = str(e)
+            raise
+
+
+def broken_bom_status():
+    return dict(_status, rule=BROKEN_BOM_RULE, auto=BROKEN_BOM_AUTO)
+
+
+def _on_snapshot_change(graph):
+    if graph is not None:
+        run_analysis(graph)
+
+
+def start_broken_bom_analysis(enabled=BROKEN_BOM_AUTO):
+    """Re-runs the analysis after each snapshot change when BROKEN_BOM_AUTO is set."""
+    if enabled:
+        add_change_listener(_on_snapshot_change)
+
+
+if __name__ == '__main__':
+    import argparse
+    from .neo4j_handler import close_driver
+    parser = argparse.ArgumentParser(description="Recompute SKU broken_bom flags and write the changed ones.")
+    parser.add_argument('--full', action='store_true')
+    parser.add_argument('--dry-run', action='store_true', help="report the changes without writing them")
+    args = parser.parse_args()
+    try:
+        print(run_analysis(full=args.full, dry_run=args.dry_run))
+    finally:
+        close_driver()
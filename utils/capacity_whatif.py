@@ -0,0 +1,213 @@
+# utils/capacity_whatif.py
+# Capacity what-if scenarios on the cached ResWeek matrix and pegging index. Capacity changes
+# are applied to a copy of the resources x weeks capacity array, utilization is recomputed as
+# load / capacity for the changed cells, and a demand counts as constrained when any
+# resource-week it is pegged to is above the utilization threshold (the rule the bottleneck
+# flags use). Everything is array math over the matrix and the pegging rows; nothing is written.
+import threading
+import time
+import os
+import numpy as np
+from .resweek import get_resweek_matrix
+from .pegging_index import get_pegging_index, demand_properties
+from .bottleneck import BOTTLENECK_UTILIZATION
+
+# How many flipped cells and demands a scenario lists; counts always cover everything.
+WHATIF_DETAIL_LIMIT = int(os.getenv("WHATIF_DETAIL_LIMIT", "200"))
+
+_aligned = {'matrix': None, 'index': None, 'arrays': None}
+_aligned_lock = threading.Lock()
+
+
+def _number(change, name):
+    value = change.get(name, 0)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f'{name} must be a number')
+    return float(value)
+
+
+def _week(change, name):
+    value = change.get(name)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+        raise ValueError(f'{name} must be an integer week')
+    return value
+
+
+def scenario_request(data):
+    """(changes, threshold) from {"changes": [...], "threshold"}. Raises ValueError."""
+    changes = data.get('changes') if isinstance(data, dict) else None
+    if not isinstance(changes, list) or not changes:
+        raise ValueError('changes must be a non-empty list')
+    parsed = []
+    for change in changes:
+        if not isinstance(change, dict):
+            raise ValueError('Every change must be an object')
+        res_ids = change.get('resIds', [change['resId']] if change.get('resId') else None)
+        if res_ids is not None and (not isinstance(res_ids, list) or not all(isinstance(r, str) for r in res_ids)):
+            raise ValueError('resIds must be a list of resource ids')
+        parsed.append({
+            'resIds': res_ids,   # None: every resource
+            'fromWeek': _week(change, 'fromWeek'),
+            'toWeek': _week(change, 'toWeek'),
+            'capacityPct': _number(change, 'capacityPct'),
+            'capacityDelta': _number(change, 'capacityDelta'),
+        })
+    threshold = data.get('threshold', BOTTLENECK_UTILIZATION)
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+        raise ValueError('threshold must be a number')
+    return parsed, float(threshold)
+
+
+def _peg_arrays(matrix, index):
+    """(matrix cell or -1, demand, loadQty) per pegging row, kept until either cache reloads."""
+    with _aligned_lock:
+        if _aligned['matrix'] is matrix and _aligned['index'] is index:
+            return _aligned['arrays']
+        num_weeks = len(matrix.weeks)
+        key_cells = np.full(len(index.keys), -1, dtype=np.int64)
+        for k, (res_id, week) in enumerate(index.keys):
+            r = matrix.res_index.get(res_id)
+            w = matrix.week_index.get(week)
+            if r is not None and w is not None:
+                key_cells[k] = r * num_weeks + w
+        keys, demands, loads = index.peg_arrays()
+        arrays = (key_cells[keys], demands, np.nan_to_num(loads))
+        _aligned.update(matrix=matrix, index=index, arrays=arrays)
+        return arrays
+
+
+def apply_changes(matrix, changes):
+    """(new capacity, changed-cell mask, unknown resource ids) for a list of parsed changes."""
+    capacity = matrix.capacity.copy()
+    changed = np.zeros(capacity.shape, dtype=bool)
+    unknown = []
+    for change in changes:
+        if change['resIds'] is None:
+            rows = np.arange(len(matrix.res_ids))
+        else:
+            unknown += [res_id for res_id in change['resIds'] if res_id not in matrix.res_index]
+            rows = np.array([matrix.res_index[res_id] for res_id in change['resIds'] if res_id in matrix.res_index], dtype=np.int64)
+        columns = np.asarray(matrix.week_columns(change['fromWeek'], change['toWeek']), dtype=np.int64)
+        block = np.ix_(rows, columns)
+        capacity[block] = np.maximum(capacity[block] * (1 + change['capacityPct'] / 100) + change['capacityDelta'], 0)
+        # Cells without a ResWeek row stay NaN and are not counted as changed.
+        changed[block] |= ~np.isnan(capacity[block])
+    return capacity, changed, unknown
+
+
+def utilization_with(matrix, capacity, changed):
+    """
+    Utilization after the changes. The stored utilization of a changed cell is scaled by
+    capacity before / after, so an unchanged capacity keeps the stored value exactly; a cell
+    without a usable capacity before falls back to load / capacity, and one whose capacity
+    drops to 0 is infinite when it carries load.
+    """
+    utilization = matrix.utilization.copy()
+    stored = utilization[changed]
+    before = matrix.capacity[changed]
+    after = capacity[changed]
+    load = matrix.load[changed]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = np.where(before == after, stored, stored * (before / after))
+        recomputed = np.where(load > 0, np.inf, np.nan)
+        recomputed = np.where(after > 0, load / after, recomputed)
+        utilization[changed] = np.where((before > 0) & (after > 0), scaled,
+                                        np.where(before == after, stored, recomputed))
+    return utilization
+
+
+def _constrained(over, cells, demands, num_demands):
+    pegged_over = np.zeros(len(cells), dtype=bool)
+    aligned = cells >= 0
+    pegged_over[aligned] = over.ravel()[cells[aligned]]
+    return np.bincount(demands[pegged_over], minlength=num_demands) > 0
+
+
+def _value(x):
+    # NaN and the infinite utilization of a zero-capacity cell become null.
+    return float(x) if np.isfinite(x) else None
+
+
+def _cell(matrix, i, j, capacity, utilization):
+    return {
+        'resId': matrix.res_ids[i],
+        'week': matrix.weeks[j],
+        'capacityBefore': _value(matrix.capacity[i, j]),
+        'capacityAfter': _value(capacity[i, j]),
+        'load': _value(matrix.load[i, j]),
+        'utilizationBefore': _value(matrix.utilization[i, j]),
+        'utilizationAfter': _value(utilization[i, j]),
+    }
+
+
+def _demand_details(index, loads_by_demand, codes):
+    # Largest pegged load first; properties are attached by attach_demand_properties.
+    codes = codes[np.argsort(-loads_by_demand[codes], kind='stable')][:WHATIF_DETAIL_LIMIT]
+    return [{'demandId': index.demand_ids[d], 'demand': None, 'peggedLoadQty': float(loads_by_demand[d])} for d in codes]
+
+
+def listed_demands(result):
+    return result['demands']['relieved'] + result['demands']['newlyConstrained']
+
+
+def attach_demand_properties(result, props):
+    """Fills in the properties of the listed demands from {demand id: properties}."""
+    for row in listed_demands(result):
+        row['demand'] = props.get(row['demandId'])
+    return result
+
+
+def run_scenario(changes, threshold=BOTTLENECK_UTILIZATION, with_properties=True):
+    """
+    Applies the changes to in-memory copies and returns what moved: cells, resources and demands.
+    Without with_properties the listed demands carry only their ids (the async handler fetches the rest).
+    """
+    matrix = get_resweek_matrix()
+    index = get_pegging_index()
+    started = time.perf_counter()
+    cells, demands, loads = _peg_arrays(matrix, index)
+    capacity, changed, unknown = apply_changes(matrix, changes)
+    utilization = utilization_with(matrix, capacity, changed)
+    over_before = matrix.utilization > threshold
+    over_after = utilization > threshold
+
+    num_demands = len(index.demand_ids)
+    constrained_before = _constrained(over_before, cells, demands, num_demands)
+    constrained_after = _constrained(over_after, cells, demands, num_demands)
+    relieved = np.flatnonzero(constrained_before & ~constrained_after)
+    newly = np.flatnonzero(constrained_after & ~constrained_before)
+    loads_by_demand = np.bincount(demands, weights=loads, minlength=num_demands)
+
+    relieved_cells = np.argwhere(over_before & ~over_after)
+    new_cells = np.argwhere(over_after & ~over_before)
+    rows = np.flatnonzero(changed.any(axis=1))
+    computed = time.perf_counter()
+    result = {
+        'threshold': threshold,
+        'unknownResources': sorted(set(unknown)),
+        'changedCells': int(changed.sum()),
+        'cells': {
+            'overloadedBefore': int(over_before.sum()),
+            'overloadedAfter': int(over_after.sum()),
+            'relieved': [_cell(matrix, i, j, capacity, utilization) for i, j in relieved_cells[:WHATIF_DETAIL_LIMIT]],
+            'newlyOverloaded': [_cell(matrix, i, j, capacity, utilization) for i, j in new_cells[:WHATIF_DETAIL_LIMIT]],
+        },
+        'resources': [{
+            'resId': matrix.res_ids[i],
+            'overloadedWeeksBefore': int(over_before[i].sum()),
+            'overloadedWeeksAfter': int(over_after[i].sum()),
+        } for i in rows[:WHATIF_DETAIL_LIMIT]],
+        'demands': {
+            'constrainedBefore': int(constrained_before.sum()),
+            'constrainedAfter': int(constrained_after.sum()),
+            'relievedCount': len(relieved),
+            'newlyConstrainedCount': len(newly),
+            'relieved': _demand_details(index, loads_by_demand, relieved),
+            'newlyConstrained': _demand_details(index, loads_by_demand, newly),
+        },
+        'computeSeconds': round(computed - started, 4),
+        'dataVersion': {'resWeek': matrix.stats(), 'pegging': index.stats()},
+    }
+    if with_properties:
+        attach_demand_properties(result, demand_properties([row['demandId'] for row in listed_demands(result)]))
+    return result
@@ -0,0 +1,74 @@
+# utils/data_version.py
+# Validators for read-only endpoints. The data version is the graph snapshot version (bumped by
+# every refresh that sees the graph or the tracked plan data change) together with the order file
+# stats, so it is known without a query. Views wrapped in conditional_get answer a matching
+# If-None-Match / If-Modified-Since with 304 before running, and tag 200 responses with ETag and
+# Last-Modified.
+import functools
+import hashlib
+import time
+from flask import request, make_response
+from werkzeug.http import http_date, parse_date
+from .graph_snapshot import current_version, last_change, tracking_changes
+from .order_store import get_order_store, ORDER_FILES
+
+# Versions restart at 0 with the process, so tags also carry the start time.
+_STARTED = time.time()
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(repr((_STARTED,) + parts).encode()).hexdigest()[:16]
+    return f'"{digest}"'
+
+
+def data_validators(args=None):
+    """(ETag, Last-Modified time) of the current data, None while the version does not follow the data."""
+    if not tracking_changes():
+        return None
+    store = get_order_store()
+    files = tuple(store.file_signature(kind) for kind in ORDER_FILES)
+    modified = max([last_change() or _STARTED] + [signature[0] / 1e9 for signature in files if signature])
+    return make_etag(current_version(), files), modified
+
+
+def is_not_modified(headers, validators):
+    etag, modified = validators
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        # If-Modified-Since is ignored when If-None-Match is present.
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    since = parse_date(headers.get('If-Modified-Since'))
+    return since is not None and int(modified) <= since.timestamp()
+
+
+def set_validators(response, validators):
+    etag, modified = validators
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(modified)
+    # Cached copies must be revalidated, which costs no query.
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def conditional_get(validators=data_validators):
+    """
+    Decorator for GET views whose response only depends on the data behind `validators`, which
+    is called with the request args and returns None to skip the check.
+    The validators are read before the view runs, so a change during the request only makes
+    the next request fetch again.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            tags = validators(request.args)
+            if tags is None:
+                return view(*args, **kwargs)
+            if is_not_modified(request.headers, tags):
+                return set_validators(make_response('', 304), tags)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                set_validators(response, tags)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,111 @@
+# utils/fg_health.py
+# FG health reports. A SKU's demands are traversed once: each demand's constraints are collected
+# in a subquery, and the totals, the constrained subset and the distinct constraints are all
+# aggregated from that one pass. The batch variant returns the same figures (without the demand
+# lists) for many SKUs per query, UNWINDing FG_HEALTH_BATCH_SIZE sku_ids at a time, and is
+# streamed as newline-delimited JSON, one status line per requested SKU, in request order.
+import json
+import os
+
+FG_HEALTH_BATCH_SIZE = int(os.getenv("FG_HEALTH_BATCH_SIZE", "500"))
+FG_HEALTH_MAX_SKUS = int(os.getenv("FG_HEALTH_MAX_SKUS", "20000"))
+
+FG_HEALTH_QUERY = """
+MATCH (s:SKU {sku_id: $sku_id})
+OPTIONAL MATCH (s)<-[:IS_FOR_SKU]-(d:Demand)
+CALL(d) {
+    OPTIONAL MATCH (d)<-[:IMPACTS_DEMAND]-(c:Constraint)
+    RETURN collect(properties(c)) AS demand_constraints
+}
+WITH s, d, demand_constraints, size(demand_constraints) > 0 AS constrained
+RETURN s.sku_id AS sku,
+       collect(d {.*, broken_bom: s.broken_bom}) AS all_demands,
+       count(d) AS total_demand_count,
+       coalesce(sum(d.qty), 0) AS total_demand_qty,
+       collect(CASE WHEN constrained THEN d {.*, broken_bom: s.broken_bom, constraints: demand_constraints} END) AS constrained_demands,
+       count(CASE WHEN constrained THEN d END) AS constrained_demand_count,
+       coalesce(sum(CASE WHEN constrained THEN d.qty END), 0) AS constrained_demand_qty,
+       reduce(acc = [], cs IN collect(demand_constraints) | acc + [c IN cs WHERE NOT c IN acc]) AS constraints
+"""
+
+FG_HEALTH_BATCH_QUERY = """
+UNWIND range(0, size($sku_ids) - 1) AS i
+OPTIONAL MATCH (s:SKU {sku_id: $sku_ids[i]})
+CALL(s) {
+    OPTIONAL MATCH (s)<-[:IS_FOR_SKU]-(d:Demand)
+    CALL(d) {
+        OPTIONAL MATCH (d)<-[:IMPACTS_DEMAND]-(c:Constraint)
+        RETURN collect(elementId(c)) AS constraint_ids
+    }
+    WITH d, constraint_ids, size(constraint_ids) > 0 AS constrained
+    RETURN count(d) AS total_demand_count,
+           coalesce(sum(d.qty), 0) AS total_demand_qty,
+           count(CASE WHEN constrained THEN d END) AS constrained_demand_count,
+           coalesce(sum(CASE WHEN constrained THEN d.qty END), 0) AS constrained_demand_qty,
+           size(reduce(acc = [], ids IN collect(constraint_ids) | acc + [cid IN ids WHERE NOT cid IN acc])) AS constraint_count
+}
+RETURN i, s IS NOT NULL AS found, total_demand_count, total_demand_qty,
+       constrained_demand_count, constrained_demand_qty, constraint_count
+"""
+
+
+def health_status(total_qty, constrained_qty):
+    """Healthy / At Risk / Constrained from the share of demand quantity that is constrained."""
+    if constrained_qty <= 0:
+        return "Healthy"
+    return "Constrained" if total_qty > 0 and constrained_qty / total_qty >= 0.5 else "At Risk"
+
+
+def build_health_report(result):
+    """Adds the Healthy / At Risk / Constrained status to an FG_HEALTH_QUERY record."""
+    response_data = dict(result)
+    response_data['status'] = health_status(result['total_demand_qty'], result['constrained_demand_qty'])
+    response_data['found'] = True
+    return response_data
+
+
+def health_request(data):
+    """sku_ids from a batch request body: {"skus": [{"item", "loc"}, ...]}. Raises ValueError."""
+    skus = data.get('skus') if isinstance(data, dict) else None
+    if not isinstance(skus, list) or not skus:
+        raise ValueError('skus must be a non-empty list of {item, loc}')
+    if len(skus) > FG_HEALTH_MAX_SKUS:
+        raise ValueError(f'At most {FG_HEALTH_MAX_SKUS} skus per request')
+    sku_ids = []
+    for sku in skus:
+        item = sku.get('item') if isinstance(sku, dict) else None
+        loc = sku.get('loc') if isinstance(sku, dict) else None
+        if not item or not loc:
+            raise ValueError('Every sku needs an item and a loc')
+        sku_ids.append(f"{item}@{loc}")
+    return sku_ids
+
+
+def _status_lines(sku_ids, rows):
+    for row in sorted(rows, key=lambda row: row['i']):
+        data = {'sku': sku_ids[row['i']], 'found': row['found']}
+        if row['found']:
+            data.update({
+                'status': health_status(row['total_demand_qty'], row['constrained_demand_qty']),
+                'totalDemandCount': row['total_demand_count'],
+                'totalDemandQty': row['total_demand_qty'],
+                'constrainedDemandCount': row['constrained_demand_count'],
+                'constrainedDemandQty': row['constrained_demand_qty'],
+                'constraintCount': row['constraint_count'],
+            })
+        yield json.dumps({'type': 'status', 'data': data}, default=str)
+
+
+def stream_health_ndjson(session, sku_ids, batch_size=FG_HEALTH_BATCH_SIZE):
+    """Yields one NDJSON chunk per batch of SKUs, each line {"type": "status", "data": {...}}."""
+    for start in range(0, len(sku_ids), batch_size):
+        batch = sku_ids[start:start + batch_size]
+        yield '\n'.join(_status_lines(batch, session.run(FG_HEALTH_BATCH_QUERY, sku_ids=batch))) + '\n'
+
+
+async def stream_health_ndjson_async(session, sku_ids, batch_size=FG_HEALTH_BATCH_SIZE):
+    """Same NDJSON chunks as stream_health_ndjson, read from an async session."""
+    for start in range(0, len(sku_ids), batch_size):
+        batch = sku_ids[start:start + batch_size]
+        result = await session.run(FG_HEALTH_BATCH_QUERY, sku_ids=batch)
+        yield '\n'.join(_status_lines(batch, [row async for row in result])) + '\n'
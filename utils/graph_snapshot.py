@@ -0,0 +1,248 @@
+# utils/graph_snapshot.py
+# Keeps the in-memory supply graph current without reloading it.
+#
+# Each refresh reads a signature per label and relationship type: the element count and the
+# latest SNAPSHOT_CHANGE_PROPERTY stamp. Kinds whose signature moved are diffed against the
+# snapshot:
+#   * rows stamped after the previous signature are fetched,
+#   * ids that appeared or disappeared are fetched by id (missing ones are deletions),
+# and the delta is applied to a copy of the snapshot, which is then swapped in.
+# Every observed change bumps a version counter that caches can use as part of their key. The
+# tracked plan kinds (constraints, demands, resource weeks) only bump the version.
+import threading
+import asyncio
+import time
+import os
+import numpy as np
+from .neo4j_handler import get_session
+from .supply_graph import (
+    NODE_LABELS, REL_TYPES, REL_TYPE_CODES, TRACKED_LABELS, TRACKED_REL_TYPES, SNAPSHOT_CHANGE_PROPERTY,
+    read_signatures, loaded_supply_graph, set_supply_graph,
+)
+
+# Seconds between background refreshes; 0 disables the refresh thread.
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "60"))
+
+_LOADED_NODE = "(n:SKU OR n:BOM OR n:Res OR n:PurchGroup)"
+_LOADED_ENDPOINTS = "(a:SKU OR a:BOM OR a:Res OR a:PurchGroup) AND (b:SKU OR b:BOM OR b:Res OR b:PurchGroup)"
+_NODE_COLUMNS = "elementId(n) AS id, labels(n) AS labels, properties(n) AS props"
+_REL_COLUMNS = "elementId(r) AS id, type(r) AS type, properties(r) AS props, elementId(a) AS start, elementId(b) AS end"
+
+_state = {
+    'version': 0,
+    'signatures': None,
+    'lastRefresh': None,
+    'lastChange': None,
+    'lastDurationSeconds': None,
+    'lastDelta': None,
+    'lastError': None,
+}
+_refresh_lock = threading.Lock()
+_wake = threading.Event()
+_thread = None
+_listeners = []
+
+
+def current_version():
+    """Increases every time a refresh sees the graph change."""
+    return _state['version']
+
+
+def last_change():
+    """Time of the last refresh that saw a change, None if there was none yet."""
+    return _state['lastChange']
+
+
+def tracking_changes():
+    """True once the refresh thread runs and has a baseline, i.e. when the version follows the data."""
+    return _thread is not None and _state['signatures'] is not None
+
+
+def _changed_kinds(old, new, kinds):
+    return [kind for kind in kinds if old.get(kind) != new.get(kind)]
+
+
+def _since(old, kind):
+    # Latest stamp from the previous signature; None forces every row of the kind to be fetched.
+    return old[kind][1] if kind in old else None
+
+
+def _fetch_node_delta(session, graph, labels, old):
+    rows, deleted = {}, set()
+    for label in labels:
+        current = {row['id'] for row in session.run(f"MATCH (n:{label}) RETURN elementId(n) AS id")}
+        query = f"MATCH (n:{label}) WHERE $since IS NULL OR n[$prop] > $since RETURN {_NODE_COLUMNS}"
+        for row in session.run(query, since=_since(old, label), prop=SNAPSHOT_CHANGE_PROPERTY):
+            rows[row['id']] = row
+        known = {graph.node_ids[i] for i in np.flatnonzero(graph.is_label[label])}
+        moved = (current ^ known) - rows.keys()
+        if moved:
+            # New ids, or ids that left this label; the latter may still belong to another loaded label.
+            query = f"MATCH (n) WHERE elementId(n) IN $ids AND {_LOADED_NODE} RETURN {_NODE_COLUMNS}"
+            found = {row['id']: row for row in session.run(query, ids=list(moved))}
+            rows.update(found)
+            deleted |= moved - found.keys()
+    return list(rows.values()), deleted
+
+
+def _fetch_rel_delta(session, graph, rel_types, old):
+    rows, deleted = {}, set()
+    for rel_type in rel_types:
+        pattern = f"(a)-[r:{rel_type}]->(b) WHERE {_LOADED_ENDPOINTS}"
+        current = {row['id'] for row in session.run(f"MATCH {pattern} RETURN elementId(r) AS id")}
+        query = f"MATCH {pattern} AND ($since IS NULL OR r[$prop] > $since) RETURN {_REL_COLUMNS}"
+        for row in session.run(query, since=_since(old, rel_type), prop=SNAPSHOT_CHANGE_PROPERTY):
+            rows[row['id']] = row
+        known = {graph.rel_ids[e] for e in np.flatnonzero(graph.rel_type == REL_TYPE_CODES[rel_type])}
+        added = current - known - rows.keys()
+        if added:
+            query = f"MATCH (a)-[r]->(b) WHERE elementId(r) IN $ids RETURN {_REL_COLUMNS}"
+            rows.update((row['id'], row) for row in session.run(query, ids=list(added)))
+        deleted |= known - current
+    return list(rows.values()), deleted
+
+
+def refresh_snapshot():
+    """
+    Checks the signatures once and applies any changes to the loaded snapshot.
+    Returns True if the graph or the tracked plan data changed since the previous refresh.
+    """
+    with _refresh_lock:
+        started = time.perf_counter()
+        graph = loaded_supply_graph()
+        with get_session() as session:
+            signatures = read_signatures(session)
+            old = graph.signatures if graph is not None and graph.signatures is not None else _state['signatures']
+            _state['lastRefresh'] = time.time()
+            if old is None:
+                # First observation: nothing to compare against yet.
+                _state['signatures'] = signatures
+                return False
+            labels = _changed_kinds(old, signatures, NODE_LABELS)
+            rel_types = _changed_kinds(old, signatures, REL_TYPES)
+            tracked = _changed_kinds(old, signatures, TRACKED_LABELS + TRACKED_REL_TYPES)
+            if not labels and not rel_types and not tracked:
+                _state['signatures'] = signatures
+                return False
+            graph_changed = bool(labels or rel_types)
+            delta = {'labels': labels, 'relationshipTypes': rel_types, 'tracked': tracked}
+            if graph is not None and not graph_changed:
+                # Nothing loaded changed; keep the new baseline on the snapshot itself.
+                graph.signatures = signatures
+            elif graph is not None:
+                node_rows, deleted_nodes = _fetch_node_delta(session, graph, labels, old)
+                rel_rows, deleted_rels = _fetch_rel_delta(session, graph, rel_types, old)
+                updated = graph.apply_delta(node_rows, deleted_nodes, rel_rows, deleted_rels)
+                updated.signatures = signatures
+                set_supply_graph(updated)
+                delta.update({
+                    'nodesUpserted': len(node_rows), 'nodesDeleted': len(deleted_nodes),
+                    'relationshipsUpserted': len(rel_rows), 'relationshipsDeleted': len(deleted_rels),
+                })
+        _state['signatures'] = signatures
+        _state['version'] += 1
+        _state['lastChange'] = time.time()
+        _state['lastDurationSeconds'] = round(time.perf_counter() - started, 3)
+        _state['lastDelta'] = delta
+    if graph_changed:
+        _notify_listeners()
+    return True
+
+
+class SnapshotCache:
+    """
+    One value derived from the graph, rebuilt by load() when the snapshot version moved or the
+    value is older than max_age seconds. Concurrent callers wait for a single rebuild.
+    """
+
+    def __init__(self, load, max_age):
+        self.load = load
+        self.max_age = max_age
+        self.value = None
+        self.version = None
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        # Created on first async use, inside the server's event loop.
+        self._async_lock = None
+
+    def _fresh(self, version):
+        return self.value is not None and self.version == version and time.time() - self.loaded_at < self.max_age
+
+    def _set(self, value, version):
+        self.value = value
+        self.version = version
+        self.loaded_at = time.time()
+        return value
+
+    def get(self):
+        version = current_version()
+        with self._lock:
+            if not self._fresh(version):
+                self._set(self.load(), version)
+            return self.value
+
+    async def get_async(self, load_async):
+        """get() for the async handlers: a rebuild awaits load_async() instead of blocking a thread."""
+        version = current_version()
+        if self._fresh(version):
+            return self.value
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if not self._fresh(version):
+                value = await load_async()
+                with self._lock:
+                    self._set(value, version)
+            return self.value
+
+    def status(self):
+        return {'loaded': self.value is not None, 'version': self.version, 'loadedAt': self.loaded_at,
+                'cacheSeconds': self.max_age}
+
+
+def add_change_listener(callback):
+    """Registers callback(graph) to run after every refresh that changed the snapshot."""
+    _listeners.append(callback)
+
+
+def _notify_listeners():
+    graph = loaded_supply_graph()
+    for callback in _listeners:
+        try:
+            callback(graph)
+        except Exception as e:
+            print(f"An error occurred in snapshot change listener: {e}")
+
+
+def _refresh_loop(interval):
+    while True:
+        _wake.wait(interval)
+        _wake.clear()
+        try:
+            refresh_snapshot()
+            _state['lastError'] = None
+        except Exception as e:
+            _state['lastError'] = str(e)
+            print(f"An error occurred in snapshot refresh: {e}")
+
+
+def start_snapshot_refresh(interval=SNAPSHOT_REFRESH_SECONDS):
+    """Starts the background refresh thread once per process. Does nothing when interval <= 0."""
+    global _thread
+    if interval <= 0 or _thread is not None:
+        return
+    _thread = threading.Thread(target=_refresh_loop, args=(interval,), name='graph-snapshot-refresh', daemon=True)
+    _thread.start()
+
+
+def request_refresh():
+    """Wakes the refresh thread early, e.g. right after a planning run has been written."""
+    _wake.set()
+
+
+def snapshot_status():
+    status = {key: value for key, value in _state.items() if key != 'signatures'}
+    status['refreshThread'] = _thread is not None
+    status['refreshSeconds'] = SNAPSHOT_REFRESH_SECONDS
+    status['graphLoaded'] = loaded_supply_graph() is not None
+    return status
@@ -0,0 +1,215 @@
+# utils/impact_propagation.py
+# Shortage impact propagation on the in-memory supply snapshot: which finished goods (demand SKUs)
+# are downstream of a set of shortage sources, and how much order quantity sits on them.
+# A Res source enters the supply network at the BOMs it is used by ((Res)-[:USES_RESOURCE]->(BOM));
+# SKU, BOM and PurchGroup sources enter at themselves. From there the shortage follows SOURCING,
+# PRODUCES, CONSUMED_BY and PURCH_FROM forward.
+# All sources are propagated together: every node carries a 64-bit mask of the sources that reach
+# it. Masks are pushed over the DAG of strongly connected components (a cycle shares one mask) one
+# topological level at a time, so each edge is visited once and 64 sources cost one traversal.
+# Larger source sets run one traversal per 64 sources. The levels are computed once per snapshot.
+import threading
+import time
+import os
+import numpy as np
+from .supply_graph import CSR, get_supply_graph
+from .reachability import strongly_connected_components
+from .order_store import get_order_store, ORDER_FILES
+
+IMPACT_MAX_SOURCES = int(os.getenv("IMPACT_MAX_SOURCES", "2000"))
+# How many impacted finished goods a response lists; totals always cover all of them.
+IMPACT_DETAIL_LIMIT = int(os.getenv("IMPACT_DETAIL_LIMIT", "200"))
+IMPACT_DETAIL_MAX = 5000
+
+_WORD = 64
+_ONE = np.uint64(1)
+
+_aligned = {'graph': None, 'totals': None, 'arrays': None}
+_aligned_lock = threading.Lock()
+
+
+def impact_request(data):
+    """(sources, limit) from {"sources": [{"resId" | "skuId" | "nodeId"}], "limit"}. Raises ValueError."""
+    sources = data.get('sources') if isinstance(data, dict) else None
+    if not isinstance(sources, list) or not sources:
+        raise ValueError('sources must be a non-empty list')
+    if len(sources) > IMPACT_MAX_SOURCES:
+        raise ValueError(f'At most {IMPACT_MAX_SOURCES} sources per request')
+    parsed = []
+    for source in sources:
+        keys = [key for key in ('resId', 'skuId', 'nodeId') if isinstance(source, dict) and source.get(key)]
+        if len(keys) != 1 or not isinstance(source[keys[0]], str):
+            raise ValueError('Every source needs exactly one of resId, skuId or nodeId')
+        parsed.append((keys[0], source[keys[0]]))
+    limit = data.get('limit', IMPACT_DETAIL_LIMIT)
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 0:
+        raise ValueError('limit must be a non-negative integer')
+    return parsed, min(limit, IMPACT_DETAIL_MAX)
+
+
+def entry_nodes(graph, kind, key):
+    """Supply-network nodes where a source's shortage starts; None if the source is unknown."""
+    if kind == 'resId':
+        r = graph.res_index.get(key)
+        if r is None:
+            return None
+        slots = graph.res_fwd.slots(np.array([r], dtype=np.int32))
+        return graph.res_fwd.nbr[slots]
+    node = graph.sku_index.get(key) if kind == 'skuId' else graph.node_index.get(key)
+    return None if node is None else np.array([node], dtype=np.int32)
+
+
+class PropagationPlan:
+    """Component DAG of a snapshot's supply relationships with its components grouped by level."""
+
+    def __init__(self, graph):
+        started = time.perf_counter()
+        fwd = graph.supply_fwd
+        if graph.reachability is not None:
+            self.comp, num_comps = graph.reachability.comp, graph.reachability.num_comps
+        else:
+            self.comp, num_comps = strongly_connected_components(graph.num_nodes, fwd.indptr, fwd.nbr)
+        src = self.comp[graph.rel_src[fwd.edge]]
+        dst = self.comp[graph.rel_dst[fwd.edge]]
+        keep = src != dst
+        dag = np.unique(np.stack([src[keep], dst[keep]], axis=1), axis=0) if keep.any() else np.zeros((0, 2), dtype=np.int32)
+        self.dag = CSR(num_comps, dag[:, 0], dag[:, 1], np.arange(len(dag), dtype=np.int32))
+
+        # Longest-path level from the roots, so every parent sits on a lower level than its children.
+        self.level = np.zeros(num_comps, dtype=np.int32)
+        indegree = np.bincount(dag[:, 1], minlength=num_comps)
+        frontier = np.flatnonzero(indegree == 0).astype(np.int32)
+        num_levels = 0
+        while frontier.size:
+            self.level[frontier] = num_levels
+            children = self.dag.nbr[self.dag.slots(frontier)]
+            indegree -= np.bincount(children, minlength=num_comps)
+            frontier = np.unique(children[indegree[children] == 0])
+            num_levels += 1
+        self.num_comps = num_comps
+        self.num_levels = num_levels
+        self.level_ptr = np.zeros(num_levels + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.level, minlength=num_levels), out=self.level_ptr[1:])
+        self.by_level = np.argsort(self.level, kind='stable').astype(np.int32)
+        self.build_seconds = time.perf_counter() - started
+
+    def propagate(self, seed_nodes, seed_bits):
+        """uint64 mask per component of the seed bits reaching it (seeds included)."""
+        bits = np.zeros(self.num_comps, dtype=np.uint64)
+        if seed_nodes.size == 0:
+            # e.g. resources that no BOM uses
+            return bits
+        seed_comps = self.comp[seed_nodes]
+        np.bitwise_or.at(bits, seed_comps, seed_bits)
+        for level in range(int(self.level[seed_comps].min()), self.num_levels):
+            comps = self.by_level[self.level_ptr[level]:self.level_ptr[level + 1]]
+            comps = comps[bits[comps] != 0]
+            if comps.size:
+                counts = self.dag.indptr[comps + 1] - self.dag.indptr[comps]
+                np.bitwise_or.at(bits, self.dag.nbr[self.dag.slots(comps)], np.repeat(bits[comps], counts))
+        return bits
+
+    def stats(self):
+        return {
+            'components': self.num_comps,
+            'dagEdges': int(len(self.dag.nbr)),
+            'levels': self.num_levels,
+            'buildSeconds': round(self.build_seconds, 3),
+            'memoryBytes': self.dag.nbytes() + self.level.nbytes + self.level_ptr.nbytes + self.by_level.nbytes,
+        }
+
+
+_plan = {'graph': None, 'plan': None}
+_plan_lock = threading.Lock()
+
+
+def propagation_plan(graph):
+    """The plan of this snapshot, built on first use after each snapshot swap."""
+    with _plan_lock:
+        if _plan['graph'] is not graph:
+            _plan.update(graph=graph, plan=PropagationPlan(graph))
+        return _plan['plan']
+
+
+def impact_plan_status():
+    """Stats of the current plan without building one."""
+    plan = _plan['plan']
+    return {'built': plan is not None, 'stats': plan.stats() if plan is not None else None}
+
+
+def order_totals():
+    """{kind: {sku_id: (order count, total qty)}} from the order store."""
+    store = get_order_store()
+    return {kind: store.order_totals(kind) for kind in ORDER_FILES}
+
+
+def _finished_goods(graph, totals):
+    """(demand SKU nodes, order count and qty per node for each order kind), kept per snapshot and order data."""
+    with _aligned_lock:
+        if _aligned['graph'] is graph and all(_aligned['totals'][kind] is totals[kind] for kind in ORDER_FILES):
+            return _aligned['arrays']
+    fg = np.flatnonzero(graph.is_label['SKU'] & graph.flag('demand_sku')).astype(np.int32)
+    sku_ids = [graph.node_props[i].get('sku_id') for i in fg]
+    orders = {}
+    for kind in ORDER_FILES:
+        rows = [totals[kind].get(sku_id, (0, 0.0)) for sku_id in sku_ids]
+        orders[kind] = (np.array([row[0] for row in rows], dtype=np.int64),
+                        np.array([row[1] for row in rows], dtype=np.float64))
+    arrays = (fg, sku_ids, orders)
+    with _aligned_lock:
+        _aligned.update(graph=graph, totals=totals, arrays=arrays)
+    return arrays
+
+
+def _bit(b):
+    return _ONE << np.uint64(b)
+
+
+def propagate_impact(sources, limit=IMPACT_DETAIL_LIMIT, graph=None, totals=None):
+    """
+    Impacted finished goods of the sources, largest order quantity first, with per-source totals.
+    `totals` (see order_totals) is read from the order store when not given.
+    """
+    graph = graph or get_supply_graph()
+    plan = propagation_plan(graph)
+    fg, sku_ids, orders = _finished_goods(graph, totals or order_totals())
+    fg_comps = plan.comp[fg]
+    started = time.perf_counter()
+
+    entries = [entry_nodes(graph, kind, key) for kind, key in sources]
+    known = [s for s, nodes in enumerate(entries) if nodes is not None]
+    # One (sources, uint64 mask per finished good) pair per traversal of up to 64 sources.
+    chunks = []
+    for start in range(0, len(known), _WORD):
+        chunk = known[start:start + _WORD]
+        seed_nodes = np.concatenate([entries[s] for s in chunk]).astype(np.int32)
+        seed_bits = np.concatenate([np.full(len(entries[s]), _bit(b), dtype=np.uint64) for b, s in enumerate(chunk)])
+        chunks.append((chunk, plan.propagate(seed_nodes, seed_bits)[fg_comps]))
+    impacted = np.zeros(len(fg), dtype=bool)
+    for _, fg_bits in chunks:
+        impacted |= fg_bits != 0
+
+    total_qty = sum(qty for _, qty in orders.values())
+    per_source = [{kind: key, 'found': entries[s] is not None, 'finishedGoods': 0, 'totalQty': 0.0}
+                  for s, (kind, key) in enumerate(sources)]
+    for chunk, fg_bits in chunks:
+        for b, s in enumerate(chunk):
+            hit = (fg_bits & _bit(b)) != 0
+            per_source[s].update(finishedGoods=int(hit.sum()), totalQty=float(total_qty[hit].sum()))
+
+    listed = np.flatnonzero(impacted)
+    listed = listed[np.argsort(-total_qty[listed], kind='stable')][:limit]
+    finished_goods = [{
+        'skuId': sku_ids[f],
+        # Positions in the request's sources list.
+        'sources': [s for chunk, fg_bits in chunks for b, s in enumerate(chunk) if int(fg_bits[f]) >> b & 1],
+        **{kind: {'orderCount': int(counts[f]), 'totalQty': float(qty[f])} for kind, (counts, qty) in orders.items()},
+    } for f in listed.tolist()]
+    return {
+        'sources': per_source,
+        'impactedFinishedGoods': int(impacted.sum()),
+        'orders': {kind: {'orderCount': int(counts[impacted].sum()), 'totalQty': float(qty[impacted].sum())}
+                   for kind, (counts, qty) in orders.items()},
+        'finishedGoods': finished_goods,
+        'computeSeconds': round(time.perf_counter() - started, 4),
+    }
@@ -0,0 +1,147 @@
+# utils/ingest_orders.py
+# Loads custorder.csv / fcstorder.csv into Neo4j as (:Demand)-[:IS_FOR_SKU]->(:SKU), the shape the
+# constraints queries already read. Rows are streamed from the file and written in batched UNWIND
+# transactions on several worker threads; each Demand is keyed by file and row number (row_num), so
+# re-running the command updates the same nodes, and Demands of rows no longer in the file are
+# removed. With ORDER_SOURCE=graph the order store answers from these nodes (utils/order_store.py).
+# Columns mapped onto Demand properties: OrderID -> orderId (customer orders), Seqnum -> seqnum
+# (forecasts), Item/Loc -> sku_id, Qty -> qty, and date from the first non-empty of Delivery Date,
+# Ship Date (customer orders) or Intel WW (forecasts), stored as written in the file.
+#
+# Usage: python -m utils.ingest_orders [--kind cust fcst] [--batch-size N] [--workers N]
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import argparse
+import time
+import json
+import csv
+import os
+import math
+from .neo4j_handler import get_session, close_driver, write_batches
+from .order_store import ORDER_DATA_DIR, ORDER_FILES
+from .order_lookup import ORDER_LOOKUP_SCHEMA_QUERIES
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+
+# Order file columns read into Demand.date, first non-empty wins.
+DATE_COLUMNS = {'cust': ('Delivery Date', 'Ship Date'), 'fcst': ('Intel WW',)}
+
+# Failures are reported and skipped, since an equivalent index may already exist under another name.
+SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT demand_id_unique IF NOT EXISTS FOR (d:Demand) REQUIRE d.demand_id IS UNIQUE",
+    "CREATE INDEX demand_source_sku IF NOT EXISTS FOR (d:Demand) ON (d.source, d.sku_id)",
+    "CREATE INDEX sku_sku_id IF NOT EXISTS FOR (s:SKU) ON (s.sku_id)",
+] + ORDER_LOOKUP_SCHEMA_QUERIES
+
+# A row whose SKU changed since the last run loses its old IS_FOR_SKU relationship.
+INGEST_BATCH_QUERY = """
+UNWIND $rows AS row
+MERGE (d:Demand {demand_id: row.demand_id})
+SET d += row.props, d.ingest_run = $run, d.updated_at = timestamp()
+WITH d, row
+CALL(d, row) {
+    MATCH (d)-[old:IS_FOR_SKU]->(prev:SKU)
+    WHERE prev.sku_id <> row.props.sku_id
+    DELETE old
+}
+WITH d, row
+MATCH (s:SKU {sku_id: row.props.sku_id})
+MERGE (d)-[:IS_FOR_SKU]->(s)
+"""
+
+PRUNE_QUERY = """
+MATCH (d:Demand {source: $source})
+WHERE d.ingest_run <> $run
+CALL(d) { DETACH DELETE d } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+def _qty(value):
+    # Same rule as toFloat(): unparseable quantities are stored as null.
+    try:
+        qty = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(qty) else qty
+
+
+def read_batches(path, kind, batch_size):
+    """Yields lists of UNWIND rows for one order file without holding the whole file in memory."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        batch = []
+        for row_num, row in enumerate(reader, start=1):
+            record = dict(zip(headers, row + [''] * (len(headers) - len(row))))
+            item = record.get('Item', '').strip()
+            loc = record.get('Loc', '').strip()
+            batch.append({'demand_id': f"{kind}:{row_num}", 'props': {
+                'source': kind,
+                'row_num': row_num,
+                'seqnum': record.get('Seqnum', '').strip() or None,
+                'orderId': record.get('OrderID') or None,
+                'item': item,
+                'loc': loc,
+                'sku_id': f"{item}@{loc}",
+                'qty': _qty(record.get('Qty')),
+                'date': next((record[c].strip() for c in DATE_COLUMNS[kind] if record.get(c, '').strip()), None),
+                # The raw CSV row, returned as full_record by the order endpoints.
+                'full_record': json.dumps(record),
+            }})
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def ensure_schema():
+    with get_session() as session:
+        for query in SCHEMA_QUERIES:
+            try:
+                session.run(query).consume()
+            except Exception as e:
+                print(f"Skipped schema statement ({e}): {query}")
+
+
+def ingest_file(kind, data_dir=ORDER_DATA_DIR, batch_size=INGEST_BATCH_SIZE, workers=INGEST_WORKERS, prune=True):
+    """Writes one order file into the graph. Returns (rows written, seconds)."""
+    path = os.path.join(data_dir, ORDER_FILES[kind])
+    run = f"{kind}-{time.time_ns()}"
+    started = time.perf_counter()
+
+    def report(written):
+        print(f"  {kind}: {written} rows, {written / (time.perf_counter() - started):.0f} rows/sec")
+
+    written = write_batches(INGEST_BATCH_QUERY, read_batches(path, kind, batch_size), workers, report, run=run)
+    if prune:
+        with get_session() as session:
+            session.run(PRUNE_QUERY, source=kind, run=run).consume()
+    return written, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load order CSV files into Neo4j as Demand nodes.")
+    parser.add_argument('--kind', nargs='+', choices=sorted(ORDER_FILES), default=list(ORDER_FILES))
+    parser.add_argument('--data-dir', default=ORDER_DATA_DIR)
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS)
+    parser.add_argument('--no-prune', action='store_true', help="keep Demand nodes of rows missing from the file")
+    parser.add_argument('--skip-schema', action='store_true')
+    args = parser.parse_args(argv)
+
+    try:
+        if not args.skip_schema:
+            ensure_schema()
+        for kind in args.kind:
+            rows, seconds = ingest_file(kind, args.data_dir, args.batch_size, args.workers, prune=not args.no_prune)
+            print(f"{ORDER_FILES[kind]}: {rows} rows in {seconds:.1f}s ({rows / seconds if seconds else 0:.0f} rows/sec)")
+    finally:
+        close_driver()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+# utils/kpi_snapshot.py
+# Materialized dashboard KPIs. All figures are computed together and kept in memory with the
+# time and data version they were computed at, so /api/dashboard is answered without queries.
+# A background thread recomputes them when the graph snapshot version or an order file changes,
+# and at least every KPI_REFRESH_SECONDS.
+import threading
+import asyncio
+import time
+import os
+from .neo4j_handler import run_parallel, single, single_async
+from .order_store import get_order_store, ORDER_FILES
+from .graph_snapshot import current_version
+from .data_version import make_etag
+
+# Maximum age of the KPIs even when no change is detected.
+KPI_REFRESH_SECONDS = float(os.getenv("KPI_REFRESH_SECONDS", "300"))
+# How often the background thread checks for data changes; 0 disables the thread.
+KPI_CHECK_SECONDS = float(os.getenv("KPI_CHECK_SECONDS", "5"))
+
+BROKEN_SKU_COUNT_QUERY = "MATCH (s:SKU {broken_bom: true}) RETURN count(s) AS count"
+BROKEN_FG_COUNT_QUERY = "MATCH (s:SKU {broken_bom: true, demand_sku: true}) RETURN count(s) AS count"
+
+_snapshot = None
+_compute_lock = threading.Lock()
+# Async refreshes (asgi.py) wait on this instead of the thread lock; created inside the event loop.
+_async_compute_lock = None
+_thread = None
+_last_error = None
+
+
+def _data_key():
+    """Everything the KPIs depend on: the graph version and the order signatures."""
+    store = get_order_store()
+    return (current_version(),) + tuple(store.signature(kind) for kind in ORDER_FILES)
+
+
+async def _data_key_async():
+    store = get_order_store()
+    signatures = await asyncio.gather(*(store.signature_async(kind) for kind in ORDER_FILES))
+    return (current_version(),) + tuple(signatures)
+
+
+def _kpi_figures(broken_total, broken_fg, cust, fcst):
+    (cust_count, cust_qty), (fcst_count, fcst_qty) = cust, fcst
+    return {
+        'affectedOrdersCount': cust_count + fcst_count,
+        # Open order quantity on demand SKUs whose BOM is broken; the Total Demand at Risk card.
+        'affectedOrdersQty': cust_qty + fcst_qty,
+        'affectedCustOrdersCount': cust_count,
+        'affectedCustOrdersQty': cust_qty,
+        'affectedFcstOrdersCount': fcst_count,
+        'affectedFcstOrdersQty': fcst_qty,
+        'brokenSkusCount': broken_total['count'] if broken_total else 0,
+        'brokenFgNetworksCount': broken_fg['count'] if broken_fg else 0,
+    }
+
+
+def compute_kpis():
+    """Computes every dashboard figure. Order figures come from the order store."""
+    results, timings = run_parallel({
+        'brokenSkus': single(BROKEN_SKU_COUNT_QUERY),
+        'brokenFg': single(BROKEN_FG_COUNT_QUERY),
+    })
+    store = get_order_store()
+    return _kpi_figures(results['brokenSkus'], results['brokenFg'],
+                        store.affected_summary('cust'), store.affected_summary('fcst'))
+
+
+async def compute_kpis_async():
+    """compute_kpis on the async driver, all figures awaited together."""
+    store = get_order_store()
+    return _kpi_figures(*await asyncio.gather(
+        single_async(BROKEN_SKU_COUNT_QUERY),
+        single_async(BROKEN_FG_COUNT_QUERY),
+        store.affected_summary_async('cust'),
+        store.affected_summary_async('fcst'),
+    ))
+
+
+def _publish(data, key, started):
+    global _snapshot
+    _snapshot = {
+        'data': data,
+        'computedAt': time.time(),
+        'computeSeconds': round(time.perf_counter() - started, 3),
+        'key': key,
+    }
+    return _snapshot
+
+
+def refresh_kpis():
+    """Recomputes the KPIs now and swaps them in. Concurrent callers wait for one computation."""
+    requested = time.time()
+    with _compute_lock:
+        if _snapshot is not None and _snapshot['computedAt'] >= requested:
+            return _snapshot
+        started = time.perf_counter()
+        key = _data_key()
+        return _publish(compute_kpis(), key, started)
+
+
+async def refresh_kpis_async():
+    """refresh_kpis for the async handlers; concurrent async callers wait for one computation."""
+    global _async_compute_lock
+    requested = time.time()
+    if _async_compute_lock is None:
+        _async_compute_lock = asyncio.Lock()
+    async with _async_compute_lock:
+        if _snapshot is not None and _snapshot['computedAt'] >= requested:
+            return _snapshot
+        started = time.perf_counter()
+        key = await _data_key_async()
+        return _publish(await compute_kpis_async(), key, started)
+
+
+def _is_stale(snapshot):
+    if time.time() - snapshot['computedAt'] >= KPI_REFRESH_SECONDS:
+        return True
+    return _data_key() != snapshot['key']
+
+
+def _with_metadata(snapshot):
+    age = time.time() - snapshot['computedAt']
+    return dict(snapshot['data'], snapshot={
+        'computedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(snapshot['computedAt'])),
+        'ageSeconds': round(age, 1),
+        'computeSeconds': snapshot['computeSeconds'],
+        'dataVersion': snapshot['key'][0],
+        'refreshSeconds': KPI_REFRESH_SECONDS,
+        'lastError': _last_error,
+    })
+
+
+def get_kpis(force=False):
+    """
+    Dashboard figures plus snapshot metadata. Served from memory; computed synchronously only on
+    first use or when force is set.
+    """
+    snapshot = _snapshot
+    if snapshot is None or force:
+        snapshot = refresh_kpis()
+    return _with_metadata(snapshot)
+
+
+async def get_kpis_async(force=False):
+    """get_kpis for the async handlers: a computation awaits the async driver."""
+    snapshot = _snapshot
+    if snapshot is None or force:
+        snapshot = await refresh_kpis_async()
+    return _with_metadata(snapshot)
+
+
+def kpi_validators():
+    """(ETag, Last-Modified time) of the KPIs being served, None before they are first computed."""
+    snapshot = _snapshot
+    if snapshot is None:
+        return None
+    return make_etag('kpi', snapshot['key'], snapshot['computedAt']), snapshot['computedAt']
+
+
+def _refresh_loop(interval):
+    global _last_error
+    while True:
+        time.sleep(interval)
+        try:
+            if _snapshot is None or _is_stale(_snapshot):
+                refresh_kpis()
+            _last_error = None
+        except Exception as e:
+            _last_error = str(e)
+            print(f"An error occurred in KPI refresh: {e}")
+
+
+def start_kpi_refresh(interval=KPI_CHECK_SECONDS):
+    """Starts the background KPI refresh thread once per process. Does nothing when interval <= 0."""
+    global _thread
+    if interval <= 0 or _thread is not None:
+        return
+    _thread = threading.Thread(target=_refresh_loop, args=(interval,), name='kpi-refresh', daemon=True)
+    _thread.start()
@@ -0,0 +1,194 @@
+# utils/lead_time_path.py
+# Shortest lead-time supply path into a demand SKU, computed on the in-memory SupplyGraph.
+# Reproduces SHORTEST_PATH_QUERY in utils/network_queries.py without enumerating paths:
+#   * the target must be a demand SKU that is not broken_bom,
+#   * sources are PurchGroup nodes or SKUs with infinite_supply; a PurchGroup source is
+#     preferred over any SKU source regardless of lead time,
+#   * no node on the path may be broken_bom, and paths have 1 to 50 relationships,
+#   * lead time is the sum of coalesce(r.lead_time, 0); resources used by BOMs on the path are attached.
+import heapq
+import numpy as np
+
+MAX_HOPS = 50
+
+
+class LeadTimePath:
+    def __init__(self, nodes, edges, lead_time):
+        self.nodes = nodes          # node indices from the source to the demand SKU
+        self.edges = edges          # relationship indices, len(nodes) - 1
+        self.lead_time = lead_time
+
+    @property
+    def source(self):
+        return self.nodes[0]
+
+    @property
+    def hops(self):
+        return len(self.edges)
+
+
+def _source_masks(graph):
+    purch = graph.is_label['PurchGroup']
+    infinite = graph.is_label['SKU'] & graph.flag('infinite_supply')
+    return purch, infinite
+
+
+def _walk_back(graph, source, pred_edge):
+    """Follows predecessor edges from a source node to the target."""
+    # The virtual index num_nodes stands for the target reached again through a cycle.
+    nodes = [int(graph.rel_src[pred_edge[source]]) if source == graph.num_nodes else source]
+    edges = []
+    current = source
+    while pred_edge[current] >= 0:
+        e = pred_edge[current]
+        edges.append(e)
+        current = int(graph.rel_dst[e])
+        nodes.append(current)
+    return nodes, edges
+
+
+def _dijkstra(graph, target, allowed):
+    """
+    Reverse Dijkstra from the target over supply relationships. Returns the best PurchGroup
+    source and the best infinite-supply SKU source as (node, lead_time, hops), plus the
+    predecessor edges. Runs in O(E log V) over the part of the graph upstream of the target.
+    """
+    purch, infinite = _source_masks(graph)
+    csr = graph.supply_rev
+    # A path may also start at the target itself and come back to it through a cycle; that
+    # start is tracked as a separate virtual node so the target is not settled twice.
+    cycle_start = graph.num_nodes
+    dist = {target: 0.0}
+    pred_edge = {target: -1}
+    settled = set()
+    best_purch = best_sku = None
+    heap = [(0.0, 0, target)]
+    while heap:
+        d, h, v = heapq.heappop(heap)
+        if v in settled:
+            continue
+        settled.add(v)
+        if v != target:
+            node = target if v == cycle_start else v
+            if purch[node]:
+                # The first PurchGroup settled is the cheapest and PurchGroup sources win outright.
+                best_purch = (v, d, h)
+                break
+            if infinite[node] and best_sku is None:
+                best_sku = (v, d, h)
+            if v == cycle_start:
+                # Only a source candidate; the target itself was expanded first.
+                continue
+        for slot in range(csr.indptr[v], csr.indptr[v + 1]):
+            u = int(csr.nbr[slot])
+            e = int(csr.edge[slot])
+            if u == target:
+                u = cycle_start
+            elif not allowed[u]:
+                continue
+            if u in settled:
+                continue
+            nd = d + graph.lead_time[e]
+            if nd < dist.get(u, float('inf')):
+                dist[u] = nd
+                pred_edge[u] = e
+                heapq.heappush(heap, (nd, h + 1, u))
+    return best_purch, best_sku, pred_edge
+
+
+def _hop_bounded(graph, target, allowed, max_hops):
+    """
+    Exact hop-limited search (Bellman-Ford over at most max_hops layers) on the subgraph upstream
+    of the target. Only used when the unconstrained optimum is longer than max_hops or lead times
+    are negative.
+    """
+    purch, infinite = _source_masks(graph)
+    upstream = graph.upstream([target]) & allowed
+    csr = graph.supply_rev
+    slots = csr.slots(np.flatnonzero(upstream).astype(np.int32))
+    edges = csr.edge[slots]
+    edges = edges[upstream[graph.rel_src[edges]]]
+    heads, tails, weights = graph.rel_dst[edges], graph.rel_src[edges], graph.lead_time[edges]
+
+    n = graph.num_nodes
+    dist = np.full(n, np.inf)
+    dist[target] = 0.0
+    layer_pred = []
+    best = {'purch': None, 'sku': None}
+    for hop in range(1, max_hops + 1):
+        cand = dist[heads] + weights
+        new_dist = np.full(n, np.inf)
+        np.minimum.at(new_dist, tails, cand)
+        pred = np.full(n, -1, dtype=np.int64)
+        achieved = np.flatnonzero(np.isfinite(cand) & (cand == new_dist[tails]))
+        pred[tails[achieved[::-1]]] = edges[achieved[::-1]]
+        layer_pred.append(pred)
+        for kind, mask in (('purch', purch), ('sku', infinite)):
+            reached = np.flatnonzero(mask & np.isfinite(new_dist))
+            if reached.size:
+                v = int(reached[np.argmin(new_dist[reached])])
+                if best[kind] is None or new_dist[v] < best[kind][1]:
+                    best[kind] = (v, float(new_dist[v]), hop)
+        dist = new_dist
+        if not np.isfinite(dist).any():
+            break
+    chosen = best['purch'] or best['sku']
+    if chosen is None:
+        return None
+    v, lead_time, hop = chosen
+    nodes, path_edges = [v], []
+    for layer in range(hop - 1, -1, -1):
+        e = int(layer_pred[layer][nodes[-1]])
+        path_edges.append(e)
+        nodes.append(int(graph.rel_dst[e]))
+    return LeadTimePath(nodes, path_edges, lead_time)
+
+
+def find_lead_time_path(graph, sku_id, max_hops=MAX_HOPS):
+    """Returns the LeadTimePath chosen for a demand SKU, or None when there is no valid path."""
+    target = graph.sku_index.get(sku_id)
+    if target is None:
+        return None
+    broken = graph.flag('broken_bom')
+    if not graph.flag('demand_sku')[target] or broken[target]:
+        return None
+    allowed = ~broken
+    upstream = graph.upstream([target])
+    if (graph.lead_time[graph.incident_edges(upstream, graph.supply_rev)] < 0).any():
+        return _hop_bounded(graph, target, allowed, max_hops)
+
+    best_purch, best_sku, pred_edge = _dijkstra(graph, target, allowed)
+    chosen = best_purch or best_sku
+    if chosen is None:
+        return None
+    v, lead_time, hops = chosen
+    if hops > max_hops:
+        return _hop_bounded(graph, target, allowed, max_hops)
+    nodes, edges = _walk_back(graph, v, pred_edge)
+    return LeadTimePath(nodes, edges, lead_time)
+
+
+def lead_time_path_graph(graph, path):
+    """Graph payload of a chosen path plus the USES_RESOURCE relationships into its BOMs."""
+    if path is None:
+        return {'nodes': {}, 'relationships': {}}
+    on_path = np.zeros(graph.num_nodes, dtype=bool)
+    on_path[path.nodes] = True
+    res_edges = graph.incident_edges(on_path & graph.is_label['BOM'], graph.res_rev)
+    on_path[graph.rel_src[res_edges]] = True
+    return graph.to_graph(on_path, np.concatenate([np.asarray(path.edges, dtype=np.int32), res_edges]))
+
+
+def shortest_lead_time_path(graph, sku_id, max_hops=MAX_HOPS):
+    """Per-SKU summary and graph payload, as served by /api/shortest-lead-time-path."""
+    path = find_lead_time_path(graph, sku_id, max_hops)
+    if path is None:
+        return {'sku_id': sku_id, 'found': False, 'path': lead_time_path_graph(graph, None)}
+    return {
+        'sku_id': sku_id,
+        'found': True,
+        'leadTime': path.lead_time,
+        'hops': path.hops,
+        'source': graph.serialize_node(path.source),
+        'path': lead_time_path_graph(graph, path),
+    }
@@ -1,6 +1,13 @@
-from .neo4j_handler import get_db, serialize_path
+from .neo4j_handler import get_session
+from .network_queries import fetch_sku_network, GRAPH_FORMAT
+from .supply_graph import get_supply_graph, use_memory_engine
+from .order_store import get_order_store
+from .pagination import cached_count, PAGE_SIZE_MAX
 import os
 
+# How many orders the "top affected orders" tools return.
+LLM_TOP_ORDERS = int(os.getenv("LLM_TOP_ORDERS", "20"))
+
 def get_order_summary_for_multiple_skus(sku_ids: list[str]) -> str:
     """
     Calculates an order summary for a GIVEN LIST of SKU IDs. Use this for follow-up questions when multiple SKUs are discussed.
@@ -18,9 +25,7 @@ def get_order_summary_for_multiple_skus(sku_ids: list[str]) -> str:
         if not cleaned_sku_ids:
             return "Error: The provided list of SKUs was empty or invalid."
 
-        driver = get_db()
-        
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
+        with get_session() as session:
             query = """
             UNWIND $sku_ids AS skuId
             MATCH (s:SKU {sku_id: skuId})
@@ -55,106 +60,100 @@ def get_order_summary_for_single_sku(sku_id: str) -> str:
     """
     return get_order_summary_for_multiple_skus([sku_id])
 
-def get_bottleneck_skus_from_db() -> str:
-    """Returns a list of bottleneck SKUs from the Neo4j database."""
+def _list_page(label_query, count_query, key, limit, after):
+    """One keyset page of ids plus the total, for the list tools below."""
+    limit = max(1, min(int(limit or 10), PAGE_SIZE_MAX))
+    with get_session() as session:
+        ids = [record[key] for record in session.run(label_query, after=after or '', limit=limit + 1)]
+    return ids[:limit], len(ids) > limit, cached_count(count_query)
+
+def _list_text(title, ids, has_more, total, empty_message):
+    if not ids:
+        return empty_message
+    text = f"Here are {len(ids)} of {total} {title}:\n\n* `" + "`\n* `".join(ids) + "`"
+    if has_more:
+        text += f"\n\nMore are available; call again with after=`{ids[-1]}` for the next page."
+    return text
+
+def get_bottleneck_skus_from_db(limit: int = 10, after: str = "") -> str:
+    """Returns a page of bottleneck SKUs from the Neo4j database, ordered by SKU ID. For the next page, pass the last SKU ID shown as `after`."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            result = session.run("MATCH (s:SKU {bottleneck: true}) RETURN s.sku_id AS sku_id LIMIT 10")
-            sku_list = [record['sku_id'] for record in result]
-            return "Here are the top **bottleneck SKUs**:\n\n* `" + "`\n* `".join(sku_list) + "`" if sku_list else "No bottleneck SKUs were found."
+        ids, has_more, total = _list_page(
+            "MATCH (s:SKU) WHERE s.sku_id > $after AND s.bottleneck = true RETURN s.sku_id AS sku_id ORDER BY s.sku_id LIMIT $limit",
+            "MATCH (s:SKU {bottleneck: true}) RETURN count(s) AS count", 'sku_id', limit, after)
+        return _list_text("**bottleneck SKUs**", ids, has_more, total, "No bottleneck SKUs were found.")
     except Exception as e:
         print(f"ERROR in get_bottleneck_skus_from_db: {e}")
         return f"A database error occurred: {e}"
 
-def get_broken_networks_from_db() -> str:
-    """Returns a list of SKUs with broken networks from the Neo4j database."""
+def get_broken_networks_from_db(limit: int = 10, after: str = "") -> str:
+    """Returns a page of SKUs with broken networks from the Neo4j database, ordered by SKU ID. For the next page, pass the last SKU ID shown as `after`."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            result = session.run("MATCH (s:SKU {broken_bom: true}) RETURN s.sku_id AS sku_id LIMIT 10")
-            sku_list = [record['sku_id'] for record in result]
-            return "Here are the top SKUs with **broken networks**:\n\n* `" + "`\n* `".join(sku_list) + "`" if sku_list else "No broken networks were found."
+        ids, has_more, total = _list_page(
+            "MATCH (s:SKU) WHERE s.sku_id > $after AND s.broken_bom = true RETURN s.sku_id AS sku_id ORDER BY s.sku_id LIMIT $limit",
+            "MATCH (s:SKU {broken_bom: true}) RETURN count(s) AS count", 'sku_id', limit, after)
+        return _list_text("SKUs with **broken networks**", ids, has_more, total, "No broken networks were found.")
     except Exception as e:
         print(f"ERROR in get_broken_networks_from_db: {e}")
         return f"A database error occurred: {e}"
 
-def get_bottleneck_resources_from_db() -> str:
-    """Returns a list of bottlenecked resources from the Neo4j database."""
+def get_bottleneck_resources_from_db(limit: int = 10, after: str = "") -> str:
+    """Returns a page of bottlenecked resources from the Neo4j database, ordered by resource ID. For the next page, pass the last resource ID shown as `after`."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            result = session.run("MATCH (r:Res {bottleneck: true}) RETURN r.res_id AS res_id LIMIT 10")
-            res_list = [record['res_id'] for record in result]
-            return "Here are the top **bottleneck resources**:\n\n* `" + "`\n* `".join(res_list) + "`" if res_list else "No bottleneck resources were found."
+        ids, has_more, total = _list_page(
+            "MATCH (r:Res) WHERE r.res_id > $after AND r.bottleneck = true RETURN r.res_id AS res_id ORDER BY r.res_id LIMIT $limit",
+            "MATCH (r:Res {bottleneck: true}) RETURN count(r) AS count", 'res_id', limit, after)
+        return _list_text("**bottleneck resources**", ids, has_more, total, "No bottleneck resources were found.")
     except Exception as e:
         print(f"ERROR in get_bottleneck_resources_from_db: {e}")
         return f"A database error occurred: {e}"
 
-def get_network_for_sku(sku_id: str) -> list:
-    """Gets the full network graph data for a specific SKU ID."""
+def get_network_for_sku(sku_id: str) -> dict:
+    """Gets the full network graph data for a specific SKU ID, as distinct nodes and relationships keyed by id."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            cypher_query = "MATCH (s:SKU {sku_id: $sku_id}) CALL(s) { WITH s OPTIONAL MATCH up = (u)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(s) RETURN collect(DISTINCT up) AS ups } CALL(s) { WITH s OPTIONAL MATCH down = (s)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(d) RETURN collect(DISTINCT down) AS downs } WITH s, [p IN ups WHERE p IS NOT NULL] + [p IN downs WHERE p IS NOT NULL] AS netPaths UNWIND netPaths AS p UNWIND nodes(p) AS n WITH s, collect(DISTINCT p) AS allPaths, collect(DISTINCT n) AS nodesInNet WITH allPaths, [n IN nodesInNet WHERE n:BOM] AS bomNodes UNWIND bomNodes AS bn OPTIONAL MATCH rp = (res:Res)-[:USES_RESOURCE]->(bn) WITH allPaths, collect(DISTINCT rp) AS resPaths WITH [p IN resPaths WHERE p IS NOT NULL] AS resPathsClean, allPaths WITH allPaths + resPathsClean AS combinedPaths UNWIND combinedPaths AS path RETURN path;"
-            result = session.run(cypher_query, sku_id=sku_id)
-            return [serialize_path(row['path']) for row in result]
+        if use_memory_engine():
+            return get_supply_graph().network_for_sku(sku_id)
+        with get_session() as session:
+            return fetch_sku_network(session, sku_id, GRAPH_FORMAT)
     except Exception as e:
-        return [{'error': str(e)}]
+        return {'error': str(e)}
 
 def get_affected_orders_summary() -> str:
     """Returns a summary of the total count and quantity of affected customer and forecast orders."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            cust_order_query = "LOAD CSV WITH HEADERS FROM 'file:///custorder.csv' AS row WITH row, toFloat(row.Qty) AS qty WHERE trim(row.Item) <> '' AND trim(row.Loc) <> '' MATCH (s:SKU {sku_id: trim(row.Item) + '@' + trim(row.Loc)}) WHERE s.demand_sku = true AND s.broken_bom = true RETURN count(row) AS orderCount, sum(qty) AS totalQty"
-            cust_result = session.run(cust_order_query).single()
-            cust_orders_count = cust_result.get('orderCount', 0) or 0
-            cust_orders_qty = cust_result.get('totalQty', 0) or 0
-
-            fcst_order_query = "LOAD CSV WITH HEADERS FROM 'file:///fcstorder.csv' AS row WITH row, toFloat(row.Qty) AS qty WHERE trim(row.Item) <> '' AND trim(row.Loc) <> '' MATCH (s:SKU {sku_id: trim(row.Item) + '@' + trim(row.Loc)}) WHERE s.demand_sku = true AND s.broken_bom = true RETURN count(row) AS orderCount, sum(qty) AS totalQty"
-            fcst_result = session.run(fcst_order_query).single()
-            fcst_orders_count = fcst_result.get('orderCount', 0) or 0
-            fcst_orders_qty = fcst_result.get('totalQty', 0) or 0
-
-            total_count = cust_orders_count + fcst_orders_count
-            total_qty = cust_orders_qty + fcst_orders_qty
-
-            return f"**Affected Orders Summary**:\n* Customer Orders: {cust_orders_count} orders (Total Qty: {int(cust_orders_qty)})\n* Forecast Orders: {fcst_orders_count} orders (Total Qty: {int(fcst_orders_qty)})\n* Grand Total: {total_count} orders (Total Qty: {int(total_qty)})"
+        store = get_order_store()
+        cust_orders_count, cust_orders_qty = store.affected_summary('cust')
+        fcst_orders_count, fcst_orders_qty = store.affected_summary('fcst')
+        total_count = cust_orders_count + fcst_orders_count
+        total_qty = cust_orders_qty + fcst_orders_qty
+
+        return f"**Affected Orders Summary**:\n* Customer Orders: {cust_orders_count} orders (Total Qty: {int(cust_orders_qty)})\n* Forecast Orders: {fcst_orders_count} orders (Total Qty: {int(fcst_orders_qty)})\n* Grand Total: {total_count} orders (Total Qty: {int(total_qty)})"
     except Exception as e:
         print(f"ERROR in get_affected_orders_summary: {e}")
         return f"A database error occurred: {e}"
 
 def get_affected_customer_orders() -> str:
-    """Returns a detailed list of the top 20 affected customer orders from the database."""
+    """Returns a detailed list of the largest affected customer orders (top 20 by default)."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = "LOAD CSV WITH HEADERS FROM 'file:///custorder.csv' AS row WITH row, trim(row.Item) AS item, trim(row.Loc) AS loc, toFloat(row.Qty) AS qty, trim(row.Item) + '@' + trim(row.Loc) AS sku_id WHERE item <> '' AND loc <> '' MATCH (s:SKU {sku_id: sku_id}) WHERE s.demand_sku = true AND s.broken_bom = true RETURN row.Item as Item, row.Loc as Loc, row.Qty as Qty, row.OrderID as OrderID ORDER BY Qty DESC LIMIT 20"
-            result = session.run(query)
-            records = list(result)
-            if not records: return "No affected customer orders were found."
-            header = "| OrderID | Item | Loc | Qty |\n"
-            separator = "| :--- | :--- | :--- | :--- |\n"
-            rows = [f"| {r['OrderID']} | {r['Item']} | {r['Loc']} | {r['Qty']} |" for r in records]
-            return "**Top Affected Customer Orders**:\n" + header + separator + "\n".join(rows)
+        records = get_order_store().top_affected_orders('cust', LLM_TOP_ORDERS)
+        if not records: return "No affected customer orders were found."
+        header = "| OrderID | Item | Loc | Qty |\n"
+        separator = "| :--- | :--- | :--- | :--- |\n"
+        rows = [f"| {r.get('OrderID')} | {r.get('Item')} | {r.get('Loc')} | {r.get('Qty')} |" for r in records]
+        return "**Top Affected Customer Orders**:\n" + header + separator + "\n".join(rows)
     except Exception as e:
         print(f"ERROR in get_affected_customer_orders: {e}")
         return f"A database error occurred: {e}"
 
 def get_affected_forecast_orders() -> str:
-    """Returns a detailed list of the top 20 affected forecast orders from the database."""
+    """Returns a detailed list of the largest affected forecast orders (top 20 by default)."""
     try:
-        driver = get_db()
-        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
-            query = "LOAD CSV WITH HEADERS FROM 'file:///fcstorder.csv' AS row WITH row, trim(row.Item) AS item, trim(row.Loc) AS loc, toFloat(row.Qty) AS qty, trim(row.Item) + '@' + trim(row.Loc) AS sku_id WHERE item <> '' AND loc <> '' MATCH (s:SKU {sku_id: sku_id}) WHERE s.demand_sku = true AND s.broken_bom = true RETURN row.Item as Item, row.Loc as Loc, row.Qty as Qty, row.Date as Date ORDER BY Qty DESC LIMIT 20"
-            result = session.run(query)
-            records = list(result)
-            if not records: return "No affected forecast orders were found."
-            header = "| Date | Item | Loc | Qty |\n"
-            separator = "| :--- | :--- | :--- | :--- |\n"
-            rows = [f"| {r['Date']} | {r['Item']} | {r['Loc']} | {r['Qty']} |" for r in records]
-            return "**Top Affected Forecast Orders**:\n" + header + separator + "\n".join(rows)
+        records = get_order_store().top_affected_orders('fcst', LLM_TOP_ORDERS)
+        if not records: return "No affected forecast orders were found."
+        header = "| Date | Item | Loc | Qty |\n"
+        separator = "| :--- | :--- | :--- | :--- |\n"
+        rows = [f"| {r.get('Date')} | {r.get('Item')} | {r.get('Loc')} | {r.get('Qty')} |" for r in records]
+        return "**Top Affected Forecast Orders**:\n" + header + separator + "\n".join(rows)
     except Exception as e:
         print(f"ERROR in get_affected_forecast_orders: {e}")
         return f"A database error occurred: {e}"
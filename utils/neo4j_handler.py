@@ -1,5 +1,11 @@
 # utils/neo4j_handler.py
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase
+from neo4j.graph import Node, Relationship, Path
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import atexit
+import threading
+import time
 import os
 
 # Neo4j connection details are loaded from environment variables
@@ -8,21 +14,303 @@ NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE")
 
+# Connection pool tuning. One driver (and therefore one pool) is shared by the whole process.
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "100"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+NEO4J_WARM_CONNECTIONS = int(os.getenv("NEO4J_WARM_CONNECTIONS", "4"))
+# Threads shared by all requests for running independent queries concurrently (run_parallel).
+NEO4J_PARALLEL_WORKERS = int(os.getenv("NEO4J_PARALLEL_WORKERS", "16"))
+
+_driver = None
+_driver_lock = threading.Lock()
+# The async driver belongs to the event loop of the ASGI server (see asgi.py).
+_async_driver = None
+_query_executor = None
+_session_stats = {'opened': 0, 'in_use': 0, 'peak_in_use': 0}
+_stats_lock = threading.Lock()
+
+
+def get_driver():
+    """Returns the process-wide driver, creating it on first use."""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(
+                    NEO4J_URI,
+                    auth=(NEO4J_USER, NEO4J_PASSWORD),
+                    max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+                    connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+                    max_connection_lifetime=NEO4J_MAX_CONNECTION_LIFETIME,
+                )
+    return _driver
+
+
 def get_db():
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    return driver
+    # Kept for older callers; returns the shared driver instead of building a new one.
+    return get_driver()
+
+
+def _count_session(delta):
+    with _stats_lock:
+        if delta > 0:
+            _session_stats['opened'] += 1
+        _session_stats['in_use'] += delta
+        _session_stats['peak_in_use'] = max(_session_stats['peak_in_use'], _session_stats['in_use'])
+
+
+@contextmanager
+def get_session(**config):
+    """Opens a session on the shared driver against the configured database."""
+    config.setdefault('database', NEO4J_DATABASE)
+    _count_session(1)
+    try:
+        with get_driver().session(**config) as session:
+            yield session
+    finally:
+        _count_session(-1)
+
+
+def get_async_driver():
+    """Returns the process-wide async driver, creating it on first use inside the running event loop."""
+    global _async_driver
+    if _async_driver is None:
+        _async_driver = AsyncGraphDatabase.driver(
+            NEO4J_URI,
+            auth=(NEO4J_USER, NEO4J_PASSWORD),
+            max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+            connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+            max_connection_lifetime=NEO4J_MAX_CONNECTION_LIFETIME,
+        )
+    return _async_driver
+
+
+@asynccontextmanager
+async def get_async_session(**config):
+    """Async counterpart of get_session(); awaits on the network instead of holding a thread."""
+    config.setdefault('database', NEO4J_DATABASE)
+    _count_session(1)
+    try:
+        async with get_async_driver().session(**config) as session:
+            yield session
+    finally:
+        _count_session(-1)
+
+
+async def single_async(query, **params):
+    """The single record of a query, run in an async session of its own."""
+    async with get_async_session() as session:
+        result = await session.run(query, **params)
+        return await result.single()
+
+
+async def records_async(query, **params):
+    """All records of a query, run in an async session of its own."""
+    async with get_async_session() as session:
+        result = await session.run(query, **params)
+        return [record async for record in result]
+
+
+async def close_async_driver():
+    global _async_driver
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
+
+
+def _get_query_executor():
+    global _query_executor
+    if _query_executor is None:
+        with _driver_lock:
+            if _query_executor is None:
+                _query_executor = ThreadPoolExecutor(max_workers=NEO4J_PARALLEL_WORKERS, thread_name_prefix='neo4j-query')
+    return _query_executor
+
+
+def _timed_in_session(work):
+    started = time.perf_counter()
+    with get_session() as session:
+        result = work(session)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run_parallel(tasks):
+    """
+    Runs independent units of work concurrently, each in its own session, on a bounded thread pool.
+    `tasks` maps a name to a callable taking a session. Returns ({name: result}, {name: milliseconds}),
+    so the latency is that of the slowest task rather than the sum. If any task fails, its exception
+    is raised once all tasks have finished. Tasks must not call run_parallel themselves.
+    """
+    futures = {name: _get_query_executor().submit(_timed_in_session, work) for name, work in tasks.items()}
+    results, timings, error = {}, {}, None
+    for name, future in futures.items():
+        try:
+            results[name], timings[name] = future.result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+    return results, timings
+
+
+def single(query, **params):
+    """Task for run_parallel that returns the single record of a query."""
+    return lambda session: session.run(query, **params).single()
+
+
+def server_timing(timings):
+    """Server-Timing header value for per-query timings, shown in the browser's network panel."""
+    return ', '.join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+
+def _write_batch(query, rows, params):
+    with get_session() as session:
+        session.execute_write(lambda tx: tx.run(query, rows=rows, **params).consume())
+    return len(rows)
+
+
+def chunks(rows, size):
+    """Splits a list of UNWIND rows into batches for write_batches."""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def write_batches(query, batches, workers=4, on_progress=None, **params):
+    """
+    Runs a write query once per batch (bound to $rows), on up to `workers` sessions at a time.
+    Batches are consumed lazily with a bounded number in flight, so a generator over a large
+    input is never held in memory at once. execute_write retries transient errors such as
+    deadlocks between concurrent batches. Returns the number of rows written.
+    """
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='neo4j-write') as executor:
+        pending = set()
+        for rows in batches:
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written += sum(future.result() for future in done)
+                if on_progress is not None:
+                    on_progress(written)
+            pending.add(executor.submit(_write_batch, query, rows, params))
+        written += sum(future.result() for future in pending)
+    return written
+
+
+def _warm_connection(_):
+    with get_session() as session:
+        session.run("RETURN 1").consume()
+
+
+def init_driver(warm_connections=NEO4J_WARM_CONNECTIONS):
+    """
+    Creates the shared driver, verifies connectivity and opens a few pooled connections
+    up front so the first requests don't pay the connection setup cost.
+    Returns True if the database was reachable.
+    """
+    driver = get_driver()
+    try:
+        driver.verify_connectivity()
+        if warm_connections > 0:
+            # Sessions held concurrently force the pool to open distinct connections.
+            with ThreadPoolExecutor(max_workers=warm_connections) as pool:
+                list(pool.map(_warm_connection, range(warm_connections)))
+        return True
+    except Exception as e:
+        print(f"WARNING: Could not connect to Neo4j at startup: {e}")
+        return False
+
+
+def close_driver():
+    global _driver, _query_executor
+    with _driver_lock:
+        if _query_executor is not None:
+            _query_executor.shutdown(wait=False)
+            _query_executor = None
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
+atexit.register(close_driver)
+
+
+def get_pool_stats():
+    """Reports pool configuration and utilization for sizing the pool."""
+    stats = {
+        'driverCreated': _driver is not None,
+        'asyncDriverCreated': _async_driver is not None,
+        'maxPoolSize': NEO4J_MAX_POOL_SIZE,
+        'acquisitionTimeout': NEO4J_ACQUISITION_TIMEOUT,
+        'maxConnectionLifetime': NEO4J_MAX_CONNECTION_LIFETIME,
+    }
+    with _stats_lock:
+        stats.update({
+            'sessionsOpened': _session_stats['opened'],
+            'sessionsInUse': _session_stats['in_use'],
+            'peakSessionsInUse': _session_stats['peak_in_use'],
+        })
+    # The driver has no public pool metrics, so read the pool's connection table when available.
+    pool = getattr(_driver, '_pool', None)
+    connections = getattr(pool, 'connections', None)
+    if connections is not None:
+        per_address = {}
+        for address, conns in list(connections.items()):
+            conns = list(conns)
+            in_use = sum(1 for c in conns if getattr(c, 'in_use', False))
+            per_address[str(address)] = {'open': len(conns), 'inUse': in_use, 'idle': len(conns) - in_use}
+        stats['connections'] = per_address
+        stats['openConnections'] = sum(a['open'] for a in per_address.values())
+        stats['inUseConnections'] = sum(a['inUse'] for a in per_address.values())
+    return stats
+
+
+def serialize_node(node):
+    return {'id': node.element_id, 'labels': list(node.labels), 'properties': dict(node)}
+
+def serialize_rel(rel):
+    return {'id': rel.element_id, 'type': rel.type, 'properties': dict(rel), 'startNode': rel.start_node.element_id, 'endNode': rel.end_node.element_id}
 
 def serialize_path(path):
-    def serialize_node(node):
-        return {'id': node.element_id, 'labels': list(node.labels), 'properties': dict(node)}
-    def serialize_rel(rel):
-        return {'id': rel.element_id, 'type': rel.type, 'properties': dict(rel), 'startNode': rel.start_node.element_id, 'endNode': rel.end_node.element_id}
     nodes = [serialize_node(node) for node in path.nodes]
     relationships = [serialize_rel(rel) for rel in path.relationships]
     return {'nodes': nodes, 'relationships': relationships}
 
+def add_to_graph(graph, entity):
+    """Adds a Node, Relationship or Path to a graph payload, keeping one copy per element id."""
+    if entity is None:
+        return graph
+    if isinstance(entity, Path):
+        for node in entity.nodes:
+            add_to_graph(graph, node)
+        for rel in entity.relationships:
+            add_to_graph(graph, rel)
+    elif isinstance(entity, Relationship):
+        if entity.element_id not in graph['relationships']:
+            graph['relationships'][entity.element_id] = serialize_rel(entity)
+    elif isinstance(entity, Node):
+        if entity.element_id not in graph['nodes']:
+            graph['nodes'][entity.element_id] = serialize_node(entity)
+    return graph
+
+def serialize_entity(entity):
+    """Returns ('node' | 'relationship', payload) for a single graph element."""
+    if isinstance(entity, Relationship):
+        return 'relationship', serialize_rel(entity)
+    return 'node', serialize_node(entity)
+
+def serialize_graph(entities):
+    """
+    Builds the graph-shaped payload {nodes: {...}, relationships: {...}} keyed by element id
+    from any mix of nodes, relationships and paths.
+    """
+    graph = {'nodes': {}, 'relationships': {}}
+    for entity in entities:
+        add_to_graph(graph, entity)
+    return graph
+
 def serialize_record(record):
     return {
         'sku_id': record['sku_id'],
         'properties': {'full_record': dict(record['full_record'])}
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,195 @@
+# utils/network_queries.py
+# Cypher for the supply-network views shared by the BOM viewer routes and the chat tools.
+from .neo4j_handler import serialize_path, serialize_graph, serialize_entity
+import json
+
+# Path-per-row queries. Every upstream/downstream path is returned separately, so shared nodes
+# are repeated once per path. Kept for the 'paths' response format.
+SKU_NETWORK_PATHS_QUERY = "MATCH (s:SKU {sku_id: $sku_id}) CALL(s) { WITH s OPTIONAL MATCH up = (u)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(s) RETURN collect(DISTINCT up) AS ups } CALL(s) { WITH s OPTIONAL MATCH down = (s)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(d) RETURN collect(DISTINCT down) AS downs } WITH s, [p IN ups WHERE p IS NOT NULL] + [p IN downs WHERE p IS NOT NULL] AS netPaths UNWIND netPaths AS p UNWIND nodes(p) AS n WITH s, collect(DISTINCT p) AS allPaths, collect(DISTINCT n) AS nodesInNet WITH allPaths, [n IN nodesInNet WHERE n:BOM] AS bomNodes UNWIND bomNodes AS bn OPTIONAL MATCH rp = (res:Res)-[:USES_RESOURCE]->(bn) WITH allPaths, collect(DISTINCT rp) AS resPaths WITH [p IN resPaths WHERE p IS NOT NULL] AS resPathsClean, allPaths WITH allPaths + resPathsClean AS combinedPaths UNWIND combinedPaths AS path RETURN path;"
+
+RESOURCE_NETWORK_PATHS_QUERY = "MATCH (r:Res {res_id: $res_id}) OPTIONAL MATCH rb = (r)-[:USES_RESOURCE]->(b:BOM) WITH r, collect(DISTINCT rb) AS resBomPaths, collect(DISTINCT b) AS startBomNodes UNWIND startBomNodes AS sb OPTIONAL MATCH p_prod = (sb)-[:PRODUCES]->(s:SKU) WITH r, resBomPaths, collect(DISTINCT p_prod) AS bomSkuPaths, collect(DISTINCT s) AS seedSkus UNWIND seedSkus AS seed CALL(seed) { WITH seed OPTIONAL MATCH up = (u)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(seed) RETURN collect(DISTINCT up) AS ups } CALL(seed) { WITH seed OPTIONAL MATCH down = (seed)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(d) RETURN collect(DISTINCT down) AS downs } WITH r, resBomPaths, bomSkuPaths, ([p IN ups WHERE p IS NOT NULL] + [p IN downs WHERE p IS NOT NULL]) AS sPaths WITH r, resBomPaths, bomSkuPaths, collect(sPaths) AS skuPathSets WITH r, resBomPaths, bomSkuPaths, reduce(acc = [], ps IN skuPathSets | acc + ps) AS skuPaths UNWIND skuPaths AS sp UNWIND nodes(sp) AS n WITH r, resBomPaths, bomSkuPaths, skuPaths, collect(DISTINCT n) AS nodesInNet WITH r, resBomPaths, bomSkuPaths, skuPaths, [x IN nodesInNet WHERE x:BOM] AS bomInNet UNWIND bomInNet AS bn OPTIONAL MATCH r2b = (r2:Res)-[:USES_RESOURCE]->(bn) WITH resBomPaths, bomSkuPaths, skuPaths, collect(DISTINCT r2b) AS extraResPaths WITH resBomPaths + bomSkuPaths + skuPaths + extraResPaths AS allPaths UNWIND allPaths AS path WITH path WHERE path IS NOT NULL RETURN DISTINCT path;"
+
+SHORTEST_PATH_QUERY = "MATCH (d:SKU {sku_id: $sku_id}) WHERE d.demand_sku = true AND coalesce(d.broken_bom,false) = false MATCH path = (srcNode)-[:CONSUMED_BY|PRODUCES|SOURCING|PURCH_FROM*1..50]->(d) WHERE (srcNode:PurchGroup OR (srcNode:SKU AND coalesce(srcNode.infinite_supply,false) = true)) AND NONE(n IN nodes(path) WHERE coalesce(n.broken_bom,false) = true) WITH d, path, head(nodes(path)) AS sourceNode, reduce(totalLT = 0, r IN relationships(path) | totalLT + coalesce(r.lead_time,0)) AS pathLeadTime WITH d, collect({p:path, src:sourceNode, leadTime:pathLeadTime}) AS allPaths WITH d, [x IN allPaths WHERE x.src:PurchGroup] AS purchPaths, [x IN allPaths WHERE NOT x.src:PurchGroup] AS skuPaths WITH d, CASE WHEN size(purchPaths) > 0 THEN purchPaths ELSE skuPaths END AS candidatePaths UNWIND candidatePaths AS cp WITH d, cp ORDER BY cp.leadTime ASC WITH d, collect(cp)[0] AS chosenPath WITH chosenPath, [n IN nodes(chosenPath.p) WHERE n:BOM] AS bomNodes UNWIND bomNodes AS bn OPTIONAL MATCH rp = (res:Res)-[:USES_RESOURCE]->(bn) WITH chosenPath, [p IN collect(DISTINCT rp) WHERE p IS NOT NULL] AS resPaths WITH resPaths + [chosenPath.p] AS allPaths UNWIND allPaths AS path RETURN path;"
+
+# Entity-per-row queries. The network is reduced to its distinct nodes and relationships inside
+# the database, so the path explosion never reaches the driver:
+#   * every relationship into an upstream node lies on a path into the seed,
+#   * every relationship out of a downstream node lies on a path out of the seed,
+#   * resources are attached to every BOM in the network.
+SKU_NETWORK_GRAPH_QUERY = """
+MATCH (s:SKU {sku_id: $sku_id})
+CALL(s) {
+    MATCH (u)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(s)
+    WITH DISTINCT u
+    RETURN collect(u) AS ups
+}
+CALL(s) {
+    MATCH (s)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(d)
+    WITH DISTINCT d
+    RETURN collect(d) AS downs
+}
+CALL(ups, downs) {
+    UNWIND ups + downs AS n
+    RETURN DISTINCT n AS entity
+  UNION
+    UNWIND ups AS b
+    MATCH (a)-[r:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM]->(b)
+    RETURN r AS entity
+  UNION
+    UNWIND downs AS a
+    MATCH (a)-[r:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM]->(b)
+    RETURN r AS entity
+  UNION
+    UNWIND ups + downs AS bn
+    WITH bn WHERE bn:BOM
+    MATCH (res:Res)-[r:USES_RESOURCE]->(bn)
+    UNWIND [res, r] AS entity
+    RETURN entity
+}
+RETURN entity
+"""
+
+RESOURCE_NETWORK_GRAPH_QUERY = """
+MATCH (r:Res {res_id: $res_id})
+OPTIONAL MATCH (r)-[:USES_RESOURCE]->(b:BOM)
+WITH collect(DISTINCT b) AS startBoms
+CALL(startBoms) {
+    UNWIND startBoms AS sb
+    MATCH (sb)-[:PRODUCES]->(seed:SKU)
+    WITH DISTINCT seed
+    MATCH (u)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(seed)
+    WITH DISTINCT u
+    RETURN collect(u) AS ups
+}
+CALL(startBoms) {
+    UNWIND startBoms AS sb
+    MATCH (sb)-[:PRODUCES]->(seed:SKU)
+    WITH DISTINCT seed
+    MATCH (seed)-[:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM*0..]->(d)
+    WITH DISTINCT d
+    RETURN collect(d) AS downs
+}
+CALL(startBoms, ups, downs) {
+    UNWIND startBoms + ups + downs AS n
+    RETURN DISTINCT n AS entity
+  UNION
+    UNWIND ups AS b
+    MATCH (a)-[rel:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM]->(b)
+    RETURN rel AS entity
+  UNION
+    UNWIND downs AS a
+    MATCH (a)-[rel:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM]->(b)
+    RETURN rel AS entity
+  UNION
+    UNWIND startBoms + ups + downs AS bn
+    WITH bn WHERE bn:BOM
+    MATCH (res:Res)-[rel:USES_RESOURCE]->(bn)
+    UNWIND [res, rel] AS entity
+    RETURN entity
+}
+RETURN entity
+"""
+
+GRAPH_FORMAT = 'graph'
+PATHS_FORMAT = 'paths'
+
+# Number of NDJSON lines written per chunk of a streamed response.
+STREAM_CHUNK_SIZE = 200
+
+
+def fetch_sku_network(session, sku_id, fmt=PATHS_FORMAT):
+    """Upstream and downstream supply network of a SKU, with the resources used by its BOMs."""
+    if fmt == GRAPH_FORMAT:
+        result = session.run(SKU_NETWORK_GRAPH_QUERY, sku_id=sku_id)
+        return serialize_graph(row['entity'] for row in result)
+    result = session.run(SKU_NETWORK_PATHS_QUERY, sku_id=sku_id)
+    return [serialize_path(row['path']) for row in result]
+
+
+def fetch_resource_network(session, res_id, fmt=PATHS_FORMAT):
+    """Supply network of every SKU produced by a BOM that uses the resource."""
+    if fmt == GRAPH_FORMAT:
+        result = session.run(RESOURCE_NETWORK_GRAPH_QUERY, res_id=res_id)
+        return serialize_graph(row['entity'] for row in result)
+    result = session.run(RESOURCE_NETWORK_PATHS_QUERY, res_id=res_id)
+    return [serialize_path(row['path']) for row in result]
+
+
+def fetch_shortest_path(session, sku_id, fmt=PATHS_FORMAT):
+    """Shortest lead-time supply path into a demand SKU plus the resources along it."""
+    result = session.run(SHORTEST_PATH_QUERY, sku_id=sku_id)
+    if fmt == GRAPH_FORMAT:
+        return serialize_graph(row['path'] for row in result)
+    return [serialize_path(row['path']) for row in result]
+
+
+def stream_graph_ndjson(session, query, chunk_size=STREAM_CHUNK_SIZE, **params):
+    """
+    Runs an entity-per-row network query and yields newline-delimited JSON chunks while the
+    result cursor is consumed, one line per node or relationship:
+        {"type": "node", "data": {...}}
+        {"type": "relationship", "data": {...}}
+    Only one chunk is held in memory at a time. The graph queries return each element once.
+    """
+    lines = []
+    for row in session.run(query, **params):
+        entity = row['entity']
+        if entity is None:
+            continue
+        kind, payload = serialize_entity(entity)
+        lines.append(json.dumps({'type': kind, 'data': payload}, default=str))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def graph_to_ndjson(graph, chunk_size=STREAM_CHUNK_SIZE):
+    """Writes an already built graph payload in the same NDJSON shape as stream_graph_ndjson."""
+    items = [('node', node) for node in graph['nodes'].values()]
+    items += [('relationship', rel) for rel in graph['relationships'].values()]
+    for i in range(0, len(items), chunk_size):
+        yield '\n'.join(json.dumps({'type': kind, 'data': payload}, default=str) for kind, payload in items[i:i + chunk_size]) + '\n'
+
+
+# --- Async variants for the ASGI serving mode (routes/async_routes.py) ---------------------
+
+async def fetch_sku_network_async(session, sku_id, fmt=PATHS_FORMAT):
+    if fmt == GRAPH_FORMAT:
+        result = await session.run(SKU_NETWORK_GRAPH_QUERY, sku_id=sku_id)
+        return serialize_graph([row['entity'] async for row in result])
+    result = await session.run(SKU_NETWORK_PATHS_QUERY, sku_id=sku_id)
+    return [serialize_path(row['path']) async for row in result]
+
+
+async def fetch_resource_network_async(session, res_id, fmt=PATHS_FORMAT):
+    if fmt == GRAPH_FORMAT:
+        result = await session.run(RESOURCE_NETWORK_GRAPH_QUERY, res_id=res_id)
+        return serialize_graph([row['entity'] async for row in result])
+    result = await session.run(RESOURCE_NETWORK_PATHS_QUERY, res_id=res_id)
+    return [serialize_path(row['path']) async for row in result]
+
+
+async def fetch_shortest_path_async(session, sku_id, fmt=PATHS_FORMAT):
+    result = await session.run(SHORTEST_PATH_QUERY, sku_id=sku_id)
+    if fmt == GRAPH_FORMAT:
+        return serialize_graph([row['path'] async for row in result])
+    return [serialize_path(row['path']) async for row in result]
+
+
+async def stream_graph_ndjson_async(session, query, chunk_size=STREAM_CHUNK_SIZE, **params):
+    """Same NDJSON chunks as stream_graph_ndjson, read from an async session."""
+    lines = []
+    result = await session.run(query, **params)
+    async for row in result:
+        entity = row['entity']
+        if entity is None:
+            continue
+        kind, payload = serialize_entity(entity)
+        lines.append(json.dumps({'type': kind, 'data': payload}, default=str))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
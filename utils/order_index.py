@@ -0,0 +1,193 @@
+# utils/order_index.py
+# SKU-partitioned copy of an order file plus a sorted sku_id -> (offset, length) table, read
+# through mmap, so a per-SKU lookup reads only that SKU's bytes instead of the whole CSV.
+#
+# For custorder.csv with source signature (mtime_ns, size) the builder writes
+#   custorder.csv.<mtime_ns>-<size>.bysku   the CSV rows grouped by sku_id, qty descending
+#   custorder.csv.<mtime_ns>-<size>.skuidx  the index (layout below)
+# Naming the files after the source signature means a changed source simply gets new files;
+# files that may still be mapped are never overwritten.
+#
+# .skuidx layout (little endian):
+#   b'SKUIDX01', uint32 key count, uint32 header length, the CSV header line,
+#   uint64 key_offsets[count + 1] into the key blob, uint64 data_offsets[count],
+#   uint64 data_lengths[count], key blob (utf-8 sku_ids, sorted bytewise)
+#
+# Build ahead of time with: python -m utils.order_index
+import threading
+import struct
+import bisect
+import mmap
+import glob
+import csv
+import io
+import os
+import math
+import numpy as np
+
+MAGIC = b'SKUIDX01'
+_HEADER = struct.Struct('<8sII')
+
+# Where index files are written; defaults to next to the order files.
+ORDER_INDEX_DIR = os.getenv("ORDER_INDEX_DIR", "")
+
+
+def _sku_id(row, item_col, loc_col):
+    item = row[item_col].strip() if item_col < len(row) else ''
+    loc = row[loc_col].strip() if loc_col < len(row) else ''
+    return f"{item}@{loc}"
+
+
+def _qty_key(row, qty_col):
+    # Descending qty with nulls first, as ORDER BY toFloat(row.Qty) DESC.
+    try:
+        qty = float(row[qty_col])
+    except (IndexError, ValueError):
+        return -math.inf
+    return -qty if not math.isnan(qty) else -math.inf
+
+
+def _csv_line(row):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(row)
+    return buffer.getvalue().encode('utf-8')
+
+
+def build_index(source_path, base_path):
+    """Writes the .bysku and .skuidx files for source_path under base_path."""
+    with open(source_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        rows = list(reader)
+    item_col = headers.index('Item') if 'Item' in headers else len(headers)
+    loc_col = headers.index('Loc') if 'Loc' in headers else len(headers)
+    qty_col = headers.index('Qty') if 'Qty' in headers else len(headers)
+    keyed = sorted(
+        ((_sku_id(row, item_col, loc_col).encode('utf-8'), _qty_key(row, qty_col), i) for i, row in enumerate(rows)),
+    )
+
+    keys, data_offsets, data_lengths = [], [], []
+    tmp_data = f"{base_path}.bysku.{os.getpid()}.tmp"
+    with open(tmp_data, 'wb') as out:
+        for key, _, i in keyed:
+            if not keys or keys[-1] != key:
+                keys.append(key)
+                data_offsets.append(out.tell())
+                data_lengths.append(0)
+            line = _csv_line(rows[i])
+            out.write(line)
+            data_lengths[-1] += len(line)
+
+    header_line = _csv_line(headers)
+    key_offsets = np.zeros(len(keys) + 1, dtype='<u8')
+    np.cumsum([len(k) for k in keys], out=key_offsets[1:])
+    tmp_index = f"{base_path}.skuidx.{os.getpid()}.tmp"
+    with open(tmp_index, 'wb') as out:
+        out.write(_HEADER.pack(MAGIC, len(keys), len(header_line)))
+        out.write(header_line)
+        out.write(key_offsets.tobytes())
+        out.write(np.asarray(data_offsets, dtype='<u8').tobytes())
+        out.write(np.asarray(data_lengths, dtype='<u8').tobytes())
+        out.write(b''.join(keys))
+    # Data first: a present .skuidx always has its .bysku next to it.
+    os.replace(tmp_data, base_path + '.bysku')
+    os.replace(tmp_index, base_path + '.skuidx')
+
+
+class _Keys:
+    """Sequence view over the key blob for bisect; each access reads one key from the map."""
+
+    def __init__(self, buffer, start, offsets):
+        self.buffer = buffer
+        self.start = start
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.buffer[self.start + int(self.offsets[i]):self.start + int(self.offsets[i + 1])]
+
+
+class MappedOrderIndex:
+    """Read-only view of one built index."""
+
+    def __init__(self, base_path):
+        with open(base_path + '.skuidx', 'rb') as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(base_path + '.bysku', 'rb') as f:
+            # mmap cannot map an empty file; an order file without rows has no data.
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        magic, count, header_len = _HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{base_path}.skuidx is not an order index")
+        pos = _HEADER.size
+        self.headers = next(csv.reader([self._index[pos:pos + header_len].decode('utf-8')]))
+        pos += header_len
+        key_offsets = np.frombuffer(self._index, dtype='<u8', count=count + 1, offset=pos)
+        pos += key_offsets.nbytes
+        self._data_offsets = np.frombuffer(self._index, dtype='<u8', count=count, offset=pos)
+        pos += self._data_offsets.nbytes
+        self._data_lengths = np.frombuffer(self._index, dtype='<u8', count=count, offset=pos)
+        pos += self._data_lengths.nbytes
+        self._keys = _Keys(self._index, pos, key_offsets)
+        self.num_skus = count
+
+    def lookup(self, sku_id):
+        """The SKU's CSV rows as dicts, qty descending; only that SKU's slice of the data is read."""
+        key = sku_id.encode('utf-8')
+        i = bisect.bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            return []
+        start = int(self._data_offsets[i])
+        chunk = self._data[start:start + int(self._data_lengths[i])].decode('utf-8')
+        return [dict(zip(self.headers, row)) for row in csv.reader(io.StringIO(chunk, newline=''))]
+
+
+class OrderIndex:
+    """Per-file index that rebuilds itself when the source file's mtime or size changes."""
+
+    def __init__(self, source_path, index_dir=ORDER_INDEX_DIR):
+        self.source_path = source_path
+        self.index_dir = index_dir or os.path.dirname(source_path) or '.'
+        self._mapped = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _base_path(self, signature):
+        name = os.path.basename(self.source_path)
+        return os.path.join(self.index_dir, f"{name}.{signature[0]}-{signature[1]}")
+
+    def _remove_stale(self, current_base):
+        pattern = os.path.join(self.index_dir, glob.escape(os.path.basename(self.source_path)) + '.*-*.*')
+        for path in glob.glob(pattern):
+            if not path.startswith(current_base + '.'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Still mapped (Windows) or removed by another process.
+
+    def current(self):
+        stat = os.stat(self.source_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    base = self._base_path(signature)
+                    if not os.path.exists(base + '.skuidx'):
+                        build_index(self.source_path, base)
+                        self._remove_stale(base)
+                    self._mapped = MappedOrderIndex(base)
+                    self._signature = signature
+        return self._mapped
+
+    def lookup(self, sku_id):
+        return self.current().lookup(sku_id)
+
+
+if __name__ == '__main__':
+    from .order_store import ORDER_DATA_DIR, ORDER_FILES
+    for file_name in ORDER_FILES.values():
+        index = OrderIndex(os.path.join(ORDER_DATA_DIR, file_name))
+        print(f"{file_name}: {index.current().num_skus} SKUs indexed")
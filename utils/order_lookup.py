@@ -0,0 +1,92 @@
+# utils/order_lookup.py
+# Order lookups on Demand nodes by orderId or seqnum. A filter with OR across the two properties
+# cannot use one index seek, so the lookup is a UNION of two seeks, one per indexed key, and the
+# matching demand's constraints are collected in the same query. Suggestions for the search box
+# use the same range index for prefix (STARTS WITH) matches and a text index for partial
+# (CONTAINS) matches, ordered by orderId and limited, so both stay flat as Demand grows.
+# The date index backs the date-ordered impacted-demands pages (routes/constraints.py).
+import os
+from .neo4j_handler import get_session
+
+# Create the lookup indexes at startup when they are missing.
+ORDER_LOOKUP_ENSURE_INDEXES = os.getenv("ORDER_LOOKUP_ENSURE_INDEXES", "true").lower() == "true"
+ORDER_SUGGEST_LIMIT = int(os.getenv("ORDER_SUGGEST_LIMIT", "10"))
+ORDER_SUGGEST_MAX = 100
+
+# Failures are reported and skipped, since an equivalent index may already exist under another name.
+ORDER_LOOKUP_SCHEMA_QUERIES = [
+    "CREATE INDEX demand_order_id IF NOT EXISTS FOR (d:Demand) ON (d.orderId)",
+    "CREATE INDEX demand_seqnum IF NOT EXISTS FOR (d:Demand) ON (d.seqnum)",
+    "CREATE TEXT INDEX demand_order_id_text IF NOT EXISTS FOR (d:Demand) ON (d.orderId)",
+    "CREATE INDEX demand_date IF NOT EXISTS FOR (d:Demand) ON (d.date)",
+]
+
+ORDER_LOOKUP_QUERY = """
+CALL() {
+    MATCH (d:Demand {orderId: $order_id}) RETURN d
+    UNION
+    MATCH (d:Demand {seqnum: $order_id}) RETURN d
+}
+WITH d LIMIT 1
+OPTIONAL MATCH (d)<-[:IMPACTS_DEMAND]-(c:Constraint)
+RETURN d, collect(c) AS constraints
+"""
+
+ORDER_PREFIX_QUERY = """
+MATCH (d:Demand) WHERE d.orderId STARTS WITH $text
+WITH DISTINCT d.orderId AS orderId
+ORDER BY orderId
+LIMIT $limit
+RETURN orderId
+"""
+
+ORDER_CONTAINS_QUERY = """
+MATCH (d:Demand) WHERE d.orderId CONTAINS $text
+WITH DISTINCT d.orderId AS orderId
+ORDER BY orderId
+LIMIT $limit
+RETURN orderId
+"""
+
+
+def build_order_search(result):
+    if not result:
+        return {'orderDetails': None, 'constraints': []}
+    order_details = dict(result['d'])
+    constraints = [dict(node) for node in result['constraints'] if node is not None]
+    return {'orderDetails': order_details, 'constraints': constraints}
+
+
+def suggest_request(args):
+    """(query, params) for ?q= with ?match=prefix|contains and ?limit=. Raises ValueError."""
+    text = (args.get('q') or '').strip()
+    if not text:
+        raise ValueError('q query parameter is required')
+    match = args.get('match', 'prefix')
+    if match not in ('prefix', 'contains'):
+        raise ValueError("match must be 'prefix' or 'contains'")
+    try:
+        limit = int(args.get('limit', ORDER_SUGGEST_LIMIT))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    query = ORDER_PREFIX_QUERY if match == 'prefix' else ORDER_CONTAINS_QUERY
+    return query, {'text': text, 'limit': max(1, min(limit, ORDER_SUGGEST_MAX))}
+
+
+def ensure_order_indexes():
+    with get_session() as session:
+        for query in ORDER_LOOKUP_SCHEMA_QUERIES:
+            try:
+                session.run(query).consume()
+            except Exception as e:
+                print(f"Skipped schema statement ({e}): {query}")
+
+
+def start_order_lookup(enabled=ORDER_LOOKUP_ENSURE_INDEXES):
+    """Creates the lookup indexes when ORDER_LOOKUP_ENSURE_INDEXES is set. Never fails startup."""
+    if not enabled:
+        return
+    try:
+        ensure_order_indexes()
+    except Exception as e:
+        print(f"An error occurred while creating order lookup indexes: {e}")
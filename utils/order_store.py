@@ -0,0 +1,389 @@
+# utils/order_store.py
+# Customer and forecast orders held in memory as columns, replacing per-request LOAD CSV scans.
+# Each file is parsed once and re-parsed only when its modification time or size changes.
+# "Affected" orders are the ones on demand SKUs with a broken BOM; that SKU set is read from
+# Neo4j once per graph snapshot version (utils/graph_snapshot.py).
+# With ORDER_SOURCE=graph the same questions are answered from the Demand nodes written by
+# utils/ingest_orders.py instead.
+import threading
+import asyncio
+import time
+import json
+import csv
+import sys
+import os
+import numpy as np
+from .neo4j_handler import get_session, single_async, records_async
+from .graph_snapshot import current_version, SnapshotCache
+from .order_index import OrderIndex
+from .topk import AffectedTopK
+
+# Directory holding custorder.csv and fcstorder.csv (the same files Neo4j imports). A relative
+# path is resolved against the project directory, not the working directory.
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORDER_DATA_DIR = os.path.join(_PROJECT_DIR, os.getenv("ORDER_DATA_DIR", "data"))
+ORDER_FILES = {'cust': 'custorder.csv', 'fcst': 'fcstorder.csv'}
+# 'csv' reads the order files; 'graph' queries ingested Demand nodes.
+ORDER_SOURCE = os.getenv("ORDER_SOURCE", "csv")
+# Maximum age of the broken demand SKU set even when the snapshot version does not move.
+BROKEN_SKUS_CACHE_SECONDS = float(os.getenv("BROKEN_SKUS_CACHE_SECONDS", "300"))
+
+BROKEN_DEMAND_SKUS_QUERY = "MATCH (s:SKU) WHERE s.demand_sku = true AND s.broken_bom = true RETURN s.sku_id AS sku_id"
+
+# Graph-backed queries. Ties are broken by row number, matching the file order the CSV store keeps.
+AFFECTED_DEMAND_SUMMARY_QUERY = """
+MATCH (s:SKU {demand_sku: true, broken_bom: true})<-[:IS_FOR_SKU]-(d:Demand {source: $source})
+RETURN count(d) AS orderCount, sum(d.qty) AS totalQty
+"""
+
+AFFECTED_DEMANDS_QUERY = """
+MATCH (s:SKU {demand_sku: true, broken_bom: true})<-[:IS_FOR_SKU]-(d:Demand {source: $source})
+RETURN s.sku_id AS sku_id, d.full_record AS full_record
+ORDER BY s.sku_id, d.qty DESC, d.row_num
+LIMIT $limit
+"""
+
+TOP_AFFECTED_DEMANDS_QUERY = """
+MATCH (s:SKU {demand_sku: true, broken_bom: true})<-[:IS_FOR_SKU]-(d:Demand {source: $source})
+RETURN d.full_record AS full_record
+ORDER BY d.qty DESC, d.row_num
+LIMIT $limit
+"""
+
+SKU_DEMANDS_QUERY = """
+MATCH (d:Demand {source: $source, sku_id: $sku_id})
+RETURN d.full_record AS full_record
+ORDER BY d.qty DESC, d.row_num
+"""
+
+SKU_ORDER_TOTALS_QUERY = """
+MATCH (d:Demand {source: $source}) WHERE d.sku_id IS NOT NULL
+RETURN d.sku_id AS sku_id, count(d) AS orderCount, sum(d.qty) AS totalQty
+"""
+
+
+
+_missing_reported = set()
+
+
+def _broken_sku_set(rows):
+    # Returned with its load time, which keys the masks derived from the set.
+    return frozenset(sys.intern(row['sku_id']) for row in rows if row['sku_id']), (time.time(),)
+
+
+def _order_payloads(rows, sku_id=None):
+    return [{'sku_id': sku_id or row['sku_id'], 'properties': {'full_record': json.loads(row['full_record'])}} for row in rows]
+
+
+def file_signature(path):
+    """(mtime_ns, size) of a file, or None (reported once per path) when it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        if path not in _missing_reported:
+            _missing_reported.add(path)
+            print(f"WARNING: Order file {path} not found (check ORDER_DATA_DIR); serving it as empty.")
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _to_float(value):
+    # Mirrors Cypher toFloat(): unparseable values become null (NaN here).
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class OrderTable:
+    """
+    One order file as columns. Raw CSV values are kept per header (for full_record payloads);
+    sku_id codes and qty are derived once at load time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.signature = file_signature(path)
+        # A missing file is an empty table.
+        self.headers, columns = [], []
+        if self.signature is not None:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.reader(f)
+                self.headers = next(reader, [])
+                columns = [[] for _ in self.headers]
+                for row in reader:
+                    row = row + [''] * (len(self.headers) - len(row))
+                    for column, value in zip(columns, row):
+                        column.append(sys.intern(value) if len(value) < 64 else value)
+        self.columns = dict(zip(self.headers, columns))
+        self.num_rows = len(columns[0]) if columns else 0
+
+        items = [value.strip() for value in self.column('Item')]
+        locs = [value.strip() for value in self.column('Loc')]
+        self.valid = np.array([bool(item) and bool(loc) for item, loc in zip(items, locs)], dtype=bool)
+        self.sku_ids = []
+        self.sku_index = {}
+        codes = np.empty(self.num_rows, dtype=np.int32)
+        for i, (item, loc) in enumerate(zip(items, locs)):
+            sku_id = sys.intern(f"{item}@{loc}")
+            code = self.sku_index.get(sku_id)
+            if code is None:
+                code = self.sku_index[sku_id] = len(self.sku_ids)
+                self.sku_ids.append(sku_id)
+            codes[i] = code
+        self.sku_codes = codes
+        # Position of each SKU code in sku_id order, for ORDER BY sku_id.
+        self.sku_rank = np.argsort(np.argsort(np.array(self.sku_ids, dtype=object), kind='stable'))
+        self.qty = np.array([_to_float(value) for value in self.column('Qty')], dtype=np.float64)
+
+        self._masks = {}
+        self._codes = {}
+        self._topk = None
+        self._totals = None
+        self._lock = threading.Lock()
+
+    def column(self, name):
+        return self.columns.get(name) or [''] * self.num_rows
+
+    def record(self, i):
+        """The CSV row as LOAD CSV WITH HEADERS would return it."""
+        return {header: self.columns[header][i] for header in self.headers}
+
+    def sku_mask(self, sku_set, key):
+        """Valid rows whose SKU is in sku_set; cached under key (the snapshot version)."""
+        # Read and replaced as a whole, so a concurrent call with another key cannot swap it under us.
+        mask = self._masks.get(key)
+        if mask is None:
+            code_mask = np.zeros(len(self.sku_ids), dtype=bool)
+            for sku_id in sku_set:
+                code = self.sku_index.get(sku_id)
+                if code is not None:
+                    code_mask[code] = True
+            mask = self.valid & code_mask[self.sku_codes]
+            self._masks = {key: mask}
+        return mask
+
+    def codes_for(self, sku_set, key):
+        """Codes of the SKUs in sku_set that occur in this table; cached under key."""
+        codes = self._codes.get(key)
+        if codes is None:
+            codes = frozenset(self.sku_index[sku_id] for sku_id in sku_set if sku_id in self.sku_index)
+            self._codes = {key: codes}
+        return codes
+
+    def sku_totals(self):
+        """{sku_id: (order count, total qty)} over the valid rows, built on first use."""
+        if self._totals is None:
+            codes = self.sku_codes[self.valid]
+            counts = np.bincount(codes, minlength=len(self.sku_ids))
+            qty = np.bincount(codes, weights=np.nan_to_num(self.qty[self.valid]), minlength=len(self.sku_ids))
+            self._totals = {sku_id: (int(counts[code]), float(qty[code]))
+                            for code, sku_id in enumerate(self.sku_ids) if counts[code]}
+        return self._totals
+
+    def topk(self):
+        """Per-SKU and global top-K structure (utils/topk.py), built on first use."""
+        if self._topk is None:
+            with self._lock:
+                if self._topk is None:
+                    self._topk = AffectedTopK(self)
+        return self._topk
+
+
+class OrderStore:
+    """Process-wide holder of the order tables and of the broken demand SKU set."""
+
+    def __init__(self, data_dir=ORDER_DATA_DIR):
+        self.data_dir = data_dir
+        self._tables = {}
+        self._indexes = {kind: OrderIndex(os.path.join(data_dir, name)) for kind, name in ORDER_FILES.items()}
+        self._broken = SnapshotCache(self._load_broken_demand_skus, BROKEN_SKUS_CACHE_SECONDS)
+        self._lock = threading.Lock()
+
+    def file_signature(self, kind):
+        """(mtime_ns, size) of the order file, read without parsing it; None if it is missing."""
+        return file_signature(os.path.join(self.data_dir, ORDER_FILES[kind]))
+
+    def table(self, kind):
+        """The parsed table for 'cust' or 'fcst', re-parsed if the file changed on disk."""
+        signature = self.file_signature(kind)
+        table = self._tables.get(kind)
+        if table is None or table.signature != signature:
+            with self._lock:
+                table = self._tables.get(kind)
+                if table is None or table.signature != signature:
+                    table = self._tables[kind] = OrderTable(os.path.join(self.data_dir, ORDER_FILES[kind]))
+        return table
+
+    def signature(self, kind):
+        """Changes whenever the orders of this kind change."""
+        return self.table(kind).signature
+
+    @staticmethod
+    def _load_broken_demand_skus():
+        with get_session() as session:
+            return _broken_sku_set(session.run(BROKEN_DEMAND_SKUS_QUERY))
+
+    @staticmethod
+    async def _load_broken_demand_skus_async():
+        return _broken_sku_set(await records_async(BROKEN_DEMAND_SKUS_QUERY))
+
+    def broken_demand_skus(self):
+        """(SKU set, cache key), read once per snapshot version and at least every BROKEN_SKUS_CACHE_SECONDS."""
+        return self._broken.get()
+
+    def affected_mask(self, kind):
+        table = self.table(kind)
+        skus, key = self.broken_demand_skus()
+        return table, table.sku_mask(skus, key + (table.signature,))
+
+    def affected_codes(self, kind):
+        table = self.table(kind)
+        skus, key = self.broken_demand_skus()
+        key = key + (table.signature,)
+        return table, table.codes_for(skus, key), key
+
+    # --- Queries ------------------------------------------------------------------------
+
+    def affected_summary(self, kind):
+        """(order count, total qty) of affected orders."""
+        table, mask = self.affected_mask(kind)
+        return int(mask.sum()), float(np.nansum(table.qty[mask]))
+
+    def affected_orders(self, kind, limit=100):
+        """
+        Affected orders ordered by SKU, then qty descending, as serialize_record payloads.
+        Walks the broken SKUs in sku_id order and stops once `limit` rows are collected.
+        """
+        table, codes, _ = self.affected_codes(kind)
+        topk = table.topk()
+        rows = []
+        for code in sorted(codes, key=table.sku_rank.__getitem__):
+            if len(rows) >= limit:
+                break
+            rows.extend(topk.sku_rows(code, limit - len(rows)))
+        return [self._payload(table, i) for i in rows]
+
+    def top_affected_orders(self, kind, limit=20):
+        """Largest affected orders by qty (at most ORDER_TOPK_MAX), as raw CSV records."""
+        table, codes, key = self.affected_codes(kind)
+        return [table.record(i) for i in table.topk().top(codes, key, limit)]
+
+    def order_totals(self, kind):
+        """{sku_id: (order count, total qty)} of every SKU with orders of this kind."""
+        return self.table(kind).sku_totals()
+
+    def orders_for_sku(self, kind, sku_id):
+        """
+        All orders of one SKU (affected or not), qty descending, as serialize_record payloads.
+        Read through the on-disk SKU index, so only that SKU's rows are touched.
+        """
+        if self.file_signature(kind) is None:
+            return []
+        return [{'sku_id': sku_id, 'properties': {'full_record': record}} for record in self._indexes[kind].lookup(sku_id)]
+
+    @staticmethod
+    def _payload(table, i):
+        return {'sku_id': table.sku_ids[table.sku_codes[i]], 'properties': {'full_record': table.record(i)}}
+
+    # --- Async variants -------------------------------------------------------------------
+    # Only the broken SKU set comes from Neo4j; it is refreshed on the async driver, and the file
+    # and array work then runs in a worker thread against the warm cache.
+
+    async def _warm_broken_demand_skus(self):
+        await self._broken.get_async(self._load_broken_demand_skus_async)
+
+    async def signature_async(self, kind):
+        return await asyncio.to_thread(self.signature, kind)
+
+    async def affected_summary_async(self, kind):
+        await self._warm_broken_demand_skus()
+        return await asyncio.to_thread(self.affected_summary, kind)
+
+    async def affected_orders_async(self, kind, limit=100):
+        await self._warm_broken_demand_skus()
+        return await asyncio.to_thread(self.affected_orders, kind, limit)
+
+    async def orders_for_sku_async(self, kind, sku_id):
+        return await asyncio.to_thread(self.orders_for_sku, kind, sku_id)
+
+    async def order_totals_async(self, kind):
+        return await asyncio.to_thread(self.order_totals, kind)
+
+
+class GraphOrderStore:
+    """OrderStore interface answered from ingested Demand nodes through indexed lookups."""
+
+    def __init__(self):
+        self._totals = {}
+
+    def file_signature(self, kind):
+        # Demand nodes are tracked by the graph snapshot version.
+        return None
+
+    def signature(self, kind):
+        # Constant like file_signature: callers that key on it also key on the snapshot version.
+        return None
+
+    async def signature_async(self, kind):
+        return None
+
+    def affected_summary(self, kind):
+        with get_session() as session:
+            row = session.run(AFFECTED_DEMAND_SUMMARY_QUERY, source=kind).single()
+        return row['orderCount'], float(row['totalQty'] or 0)
+
+    async def affected_summary_async(self, kind):
+        row = await single_async(AFFECTED_DEMAND_SUMMARY_QUERY, source=kind)
+        return row['orderCount'], float(row['totalQty'] or 0)
+
+    def affected_orders(self, kind, limit=100):
+        with get_session() as session:
+            return _order_payloads(session.run(AFFECTED_DEMANDS_QUERY, source=kind, limit=limit))
+
+    async def affected_orders_async(self, kind, limit=100):
+        return _order_payloads(await records_async(AFFECTED_DEMANDS_QUERY, source=kind, limit=limit))
+
+    def top_affected_orders(self, kind, limit=20):
+        with get_session() as session:
+            result = session.run(TOP_AFFECTED_DEMANDS_QUERY, source=kind, limit=limit)
+            return [json.loads(row['full_record']) for row in result]
+
+    def _cached_totals(self, kind):
+        cached_version, totals = self._totals.get(kind, (None, None))
+        return totals if totals is not None and cached_version == current_version() else None
+
+    @staticmethod
+    def _totals_from(rows):
+        return {row['sku_id']: (row['orderCount'], float(row['totalQty'] or 0)) for row in rows}
+
+    def order_totals(self, kind):
+        totals = self._cached_totals(kind)
+        if totals is None:
+            version = current_version()
+            with get_session() as session:
+                totals = self._totals_from(session.run(SKU_ORDER_TOTALS_QUERY, source=kind))
+            self._totals[kind] = (version, totals)
+        return totals
+
+    async def order_totals_async(self, kind):
+        totals = self._cached_totals(kind)
+        if totals is None:
+            version = current_version()
+            totals = self._totals_from(await records_async(SKU_ORDER_TOTALS_QUERY, source=kind))
+            self._totals[kind] = (version, totals)
+        return totals
+
+    def orders_for_sku(self, kind, sku_id):
+        with get_session() as session:
+            return _order_payloads(session.run(SKU_DEMANDS_QUERY, source=kind, sku_id=sku_id), sku_id)
+
+    async def orders_for_sku_async(self, kind, sku_id):
+        return _order_payloads(await records_async(SKU_DEMANDS_QUERY, source=kind, sku_id=sku_id), sku_id)
+
+
+_store = GraphOrderStore() if ORDER_SOURCE == 'graph' else OrderStore()
+
+
+def get_order_store():
+    return _store
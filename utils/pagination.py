@@ -0,0 +1,93 @@
+# utils/pagination.py
+# Keyset (cursor) pagination for list endpoints. A page query returns rows ordered by a unique
+# sort key and starting after the previous page's last key, so every page costs the same as the
+# first instead of growing with OFFSET. The cursor is that last key, opaque to the client.
+# Totals come from count queries cached per graph snapshot version for COUNT_CACHE_SECONDS.
+import threading
+import base64
+import json
+import time
+import os
+from .neo4j_handler import get_session, single_async
+from .graph_snapshot import current_version
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+COUNT_CACHE_SECONDS = float(os.getenv("COUNT_CACHE_SECONDS", "30"))
+
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """The key values of a cursor; raises ValueError for anything not produced by encode_cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def page_request(args):
+    """(limit, key values after which the page starts, or None) from ?limit= and ?cursor=."""
+    try:
+        limit = int(args.get('limit', PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    cursor = args.get('cursor')
+    return max(1, min(limit, PAGE_SIZE_MAX)), decode_cursor(cursor) if cursor else None
+
+
+def build_page(records, limit, serialize, key_of, total):
+    """
+    Page payload from a query run with LIMIT limit + 1: the extra row only tells whether another
+    page exists. key_of(record) returns the sort key values the next page starts after.
+    """
+    records = list(records)
+    items = records[:limit]
+    has_more = len(records) > limit
+    return {
+        'items': [serialize(record) for record in items],
+        'nextCursor': encode_cursor(key_of(items[-1])) if has_more else None,
+        'total': total,
+        'limit': limit,
+    }
+
+
+def _cached(key, version):
+    entry = _counts.get(key)
+    if entry is not None and entry[0] == version and time.time() - entry[1] < COUNT_CACHE_SECONDS:
+        return entry[2]
+    return None
+
+
+def _store(key, version, record):
+    count = record['count'] if record else 0
+    with _counts_lock:
+        _counts[key] = (version, time.time(), count)
+    return count
+
+
+def cached_count(query, **params):
+    """Result of a `RETURN count(..) AS count` query, recomputed per snapshot version or when older than COUNT_CACHE_SECONDS."""
+    key, version = (query, json.dumps(params, sort_keys=True)), current_version()
+    count = _cached(key, version)
+    if count is not None:
+        return count
+    with get_session() as session:
+        return _store(key, version, session.run(query, **params).single())
+
+
+async def cached_count_async(query, **params):
+    """cached_count on the async driver, sharing its cache."""
+    key, version = (query, json.dumps(params, sort_keys=True)), current_version()
+    count = _cached(key, version)
+    if count is not None:
+        return count
+    return _store(key, version, await single_async(query, **params))
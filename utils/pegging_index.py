@@ -0,0 +1,151 @@
+# utils/pegging_index.py
+# In-memory index of the PEGGED_TO_RESOURCE relationships, answering both directions without
+# matching the pegging in Cypher:
+#   * (res_id, week) -> demands, largest load first (the resource-week drill-down),
+#   * demand -> the resource-weeks it loads.
+# Each direction is a CSR over one sort of the pegging rows, so a lookup is a slice. The index is
+# rebuilt when the snapshot version moves (PEGGED_TO_RESOURCE is tracked by the snapshot
+# signatures) and at least every PEGGING_CACHE_SECONDS. Demand properties are fetched by id for
+# the rows actually returned.
+import time
+import sys
+import os
+import numpy as np
+from .neo4j_handler import get_session, records_async
+from .graph_snapshot import SnapshotCache
+from .supply_graph import CSR
+
+PEGGING_CACHE_SECONDS = float(os.getenv("PEGGING_CACHE_SECONDS", "300"))
+
+PEGGING_QUERY = """
+MATCH (d:Demand)-[p:PEGGED_TO_RESOURCE]->(r:Res)
+RETURN elementId(d) AS demand, r.res_id AS res_id, p.week AS week, p.loadQty AS load_qty
+"""
+
+DEMAND_PROPERTIES_QUERY = """
+MATCH (d:Demand) WHERE elementId(d) IN $ids
+RETURN elementId(d) AS id, properties(d) AS demand
+"""
+
+
+def _as_float(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+def _json_value(value):
+    # NaN (missing loadQty) becomes null.
+    return value if value == value else None
+
+
+class PeggingIndex:
+    def __init__(self, rows):
+        started = time.perf_counter()
+        key_index, demand_index = {}, {}
+        keys, demands, loads = [], [], []
+        for row in rows:
+            res_id, week = row['res_id'], row['week']
+            if res_id is None or week is None:
+                continue
+            keys.append(key_index.setdefault((sys.intern(str(res_id)), week), len(key_index)))
+            demands.append(demand_index.setdefault(row['demand'], len(demand_index)))
+            loads.append(_as_float(row['load_qty']))
+
+        self.keys = list(key_index)
+        self.key_index = key_index
+        self.demand_ids = list(demand_index)
+        self.demand_index = demand_index
+        key = np.asarray(keys, dtype=np.int32)
+        demand = np.asarray(demands, dtype=np.int32)
+        self.load = np.asarray(loads, dtype=np.float64)
+        rows_idx = np.arange(len(keys), dtype=np.int32)
+
+        # Resource-week -> demands: load descending with missing loads last, ties by demand.
+        order = np.lexsort((demand, -np.nan_to_num(self.load, nan=-np.inf), key))
+        self.by_key = CSR(len(self.keys), key[order], demand[order], rows_idx[order])
+        # Demand -> resource-weeks, by resource and week.
+        ranked = sorted(range(len(self.keys)), key=lambda k: (self.keys[k][0], str(type(self.keys[k][1])), self.keys[k][1]))
+        key_rank = np.empty(len(self.keys), dtype=np.int64)
+        key_rank[ranked] = np.arange(len(self.keys))
+        order = np.lexsort((key_rank[key], demand))
+        self.by_demand = CSR(len(self.demand_ids), demand[order], key[order], rows_idx[order])
+        self.num_rows = len(keys)
+        self.build_seconds = time.perf_counter() - started
+
+    @classmethod
+    def load_from(cls, session):
+        return cls(session.run(PEGGING_QUERY))
+
+    def count(self, res_id, week):
+        k = self.key_index.get((res_id, week))
+        return 0 if k is None else int(self.by_key.indptr[k + 1] - self.by_key.indptr[k])
+
+    def demands_for(self, res_id, week, offset=0, limit=None):
+        """[(demand id, loadQty)] pegged to one resource-week, largest load first, from `offset`."""
+        k = self.key_index.get((res_id, week))
+        if k is None:
+            return []
+        start, end = self.by_key.indptr[k] + offset, self.by_key.indptr[k + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        slots = slice(start, end)
+        return [(self.demand_ids[d], _json_value(load))
+                for d, load in zip(self.by_key.nbr[slots].tolist(), self.load[self.by_key.edge[slots]].tolist())]
+
+    def resource_weeks(self, demand_id):
+        """[{'resId', 'week', 'loadQty'}] the demand loads, by resource and week."""
+        d = self.demand_index.get(demand_id)
+        if d is None:
+            return []
+        slots = slice(self.by_demand.indptr[d], self.by_demand.indptr[d + 1])
+        return [{'resId': self.keys[k][0], 'week': self.keys[k][1], 'loadQty': _json_value(load)}
+                for k, load in zip(self.by_demand.nbr[slots].tolist(), self.load[self.by_demand.edge[slots]].tolist())]
+
+    def peg_arrays(self):
+        """(resource-week key, demand, loadQty) per pegging row, as arrays in drill-down order."""
+        keys = np.repeat(np.arange(len(self.keys), dtype=np.int32), np.diff(self.by_key.indptr))
+        return keys, self.by_key.nbr, self.load[self.by_key.edge]
+
+    def memory_bytes(self):
+        return self.load.nbytes + self.by_key.nbytes() + self.by_demand.nbytes()
+
+    def stats(self):
+        return {
+            'pegs': self.num_rows,
+            'resourceWeeks': len(self.keys),
+            'demands': len(self.demand_ids),
+            'buildSeconds': round(self.build_seconds, 3),
+            'memoryBytes': self.memory_bytes(),
+        }
+
+
+def demand_properties(demand_ids):
+    """{demand id: properties} for the given Demand element ids."""
+    if not demand_ids:
+        return {}
+    with get_session() as session:
+        return {row['id']: row['demand'] for row in session.run(DEMAND_PROPERTIES_QUERY, ids=list(demand_ids))}
+
+
+async def demand_properties_async(demand_ids):
+    """demand_properties on the async driver."""
+    if not demand_ids:
+        return {}
+    return {row['id']: row['demand'] for row in await records_async(DEMAND_PROPERTIES_QUERY, ids=list(demand_ids))}
+
+
+def _load_index():
+    with get_session() as session:
+        return PeggingIndex.load_from(session)
+
+
+_cache = SnapshotCache(_load_index, PEGGING_CACHE_SECONDS)
+
+
+def get_pegging_index():
+    """The cached index, rebuilt when the snapshot version moved or it is older than PEGGING_CACHE_SECONDS."""
+    return _cache.get()
+
+
+def pegging_cache_status():
+    index = _cache.value
+    return dict(_cache.status(), stats=index.stats() if index is not None else None)
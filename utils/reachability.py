@@ -0,0 +1,220 @@
+# utils/reachability.py
+# Precomputed upstream/downstream reachability over the supply relationships of a SupplyGraph.
+#
+# The graph is condensed to a DAG of strongly connected components. Tarjan's algorithm numbers
+# components in DFS post-order, so everything below a component in the DFS tree gets a contiguous
+# block of ids. Each component's full descendant set is therefore stored as a short list of
+# [start, end) id intervals. Ancestor sets use a second numbering from the reversed graph.
+# "Is A downstream of B" is a binary search in B's intervals. Listing a closure expands the
+# intervals without a graph traversal.
+import bisect
+import time
+import os
+import numpy as np
+
+# The build is abandoned (and traversal used instead) if the interval lists would exceed this size.
+REACHABILITY_MAX_BYTES = int(os.getenv("REACHABILITY_MAX_BYTES", str(512 * 1024 * 1024)))
+# Approximate size of one interval while building (a tuple in a list), used against the budget.
+_BUILD_BYTES_PER_INTERVAL = 80
+
+
+class ReachabilityBudgetExceeded(Exception):
+    pass
+
+
+def strongly_connected_components(num_nodes, indptr, nbr):
+    """
+    Iterative Tarjan. Returns (component id per node, component count). Ids are assigned in
+    reverse topological order: for every edge between components C1 -> C2, id(C2) < id(C1).
+    """
+    indptr = indptr.tolist()
+    nbr = nbr.tolist()
+    index = [-1] * num_nodes
+    low = [0] * num_nodes
+    on_stack = [False] * num_nodes
+    comp = [-1] * num_nodes
+    stack = []
+    counter = 0
+    num_comps = 0
+    for root in range(num_nodes):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [[root, indptr[root]]]
+        while work:
+            frame = work[-1]
+            v, pos = frame
+            if pos < indptr[v + 1]:
+                frame[1] = pos + 1
+                w = nbr[pos]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append([w, indptr[w]])
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp[w] = num_comps
+                    if w == v:
+                        break
+                num_comps += 1
+    return np.asarray(comp, dtype=np.int32), num_comps
+
+
+def _grouped(num_groups, keys, values):
+    """CSR grouping of values by key: returns (indptr, values sorted by key)."""
+    order = np.argsort(keys, kind='stable')
+    indptr = np.zeros(num_groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_groups), out=indptr[1:])
+    return indptr, values[order]
+
+
+def _interval_closure(num_comps, child_ptr, children, budget):
+    """
+    Builds [start, end) interval lists of the closure of every component, assuming every child
+    has a smaller id than its parent. Returns flat (ptr, starts, ends) arrays.
+    """
+    child_ptr = child_ptr.tolist()
+    children = children.tolist()
+    closures = [None] * num_comps
+    total = 0
+    for c in range(num_comps):
+        kids = children[child_ptr[c]:child_ptr[c + 1]]
+        if not kids:
+            merged = [(c, c + 1)]
+        else:
+            if len(kids) == 1:
+                merged = list(closures[kids[0]])
+            else:
+                pieces = sorted(interval for k in kids for interval in closures[k])
+                merged = [pieces[0]]
+                for start, end in pieces[1:]:
+                    last_start, last_end = merged[-1]
+                    if start <= last_end:
+                        if end > last_end:
+                            merged[-1] = (last_start, end)
+                    else:
+                        merged.append((start, end))
+            # c is larger than every id below it, so it either extends the last interval or follows it.
+            last_start, last_end = merged[-1]
+            if last_end == c:
+                merged[-1] = (last_start, c + 1)
+            else:
+                merged.append((c, c + 1))
+        closures[c] = merged
+        total += len(merged)
+        if total * _BUILD_BYTES_PER_INTERVAL > budget:
+            raise ReachabilityBudgetExceeded(f"interval lists exceed {budget} bytes")
+    ptr = np.zeros(num_comps + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in closures], out=ptr[1:])
+    flat = np.array([interval for intervals in closures for interval in intervals], dtype=np.int32).reshape(-1, 2)
+    return ptr, flat[:, 0].copy(), flat[:, 1].copy()
+
+
+class ReachabilityIndex:
+    """Upstream/downstream closure of every node in a SupplyGraph's supply relationships."""
+
+    def __init__(self, graph, budget=REACHABILITY_MAX_BYTES):
+        started = time.perf_counter()
+        self.num_nodes = graph.num_nodes
+        fwd, rev = graph.supply_fwd, graph.supply_rev
+        # Canonical ids come from the forward graph; the reverse graph gives the ancestor numbering.
+        self.comp, self.num_comps = strongly_connected_components(graph.num_nodes, fwd.indptr, fwd.nbr)
+        rev_comp, _ = strongly_connected_components(graph.num_nodes, rev.indptr, rev.nbr)
+        self.rev_rank = np.zeros(self.num_comps, dtype=np.int32)
+        self.rev_rank[self.comp] = rev_comp
+        self.rev_order = np.argsort(self.rev_rank).astype(np.int32)
+
+        self.member_ptr, self.members = _grouped(self.num_comps, self.comp, np.arange(graph.num_nodes, dtype=np.int32))
+
+        src = self.comp[graph.rel_src[fwd.edge]]
+        dst = self.comp[graph.rel_dst[fwd.edge]]
+        keep = src != dst
+        dag = np.unique(np.stack([src[keep], dst[keep]], axis=1), axis=0) if keep.any() else np.zeros((0, 2), dtype=np.int32)
+        child_ptr, children = _grouped(self.num_comps, dag[:, 0], dag[:, 1])
+        parent_ptr, parents = _grouped(self.num_comps, self.rev_rank[dag[:, 1]], self.rev_rank[dag[:, 0]])
+        self.desc = _interval_closure(self.num_comps, child_ptr, children, budget)
+        self.anc = _interval_closure(self.num_comps, parent_ptr, parents, budget - self.desc[1].nbytes * 2)
+        self.dag_edges = len(dag)
+        self.build_seconds = time.perf_counter() - started
+
+    # --- Queries ------------------------------------------------------------------------
+
+    @staticmethod
+    def _contains(intervals, c, x):
+        ptr, starts, ends = intervals
+        lo, hi = int(ptr[c]), int(ptr[c + 1])
+        i = bisect.bisect_right(starts, x, lo, hi) - 1
+        return i >= lo and x < ends[i]
+
+    def is_downstream(self, a, b):
+        """True if node b can be reached from node a (a feeds b)."""
+        return self._contains(self.desc, self.comp[a], self.comp[b])
+
+    def is_upstream(self, a, b):
+        """True if node b feeds node a."""
+        return self._contains(self.anc, self.rev_rank[self.comp[a]], self.rev_rank[self.comp[b]])
+
+    def in_network(self, a, b):
+        """True if node a is in the upstream or downstream network of node b."""
+        return self.is_upstream(b, a) or self.is_downstream(b, a)
+
+    @staticmethod
+    def _expand(intervals, c):
+        ptr, starts, ends = intervals
+        lo, hi = int(ptr[c]), int(ptr[c + 1])
+        return np.concatenate([np.arange(starts[i], ends[i], dtype=np.int32) for i in range(lo, hi)])
+
+    def _node_mask(self, comps):
+        mask = np.zeros(self.num_nodes, dtype=bool)
+        starts = self.member_ptr[comps]
+        counts = self.member_ptr[comps + 1] - starts
+        slots = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(int(counts.sum()))
+        mask[self.members[slots]] = True
+        return mask
+
+    def downstream_mask(self, seeds):
+        comps = np.unique(self.comp[np.asarray(seeds, dtype=np.int32)])
+        return self._node_mask(np.unique(np.concatenate([self._expand(self.desc, c) for c in comps])))
+
+    def upstream_mask(self, seeds):
+        ranks = np.unique(self.rev_rank[self.comp[np.asarray(seeds, dtype=np.int32)]])
+        expanded = np.unique(np.concatenate([self._expand(self.anc, r) for r in ranks]))
+        return self._node_mask(self.rev_order[expanded])
+
+    def memory_bytes(self):
+        arrays = [self.comp, self.rev_rank, self.rev_order, self.member_ptr, self.members, *self.desc, *self.anc]
+        return sum(a.nbytes for a in arrays)
+
+    def stats(self):
+        return {
+            'components': self.num_comps,
+            'dagEdges': self.dag_edges,
+            'descendantIntervals': int(self.desc[0][-1]),
+            'ancestorIntervals': int(self.anc[0][-1]),
+            'buildSeconds': round(self.build_seconds, 3),
+            'memoryBytes': self.memory_bytes(),
+        }
+
+
+def build_reachability(graph, budget=REACHABILITY_MAX_BYTES):
+    """Returns the index, or None when it would not fit in the memory budget."""
+    try:
+        return ReachabilityIndex(graph, budget)
+    except ReachabilityBudgetExceeded as e:
+        print(f"WARNING: Reachability index not built ({e}); falling back to traversal.")
+        return None
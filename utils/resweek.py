@@ -0,0 +1,132 @@
+# utils/resweek.py
+# All ResWeek rows as dense resources x weeks arrays. Rows are coded into the matrix in one pass
+# (resource and week ids through dicts), so building it is linear in the number of rows; cells
+# without a ResWeek row are NaN. get_resweek_matrix() keeps one matrix in memory for the
+# time-phase endpoints and reloads it when the snapshot version moves.
+import time
+import sys
+import os
+import numpy as np
+from .neo4j_handler import get_session
+from .graph_snapshot import SnapshotCache
+
+# Maximum age of the cached matrix even when the snapshot version does not move.
+RESWEEK_CACHE_SECONDS = float(os.getenv("RESWEEK_CACHE_SECONDS", "300"))
+
+RESWEEK_QUERY = """
+MATCH (rw:ResWeek)
+RETURN rw.res_id AS res_id, rw.week AS week, rw.total_capacity AS capacity,
+       rw.total_load AS load, rw.utilization AS utilization
+"""
+
+RES_DESCR_QUERY = "MATCH (r:Res) WHERE r.res_descr IS NOT NULL RETURN r.res_id AS res_id, r.res_descr AS res_descr"
+
+
+def _as_float(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+def _json_values(values):
+    # NaN (no ResWeek row) becomes null.
+    return [value if value == value else None for value in values.tolist()]
+
+
+class ResWeekMatrix:
+    def __init__(self, rows, descriptions=None):
+        started = time.perf_counter()
+        res_index, week_index = {}, {}
+        res_codes, week_codes, capacity, load, utilization = [], [], [], [], []
+        for row in rows:
+            res_id, week = row['res_id'], row['week']
+            if res_id is None or week is None:
+                continue
+            res_id = sys.intern(str(res_id))
+            res_codes.append(res_index.setdefault(res_id, len(res_index)))
+            week_codes.append(week_index.setdefault(week, len(week_index)))
+            capacity.append(_as_float(row['capacity']))
+            load.append(_as_float(row['load']))
+            utilization.append(_as_float(row['utilization']))
+
+        self.res_ids = list(res_index)
+        self.res_index = res_index
+        # Weeks are stored in ascending order so windows over consecutive columns are time windows.
+        order = sorted(week_index, key=lambda week: (str(type(week)), week))
+        self.weeks = order
+        self.week_index = {week: i for i, week in enumerate(order)}
+        remap = np.empty(len(order), dtype=np.int64)
+        for week, code in week_index.items():
+            remap[code] = self.week_index[week]
+
+        shape = (len(self.res_ids), len(self.weeks))
+        rows_idx = np.asarray(res_codes, dtype=np.int64)
+        cols_idx = remap[np.asarray(week_codes, dtype=np.int64)] if week_codes else np.zeros(0, dtype=np.int64)
+        self.capacity = np.full(shape, np.nan)
+        self.load = np.full(shape, np.nan)
+        self.utilization = np.full(shape, np.nan)
+        self.capacity[rows_idx, cols_idx] = capacity
+        self.load[rows_idx, cols_idx] = load
+        self.utilization[rows_idx, cols_idx] = utilization
+        # Rows without a stored utilization fall back to load / capacity.
+        missing = np.isnan(self.utilization) & (self.capacity > 0)
+        self.utilization[missing] = self.load[missing] / self.capacity[missing]
+        self.num_rows = len(res_codes)
+        self.descriptions = descriptions or {}
+        self.build_seconds = time.perf_counter() - started
+
+    @classmethod
+    def load_from(cls, session, with_descriptions=False):
+        descriptions = ({row['res_id']: row['res_descr'] for row in session.run(RES_DESCR_QUERY)}
+                        if with_descriptions else None)
+        return cls(session.run(RESWEEK_QUERY), descriptions)
+
+    def week_columns(self, first_week=None, last_week=None):
+        return [i for i, week in enumerate(self.weeks)
+                if (first_week is None or week >= first_week) and (last_week is None or week <= last_week)]
+
+    def time_phase(self, res_ids, first_week=None, last_week=None):
+        """Capacity, load and utilization of the given resources over a week range, one list per measure."""
+        columns = np.asarray(self.week_columns(first_week, last_week), dtype=np.int64)
+        resources, missing = [], []
+        for res_id in res_ids:
+            i = self.res_index.get(res_id)
+            if i is None:
+                missing.append(res_id)
+                continue
+            resources.append({
+                'resId': res_id,
+                'resDescr': self.descriptions.get(res_id),
+                'capacity': _json_values(self.capacity[i, columns]),
+                'load': _json_values(self.load[i, columns]),
+                'utilization': _json_values(self.utilization[i, columns]),
+            })
+        return {'weeks': [self.weeks[c] for c in columns], 'resources': resources, 'missing': missing}
+
+    def memory_bytes(self):
+        return self.capacity.nbytes + self.load.nbytes + self.utilization.nbytes
+
+    def stats(self):
+        return {
+            'resources': len(self.res_ids),
+            'weeks': len(self.weeks),
+            'rows': self.num_rows,
+            'buildSeconds': round(self.build_seconds, 3),
+            'memoryBytes': self.memory_bytes(),
+        }
+
+
+def _load_matrix():
+    with get_session() as session:
+        return ResWeekMatrix.load_from(session, with_descriptions=True)
+
+
+_cache = SnapshotCache(_load_matrix, RESWEEK_CACHE_SECONDS)
+
+
+def get_resweek_matrix():
+    """The cached matrix, reloaded when the snapshot version moved or it is older than RESWEEK_CACHE_SECONDS."""
+    return _cache.get()
+
+
+def resweek_cache_status():
+    matrix = _cache.value
+    return dict(_cache.status(), stats=matrix.stats() if matrix is not None else None)
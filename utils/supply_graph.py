@@ -0,0 +1,399 @@
+# utils/supply_graph.py
+# In-memory supply network held as array-backed CSR adjacency, used to answer network
+# queries without enumerating paths in Cypher.
+import numpy as np
+import threading
+import copy
+import time
+import sys
+import os
+from .neo4j_handler import get_session
+from .reachability import build_reachability
+
+NODE_LABELS = ('SKU', 'BOM', 'Res', 'PurchGroup')
+SUPPLY_REL_TYPES = ('SOURCING', 'PRODUCES', 'CONSUMED_BY', 'PURCH_FROM')
+RESOURCE_REL_TYPE = 'USES_RESOURCE'
+REL_TYPES = SUPPLY_REL_TYPES + (RESOURCE_REL_TYPE,)
+REL_TYPE_CODES = {rel_type: code for code, rel_type in enumerate(REL_TYPES)}
+RESOURCE_REL_CODE = REL_TYPE_CODES[RESOURCE_REL_TYPE]
+# Plan data outside the snapshot whose signatures are still read, so the snapshot version also
+# moves when constraints, demands or resource weeks change.
+TRACKED_LABELS = ('Constraint', 'Demand', 'ResWeek')
+TRACKED_REL_TYPES = ('HAS_CONSTRAINT', 'IMPACTS_DEMAND', 'PEGGED_TO_RESOURCE', 'IS_FOR_SKU')
+
+# 'cypher' answers network requests with the graph queries, 'memory' with the loaded snapshot.
+GRAPH_ENGINE = os.getenv("GRAPH_ENGINE", "cypher")
+# Build the reachability index when the snapshot is loaded.
+REACHABILITY_INDEX = os.getenv("REACHABILITY_INDEX", "true").lower() == "true"
+
+NODES_QUERY = """
+MATCH (n) WHERE n:SKU OR n:BOM OR n:Res OR n:PurchGroup
+RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props
+"""
+
+# Only relationships between loaded nodes are kept, so both queries agree on the node set.
+RELS_QUERY = """
+MATCH (a)-[r:SOURCING|PRODUCES|CONSUMED_BY|PURCH_FROM|USES_RESOURCE]->(b)
+WHERE (a:SKU OR a:BOM OR a:Res OR a:PurchGroup) AND (b:SKU OR b:BOM OR b:Res OR b:PurchGroup)
+RETURN elementId(r) AS id, type(r) AS type, properties(r) AS props, elementId(a) AS start, elementId(b) AS end
+"""
+
+# Property used to detect and fetch changed nodes and relationships between refreshes.
+SNAPSHOT_CHANGE_PROPERTY = os.getenv("SNAPSHOT_CHANGE_PROPERTY", "updated_at")
+
+# One row per label and relationship type: element count and the latest change stamp.
+SIGNATURES_QUERY = "CALL() { " + " UNION ALL ".join(
+    [f"MATCH (n:{label}) RETURN '{label}' AS key, count(n) AS count, max(n[$prop]) AS changed" for label in NODE_LABELS + TRACKED_LABELS]
+    + [f"MATCH ()-[r:{rel_type}]->() RETURN '{rel_type}' AS key, count(r) AS count, max(r[$prop]) AS changed" for rel_type in REL_TYPES + TRACKED_REL_TYPES]
+) + " } RETURN key, count, changed"
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def read_signatures(session, prop=SNAPSHOT_CHANGE_PROPERTY):
+    """{label or relationship type: (count, latest change stamp)} for every element kind in the snapshot."""
+    return {row['key']: (row['count'], row['changed']) for row in session.run(SIGNATURES_QUERY, prop=prop)}
+
+
+def _as_number(value):
+    # Mirrors coalesce(r.lead_time, 0) for missing or non-numeric values.
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0.0
+
+
+class CSR:
+    """Compressed sparse row adjacency: the slots indptr[v]:indptr[v+1] hold v's neighbours and edge ids."""
+
+    def __init__(self, num_nodes, src, dst, edge_ids):
+        order = np.argsort(src, kind='stable')
+        counts = np.bincount(src, minlength=num_nodes)
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+        self.nbr = dst[order].astype(np.int32)
+        self.edge = edge_ids[order].astype(np.int32)
+
+    def slots(self, frontier):
+        """Slot positions of all neighbours of the nodes in frontier, gathered without a Python loop."""
+        starts = self.indptr[frontier]
+        counts = self.indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return _EMPTY
+        first_slot = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return first_slot + np.arange(total)
+
+    def nbytes(self):
+        return self.indptr.nbytes + self.nbr.nbytes + self.edge.nbytes
+
+
+class SupplyGraph:
+    """
+    Snapshot of SKU, BOM, Res and PurchGroup nodes and the supply/resource relationships
+    between them. Nodes and relationships are addressed by dense int32 indices; element ids
+    and business keys are interned strings mapped to those indices.
+    """
+
+    def __init__(self, node_rows, rel_rows):
+        started = time.perf_counter()
+        self.node_ids = []
+        self.node_labels = []
+        self.node_props = []
+        self.node_index = {}
+        label_sets = {}
+        for row in node_rows:
+            element_id = sys.intern(row['id'])
+            self.node_index[element_id] = len(self.node_ids)
+            self.node_ids.append(element_id)
+            # Share one label list per distinct label combination.
+            labels = tuple(sorted(row['labels']))
+            self.node_labels.append(label_sets.setdefault(labels, list(labels)))
+            self.node_props.append(dict(row['props']))
+        n = len(self.node_ids)
+        self.num_nodes = n
+
+        self.is_label = {label: np.zeros(n, dtype=bool) for label in NODE_LABELS}
+        for i, labels in enumerate(self.node_labels):
+            for label in labels:
+                if label in self.is_label:
+                    self.is_label[label][i] = True
+        self.sku_index = {}
+        self.res_index = {}
+        for i, props in enumerate(self.node_props):
+            if self.is_label['SKU'][i] and props.get('sku_id') is not None:
+                self.sku_index[sys.intern(props['sku_id'])] = i
+            if self.is_label['Res'][i] and props.get('res_id') is not None:
+                self.res_index[sys.intern(props['res_id'])] = i
+
+        self.rel_ids = []
+        self.rel_props = []
+        src, dst, types = [], [], []
+        for row in rel_rows:
+            start = self.node_index.get(row['start'])
+            end = self.node_index.get(row['end'])
+            if start is None or end is None:
+                continue
+            self.rel_ids.append(sys.intern(row['id']))
+            self.rel_props.append(dict(row['props']))
+            src.append(start)
+            dst.append(end)
+            types.append(REL_TYPE_CODES[row['type']])
+        self.rel_src = np.asarray(src, dtype=np.int32)
+        self.rel_dst = np.asarray(dst, dtype=np.int32)
+        self.rel_type = np.asarray(types, dtype=np.int8)
+        self.num_rels = len(self.rel_ids)
+        self.lead_time = np.array([_as_number(props.get('lead_time')) for props in self.rel_props], dtype=np.float64)
+        self._flags = {}
+        self._rel_index = None
+        # Signatures read just before the load; set by load() and carried over by apply_delta().
+        self.signatures = None
+        # Optional ReachabilityIndex; when set, closures are read from it instead of traversed.
+        self.reachability = None
+
+        edge_ids = np.arange(self.num_rels, dtype=np.int32)
+        supply = self.rel_type != RESOURCE_REL_CODE
+        resource = ~supply
+        self.supply_fwd = CSR(n, self.rel_src[supply], self.rel_dst[supply], edge_ids[supply])
+        self.supply_rev = CSR(n, self.rel_dst[supply], self.rel_src[supply], edge_ids[supply])
+        self.res_fwd = CSR(n, self.rel_src[resource], self.rel_dst[resource], edge_ids[resource])
+        self.res_rev = CSR(n, self.rel_dst[resource], self.rel_src[resource], edge_ids[resource])
+        self.build_seconds = time.perf_counter() - started
+
+    def flag(self, name):
+        """Boolean mask of nodes whose property `name` is true, i.e. coalesce(n[name], false) = true."""
+        if name not in self._flags:
+            self._flags[name] = np.array([props.get(name) is True for props in self.node_props], dtype=bool)
+        return self._flags[name]
+
+    @classmethod
+    def load(cls, session):
+        started = time.perf_counter()
+        # Read first, so anything written during the load shows up as a change on the next refresh.
+        signatures = read_signatures(session)
+        node_rows = list(session.run(NODES_QUERY))
+        rel_rows = list(session.run(RELS_QUERY))
+        graph = cls(node_rows, rel_rows)
+        graph.signatures = signatures
+        graph.load_seconds = time.perf_counter() - started
+        return graph
+
+    # --- Incremental updates -------------------------------------------------------------
+
+    @property
+    def rel_index(self):
+        """Relationship element id -> index, built on first use."""
+        if self._rel_index is None:
+            self._rel_index = {rel_id: e for e, rel_id in enumerate(self.rel_ids)}
+        return self._rel_index
+
+    def _node_row(self, i):
+        return {'id': self.node_ids[i], 'labels': self.node_labels[i], 'props': self.node_props[i]}
+
+    def _rel_row(self, e):
+        return {'id': self.rel_ids[e], 'type': REL_TYPES[self.rel_type[e]], 'props': self.rel_props[e],
+                'start': self.node_ids[self.rel_src[e]], 'end': self.node_ids[self.rel_dst[e]]}
+
+    def _changes_topology(self, node_rows, rel_rows):
+        """True unless every row only changes properties of an existing element (keys and endpoints included)."""
+        for row in node_rows:
+            i = self.node_index.get(row['id'])
+            if i is None or tuple(sorted(row['labels'])) != tuple(self.node_labels[i]):
+                return True
+            old, new = self.node_props[i], row['props']
+            if old.get('sku_id') != new.get('sku_id') or old.get('res_id') != new.get('res_id'):
+                return True
+        for row in rel_rows:
+            e = self.rel_index.get(row['id'])
+            if e is None or row['type'] != REL_TYPES[self.rel_type[e]]:
+                return True
+            if row['start'] != self.node_ids[self.rel_src[e]] or row['end'] != self.node_ids[self.rel_dst[e]]:
+                return True
+        return False
+
+    def apply_delta(self, node_rows, deleted_nodes, rel_rows, deleted_rels):
+        """
+        Returns a new snapshot with the given node and relationship rows upserted and the given
+        element ids removed; this snapshot is left untouched for requests still reading it.
+        Property-only changes are patched into copies of the affected columns and keep the
+        adjacency and reachability index. Anything else rebuilds the arrays from the merged rows.
+        """
+        node_rows = list(node_rows)
+        rel_rows = list(rel_rows)
+        if not deleted_nodes and not deleted_rels and not self._changes_topology(node_rows, rel_rows):
+            graph = copy.copy(self)
+            graph.node_props = list(self.node_props)
+            for row in node_rows:
+                graph.node_props[self.node_index[row['id']]] = dict(row['props'])
+            graph.rel_props = list(self.rel_props)
+            graph.lead_time = self.lead_time.copy()
+            for row in rel_rows:
+                e = self.rel_index[row['id']]
+                graph.rel_props[e] = dict(row['props'])
+                graph.lead_time[e] = _as_number(row['props'].get('lead_time'))
+            graph._flags = {}
+            return graph
+
+        upserted_nodes = {row['id']: row for row in node_rows}
+        upserted_rels = {row['id']: row for row in rel_rows}
+        deleted_nodes = set(deleted_nodes)
+        deleted_rels = set(deleted_rels)
+        merged_nodes = [
+            upserted_nodes.pop(node_id, None) or self._node_row(i)
+            for i, node_id in enumerate(self.node_ids) if node_id not in deleted_nodes
+        ] + list(upserted_nodes.values())
+        merged_rels = [
+            upserted_rels.pop(rel_id, None) or self._rel_row(e)
+            for e, rel_id in enumerate(self.rel_ids) if rel_id not in deleted_rels
+        ] + list(upserted_rels.values())
+        graph = SupplyGraph(merged_nodes, merged_rels)
+        graph.signatures = self.signatures
+        if self.reachability is not None:
+            graph.reachability = build_reachability(graph)
+        return graph
+
+    # --- Traversal -----------------------------------------------------------------------
+
+    def closure(self, seeds, csr):
+        """Boolean mask of every node reachable from seeds (inclusive) along csr, by level-synchronous BFS."""
+        visited = np.zeros(self.num_nodes, dtype=bool)
+        frontier = np.unique(np.asarray(seeds, dtype=np.int32))
+        visited[frontier] = True
+        while frontier.size:
+            nbrs = csr.nbr[csr.slots(frontier)]
+            nbrs = np.unique(nbrs[~visited[nbrs]])
+            visited[nbrs] = True
+            frontier = nbrs
+        return visited
+
+    def upstream(self, seeds):
+        if self.reachability is not None:
+            return self.reachability.upstream_mask(seeds)
+        return self.closure(seeds, self.supply_rev)
+
+    def downstream(self, seeds):
+        if self.reachability is not None:
+            return self.reachability.downstream_mask(seeds)
+        return self.closure(seeds, self.supply_fwd)
+
+    def in_network(self, sku_id, other_sku_id):
+        """True if other_sku_id is upstream or downstream of sku_id; None if either SKU is unknown."""
+        a, b = self.sku_index.get(sku_id), self.sku_index.get(other_sku_id)
+        if a is None or b is None:
+            return None
+        if self.reachability is not None:
+            return self.reachability.in_network(b, a)
+        return bool(self.upstream([a])[b] or self.downstream([a])[b])
+
+    def incident_edges(self, mask, csr):
+        """Edge ids stored in csr for every node in mask."""
+        return csr.edge[csr.slots(np.flatnonzero(mask).astype(np.int32))]
+
+    # --- Serialization -------------------------------------------------------------------
+
+    def serialize_node(self, i):
+        return {'id': self.node_ids[i], 'labels': list(self.node_labels[i]), 'properties': dict(self.node_props[i])}
+
+    def serialize_rel(self, e):
+        return {'id': self.rel_ids[e], 'type': REL_TYPES[self.rel_type[e]], 'properties': dict(self.rel_props[e]),
+                'startNode': self.node_ids[self.rel_src[e]], 'endNode': self.node_ids[self.rel_dst[e]]}
+
+    def to_graph(self, node_mask, edge_ids):
+        return {
+            'nodes': {self.node_ids[i]: self.serialize_node(i) for i in np.flatnonzero(node_mask)},
+            'relationships': {self.rel_ids[e]: self.serialize_rel(e) for e in np.unique(edge_ids)},
+        }
+
+    def network_from(self, ups, downs, extra_nodes=None):
+        """
+        Same selection as the graph-mode Cypher: the upstream and downstream nodes, relationships
+        into upstream nodes and out of downstream nodes, and the resources used by every BOM.
+        """
+        net = ups | downs
+        if extra_nodes is not None:
+            net = net | extra_nodes
+        res_edges = self.incident_edges(net & self.is_label['BOM'], self.res_rev)
+        edges = np.concatenate([
+            self.incident_edges(ups, self.supply_rev),
+            self.incident_edges(downs, self.supply_fwd),
+            res_edges,
+        ])
+        net[self.rel_src[res_edges]] = True
+        return self.to_graph(net, edges)
+
+    def network_for_sku(self, sku_id):
+        """Graph payload matching SKU_NETWORK_GRAPH_QUERY."""
+        s = self.sku_index.get(sku_id)
+        if s is None:
+            return {'nodes': {}, 'relationships': {}}
+        return self.network_from(self.upstream([s]), self.downstream([s]))
+
+    def network_for_resource(self, res_id):
+        """Graph payload matching RESOURCE_NETWORK_GRAPH_QUERY."""
+        r = self.res_index.get(res_id)
+        if r is None:
+            return {'nodes': {}, 'relationships': {}}
+        start_boms = np.zeros(self.num_nodes, dtype=bool)
+        start_boms[self.res_fwd.nbr[self.res_fwd.slots(np.array([r], dtype=np.int32))]] = True
+        start_boms &= self.is_label['BOM']
+        slots = self.supply_fwd.slots(np.flatnonzero(start_boms).astype(np.int32))
+        produced = self.supply_fwd.nbr[slots][self.rel_type[self.supply_fwd.edge[slots]] == REL_TYPE_CODES['PRODUCES']]
+        seeds = np.unique(produced[self.is_label['SKU'][produced]])
+        if seeds.size == 0:
+            ups = downs = np.zeros(self.num_nodes, dtype=bool)
+        else:
+            ups, downs = self.upstream(seeds), self.downstream(seeds)
+        return self.network_from(ups, downs, extra_nodes=start_boms)
+
+    def memory_bytes(self):
+        arrays = [self.rel_src, self.rel_dst, self.rel_type, *self.is_label.values()]
+        total = sum(a.nbytes for a in arrays)
+        total += sum(csr.nbytes() for csr in (self.supply_fwd, self.supply_rev, self.res_fwd, self.res_rev))
+        return total
+
+    def stats(self):
+        return {
+            'nodes': self.num_nodes,
+            'relationships': self.num_rels,
+            'buildSeconds': round(self.build_seconds, 3),
+            'loadSeconds': round(getattr(self, 'load_seconds', 0.0), 3),
+            'adjacencyBytes': self.memory_bytes(),
+            'reachability': self.reachability.stats() if self.reachability is not None else None,
+        }
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_supply_graph():
+    """Returns the process-wide snapshot, loading it from Neo4j on first use."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                with get_session() as session:
+                    graph = SupplyGraph.load(session)
+                if REACHABILITY_INDEX:
+                    graph.reachability = build_reachability(graph)
+                _graph = graph
+    return _graph
+
+
+def loaded_supply_graph():
+    """The current snapshot, or None if it has not been loaded yet."""
+    return _graph
+
+
+def set_supply_graph(graph):
+    """Swaps in a new snapshot. Requests already holding the old one finish against it."""
+    global _graph
+    with _graph_lock:
+        _graph = graph
+
+
+def supply_graph_stats():
+    """Stats of the loaded snapshot without triggering a load."""
+    return _graph.stats() if _graph is not None else None
+
+
+def use_memory_engine(req_data=None):
+    """True when the request (or GRAPH_ENGINE) asks for the in-memory engine."""
+    return ((req_data or {}).get('engine') or GRAPH_ENGINE) == 'memory'
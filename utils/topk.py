@@ -0,0 +1,81 @@
+# utils/topk.py
+# Maintained top-K of affected orders for one order table, so "largest N affected orders" is
+# answered by merging short pre-sorted lists instead of sorting every affected row.
+#
+# Per SKU the table keeps its ORDER_TOPK_MAX largest orders, built once per file load. The global
+# list is the lazy heap merge of the heads of the broken SKUs; it is kept and patched when the
+# broken SKU set changes (heads of newly broken SKUs merged in, rows of repaired SKUs dropped).
+# Rows compare as (key, row) with key = -qty and null qty as -inf, so the order is qty descending,
+# nulls first (Cypher's DESC), then file order.
+from itertools import islice
+import threading
+import heapq
+import os
+import numpy as np
+
+# Largest K any endpoint may ask for; also the length of each per-SKU head.
+ORDER_TOPK_MAX = int(os.getenv("ORDER_TOPK_MAX", "1000"))
+
+
+class AffectedTopK:
+    def __init__(self, table, k_max=ORDER_TOPK_MAX):
+        self.table = table
+        self.k_max = k_max
+        self.keys = np.where(np.isnan(table.qty), -np.inf, -table.qty)
+        rows = np.flatnonzero(table.valid)
+        # Grouped by SKU code, then (key, row): one sort for all heads.
+        rows = rows[np.lexsort((self.keys[rows], table.sku_codes[rows]))]
+        counts = np.bincount(table.sku_codes[rows], minlength=len(table.sku_ids))
+        self.sku_counts = counts
+        self.sku_ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.sku_ptr[1:])
+        self._rows = rows
+        self._heads = {}
+        self._global = None
+        self._lock = threading.Lock()
+
+    def head(self, code):
+        """Up to k_max (key, row) pairs of one SKU, largest first."""
+        head = self._heads.get(code)
+        if head is None:
+            start = int(self.sku_ptr[code])
+            rows = self._rows[start:start + min(int(self.sku_counts[code]), self.k_max)]
+            head = self._heads[code] = list(zip(self.keys[rows].tolist(), rows.tolist()))
+        return head
+
+    def sku_rows(self, code, limit):
+        """The SKU's first `limit` rows, going past the head only when the caller needs more."""
+        start = int(self.sku_ptr[code])
+        return self._rows[start:start + min(int(self.sku_counts[code]), limit)].tolist()
+
+    def _merge(self, lists, k):
+        return list(islice(heapq.merge(*lists), k))
+
+    def top(self, codes, key, k):
+        """
+        Row positions of the k largest orders over the SKU codes in `codes`. `key` identifies the
+        broken SKU set (the snapshot version); when it changes the kept list is patched, not rebuilt.
+        """
+        k = min(k, self.k_max)
+        with self._lock:
+            state = self._global
+            if state is None or (state['key'] != key and not self._patch(state, codes, key)):
+                items = self._merge([self.head(code) for code in codes], self.k_max)
+                state = self._global = {'key': key, 'codes': codes, 'items': items,
+                                        'complete': len(items) < self.k_max}
+        return [row for _, row in state['items'][:k]]
+
+    def _patch(self, state, codes, key):
+        added = codes - state['codes']
+        removed = state['codes'] - codes
+        items = state['items']
+        if removed:
+            sku_codes = self.table.sku_codes
+            items = [item for item in items if int(sku_codes[item[1]]) not in removed]
+            # Rows that were cut off the kept list may now belong in it.
+            if not state['complete'] and len(items) < self.k_max:
+                return False
+        if added:
+            items = self._merge([items] + [self.head(code) for code in added], self.k_max)
+        state.update(key=key, codes=codes, items=items, complete=state['complete'] and len(items) < self.k_max)
+        return True